@@ -0,0 +1,395 @@
+# [SECTION: IMPORTS]
+from __future__ import annotations
+
+import io
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from core.db_interface import DbService
+from core.image_loader import Image, load_scaled_pil
+from core.thumbnail_service import JPEG_QUALITY, THUMB_SIZES, ThumbnailService
+
+from . import bepaal_ai_tags, detecteer_donkerheid, onscherpte_detectie
+from .bepaal_ai_tags import bepaal_ai_tags_beeld
+from .detecteer_donkerheid import donkerheid_score
+from .onscherpte_detectie import onscherpte_score
+from .perceptual_hash import dhash_image
+
+# [END: SECTION: IMPORTS]
+# NumPy optioneel (zonder NumPy vallen onscherpte/donkerheid weg)
+try:
+    import numpy as np  # type: ignore
+except Exception:
+    np = None  # type: ignore
+
+# [SECTION: LOGGER]
+logger = logging.getLogger(__name__)
+# [END: SECTION: LOGGER]
+
+# Werkresolutie: groot genoeg voor de medium-thumbnail en de onscherpte-analyse
+WORK_EDGE = max(512, max(THUMB_SIZES.values()))
+
+ProgressCallback = Callable[[int, int], None]
+
+
+# [CLASS: Analyzer]
+@dataclass(frozen=True)
+class Analyzer:
+    """
+    Eén analyzer in de pipeline.
+    fn krijgt het gedecodeerde RGB-beeld (PIL) op werkresolutie.
+    target bepaalt waar het resultaat heen gaat:
+      'score' → analysis (float, of dict met 'score' → score + JSON-payload),
+      'phash' → media.phash,
+      'tags'  → media_tags (aanvullend) + analysis met de tags als payload
+    version: ophogen wanneer fn anders rekent; bestaande resultaten van
+    een andere versie gelden dan als verouderd en worden herberekend.
+    available: optionele check (bv. model/bibliotheek aanwezig); False =
+    analyzer overslaan zonder resultaten vast te leggen.
+    fn en available moeten functies op moduleniveau zijn (picklebaar voor
+    de procespool).
+    """
+
+    name: str
+    fn: Callable[[Any], Any]
+    target: str = "score"
+    version: int = 1
+    available: Optional[Callable[[], bool]] = None
+
+# [END: CLASS: Analyzer]
+
+
+# [FUNC: def _numpy_beschikbaar]
+def _numpy_beschikbaar() -> bool:
+    return np is not None
+
+# [END: FUNC: def _numpy_beschikbaar]
+
+# [FUNC: def _onscherpte]
+def _onscherpte(im) -> float:
+    return onscherpte_score(np.asarray(im.convert("L")))
+
+# [END: FUNC: def _onscherpte]
+
+# [FUNC: def _donkerheid]
+def _donkerheid(im) -> float:
+    return donkerheid_score(im)
+
+# [END: FUNC: def _donkerheid]
+
+
+ANALYZERS: Dict[str, Analyzer] = {}
+
+
+# [FUNC: def register_analyzer]
+def register_analyzer(
+    name: str,
+    fn: Callable[[Any], Any],
+    target: str = "score",
+    version: int = 1,
+    available: Optional[Callable[[], bool]] = None,
+) -> Analyzer:
+    """Registreer (of vervang) een analyzer onder deze naam."""
+    if target not in ("score", "phash", "tags"):
+        raise ValueError(f"Onbekend target: {target}")
+    analyzer = Analyzer(name, fn, target, int(version), available)
+    ANALYZERS[name] = analyzer
+    return analyzer
+
+# [END: FUNC: def register_analyzer]
+
+
+register_analyzer(
+    "onscherpte", _onscherpte,
+    version=onscherpte_detectie.VERSIE, available=_numpy_beschikbaar,
+)
+register_analyzer(
+    "donkerheid", _donkerheid,
+    version=detecteer_donkerheid.VERSIE, available=_numpy_beschikbaar,
+)
+register_analyzer("phash", dhash_image, target="phash")
+register_analyzer(
+    "ai_tags", bepaal_ai_tags_beeld, target="tags",
+    version=bepaal_ai_tags.VERSIE, available=bepaal_ai_tags.beschikbaar,
+)
+
+
+# [FUNC: def _init_worker]
+def _init_worker(threads: int) -> None:
+    """Initializer van de procespool: threadbudget voor onnxruntime (ai_tags)."""
+    bepaal_ai_tags._init_worker(threads)
+
+# [END: FUNC: def _init_worker]
+
+# [FUNC: def _analyseer]
+def _analyseer(
+    path: str, analyzers: List[Analyzer], thumb_sizes: Dict[str, int]
+) -> Dict[str, Any]:
+    """
+    Worker (draait in een apart proces): decodeer één keer op werkresolutie
+    en geef het beeld aan elke analyzer en aan de thumbnail-encoder.
+    """
+    out: Dict[str, Any] = {"results": {}, "errors": {}, "timings": {}, "thumbs": []}
+    t0 = time.perf_counter()
+    im = load_scaled_pil(path, (WORK_EDGE, WORK_EDGE))
+    out["timings"]["decode"] = time.perf_counter() - t0
+    if im is None:
+        out["errors"]["decode"] = "onleesbaar"
+        return out
+
+    for a in analyzers:
+        t0 = time.perf_counter()
+        try:
+            out["results"][a.name] = a.fn(im)
+        except Exception as exc:
+            out["errors"][a.name] = repr(exc)
+        out["timings"][a.name] = time.perf_counter() - t0
+
+    if thumb_sizes:
+        t0 = time.perf_counter()
+        for kind, edge in sorted(thumb_sizes.items(), key=lambda kv: -kv[1]):
+            thumb = im.copy()
+            thumb.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+            buf = io.BytesIO()
+            thumb.save(buf, "JPEG", quality=JPEG_QUALITY, optimize=True)
+            out["thumbs"].append((kind, buf.getvalue(), thumb.width, thumb.height))
+        out["timings"]["thumbnails"] = time.perf_counter() - t0
+    return out
+
+# [END: FUNC: def _analyseer]
+
+
+# [CLASS: AnalysePipeline]
+# [SECTION: CLASS: AnalysePipeline]
+class AnalysePipeline:
+    """
+    Eén decode per beeld, uitgewaaierd naar alle geregistreerde analyzers
+    (onscherpte, donkerheid, phash, ai_tags, ...) plus thumbnails.
+    Per batch gaan alle resultaten in één DB-transactie
+    (DbService.write_analysis_batch). Enkel media waarvoor minstens één
+    analyzer/thumbnail ontbreekt of verouderd is (bestand gewijzigd of
+    analyzer-versie opgehoogd) worden verwerkt, en dan enkel die onderdelen.
+    """
+
+# [FUNC: __init__]
+    def __init__(
+        self,
+        db: DbService,
+        analyzers: Optional[Iterable[str]] = None,
+        thumbs: Optional[ThumbnailService] = None,
+        thumb_kinds: Optional[Iterable[str]] = None,
+        workers: Optional[int] = None,
+        batch_size: int = 200,
+        threads_per_worker: Optional[int] = None,
+    ) -> None:
+        self.db = db
+        names = list(analyzers) if analyzers is not None else list(ANALYZERS)
+        self.analyzers = []
+        for n in names:
+            a = ANALYZERS[n]
+            if a.available is not None and not a.available():
+                logger.warning("Analyzer '%s' niet beschikbaar: overgeslagen", n)
+                continue
+            self.analyzers.append(a)
+        self.thumbs = thumbs
+        self.thumb_kinds = (
+            list(thumb_kinds) if thumb_kinds is not None else list(THUMB_SIZES)
+        ) if thumbs is not None else []
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        # elke worker een eigen deel van de cores, anders vecht elk proces om alle cores
+        self.threads_per_worker = threads_per_worker or max(
+            1, (os.cpu_count() or 2) // self.workers
+        )
+        self.batch_size = max(1, int(batch_size))
+
+# [END: FUNC: __init__]
+
+# [FUNC: _plan]
+    def _plan(
+        self, limit: Optional[int]
+    ) -> Tuple[Dict[int, Tuple[str, Optional[int], Optional[float]]], Dict[int, Set[str]], Set[str]]:
+        """
+        Welke media hebben welke onderdelen nodig?
+        limit geldt voor het samengevoegde plan: de limit laagste media-id's.
+        Elke query levert al zijn limit laagste id's, dus die zitten er allemaal
+        in, telkens met al hun onderdelen.
+        Return: (media_id → (path, size, mtime), media_id → {onderdelen}, oude thumb-paden)
+        """
+        meta: Dict[int, Tuple[str, Optional[int], Optional[float]]] = {}
+        need: Dict[int, Set[str]] = {}
+        old_thumbs: Set[str] = set()
+
+        thumb_refs: Dict[int, Set[str]] = {}
+
+        def _add(rows: Iterable[Tuple], part: str) -> None:
+            for row in rows:
+                media_id, path, size, mtime = row[:4]
+                meta[media_id] = (path, size, mtime)
+                need.setdefault(media_id, set()).add(part)
+                if len(row) > 4 and row[4]:
+                    thumb_refs.setdefault(media_id, set()).add(row[4])
+
+        for a in self.analyzers:
+            if a.target == "phash":
+                _add(self.db.media_needing_phash(limit=limit), a.name)
+            else:
+                _add(self.db.media_needing_analysis(a.name, a.version, limit=limit), a.name)
+        for kind in self.thumb_kinds:
+            _add(self.db.media_needing_thumbnail(kind, limit=limit), f"thumb:{kind}")
+        if limit is not None and len(need) > limit:
+            keep = sorted(need)[: max(0, int(limit))]
+            meta = {i: meta[i] for i in keep}
+            need = {i: need[i] for i in keep}
+        for media_id in need:
+            old_thumbs.update(thumb_refs.get(media_id, ()))
+        return meta, need, old_thumbs
+
+# [END: FUNC: _plan]
+
+# [FUNC: run]
+    def run(
+        self, limit: Optional[int] = None, progress: Optional[ProgressCallback] = None
+    ) -> Dict[str, Any]:
+        """Verwerk alle media met ontbrekende resultaten. Return: statistiek + timings."""
+        meta, need, old_thumbs = self._plan(limit)
+        timings: Dict[str, List[float]] = {}
+        stats: Dict[str, Any] = {"todo": len(need), "done": 0, "failed": 0}
+        if not need:
+            stats["timings"] = {}
+            return stats
+        logger.info(
+            "Analysepipeline: %s media, analyzers=%s, thumbnails=%s",
+            len(need),
+            [a.name for a in self.analyzers],
+            self.thumb_kinds,
+        )
+
+        by_name = {a.name: a for a in self.analyzers}
+        items = iter(need.items())
+        pending: Dict[Future, int] = {}
+        batch: List[Tuple[int, Dict[str, Any]]] = []
+        window = self.workers * 4
+        done = 0
+
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self.threads_per_worker,),
+        ) as pool:
+            while True:
+                while len(pending) < window:
+                    nxt = next(items, None)
+                    if nxt is None:
+                        break
+                    media_id, parts = nxt
+                    wanted = [by_name[p] for p in parts if p in by_name]
+                    sizes = {
+                        p[6:]: THUMB_SIZES[p[6:]] for p in parts if p.startswith("thumb:")
+                    }
+                    fut = pool.submit(_analyseer, meta[media_id][0], wanted, sizes)
+                    pending[fut] = media_id
+                if not pending:
+                    break
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    media_id = pending.pop(fut)
+                    done += 1
+                    try:
+                        res = fut.result()
+                    except Exception:
+                        logger.exception("Analyse-worker faalde: %s", meta[media_id][0])
+                        res = {"results": {}, "errors": {"worker": "crash"}, "timings": {}, "thumbs": []}
+                    for name, secs in res["timings"].items():
+                        timings.setdefault(name, []).append(secs)
+                    if res["errors"]:
+                        stats["failed"] += 1
+                        logger.debug("Analysefouten %s: %s", meta[media_id][0], res["errors"])
+                    else:
+                        stats["done"] += 1
+                    batch.append((media_id, res))
+                if len(batch) >= self.batch_size:
+                    self._write(batch, meta, need, timings)
+                    batch = []
+                if progress:
+                    progress(done, len(need))
+
+        self._write(batch, meta, need, timings)
+        if self.thumbs is not None and old_thumbs:
+            self.thumbs.remove_files(self.db.unreferenced_thumb_paths(old_thumbs))
+        stats["timings"] = {
+            name: {
+                "n": len(v),
+                "total_s": round(sum(v), 3),
+                "mean_ms": round(1000 * sum(v) / len(v), 2),
+            }
+            for name, v in timings.items()
+        }
+        logger.info("Analysepipeline klaar: %s", stats)
+        return stats
+
+# [END: FUNC: run]
+
+# [FUNC: _write]
+    def _write(
+        self,
+        batch: List[Tuple[int, Dict[str, Any]]],
+        meta: Dict[int, Tuple[str, Optional[int], Optional[float]]],
+        need: Dict[int, Set[str]],
+        timings: Dict[str, List[float]],
+    ) -> None:
+        """Zet een batch workerresultaten om naar één write_analysis_batch-call."""
+        if not batch:
+            return
+        t0 = time.perf_counter()
+        results: Dict[Tuple[str, int], List[Tuple]] = {}
+        phashes: List[Tuple] = []
+        thumb_rows: List[Tuple] = []
+        tags: Dict[int, List[str]] = {}
+        for media_id, res in batch:
+            _, size, mtime = meta[media_id]
+            for a in self.analyzers:
+                if a.name not in need[media_id]:
+                    continue
+                # ook None vastleggen: onleesbare beelden niet elke run opnieuw
+                value = res["results"].get(a.name)
+                if a.target == "phash":
+                    phashes.append((media_id, value, size, mtime))
+                    continue
+                if a.target == "tags":
+                    names = list(value or [])
+                    tags[media_id] = names
+                    score, payload = float(len(names)), names
+                elif isinstance(value, dict):
+                    score, payload = value.get("score"), value
+                else:
+                    score, payload = value, None
+                results.setdefault((a.name, a.version), []).append(
+                    (media_id, score, payload, size, mtime)
+                )
+            if self.thumbs is not None:
+                for kind, data, w, h in res["thumbs"]:
+                    ref = self.thumbs.store(kind, data)
+                    thumb_rows.append((media_id, kind, ref, w, h, size, mtime, len(data)))
+        if self.thumbs is not None and self.thumbs.pack is not None:
+            self.thumbs.pack.flush()  # pack-index vóór de thumbnails-rijen
+        self.db.write_analysis_batch(results, phashes, thumb_rows, tags)
+        timings.setdefault("db_write", []).append(time.perf_counter() - t0)
+
+# [END: FUNC: _write]
+# [END: SECTION: CLASS: AnalysePipeline]
+# [END: CLASS: AnalysePipeline]
+
+
+# [SECTION: MAIN]
+if __name__ == "__main__":
+    if not logging.getLogger().handlers:
+        logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    _db = DbService()
+    _stats = AnalysePipeline(_db, thumbs=ThumbnailService(_db)).run()
+    for _name, _t in _stats["timings"].items():
+        print(f"{_name:<12} n={_t['n']:<6} {_t['mean_ms']:8.2f} ms/st  totaal {_t['total_s']:.1f} s")
+# [END: SECTION: MAIN]
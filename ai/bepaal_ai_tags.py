@@ -1,24 +1,273 @@
 # [SECTION: IMPORTS]
 import logging
-from typing import List
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
+from core.image_loader import ImageOps, load_scaled_pil
 
 # [END: SECTION: IMPORTS]
+# NumPy en onnxruntime optioneel (zonder beide geen AI-tags)
+try:
+    import numpy as np  # type: ignore
+except Exception:
+    np = None  # type: ignore
+try:
+    import onnxruntime as ort  # type: ignore
+except Exception:
+    ort = None  # type: ignore
+
 logger = logging.getLogger(__name__)
 
+# Ophogen bij een ander model of andere drempels: bestaande tags worden herberekend
+VERSIE = 1
+ANALYZER = "ai_tags"
+
+# Lokaal model (volledig offline): <project>/ai_models/tagger.onnx met
+# ernaast tagger.labels.txt (één label per regel, in de volgorde van de uitvoer)
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_PATH = os.environ.get(
+    "MEDIA_ORG_TAG_MODEL", os.path.join(PROJECT_ROOT, "ai_models", "tagger.onnx")
+)
+INPUT_SIZE = 224
+MEAN = (0.485, 0.456, 0.406)  # ImageNet-normalisatie
+STD = (0.229, 0.224, 0.225)
+BATCH_SIZE = 16  # vaste tensorgrootte; laatste batch wordt opgevuld
+TOP_K = 5
+MIN_PROB = 0.20
+
+ProgressCallback = Callable[[int, int], None]
+
+# Per proces: sessie wordt pas bij het eerste gebruik geladen
+_sessie: Optional[Tuple[Any, List[str], str, Optional[int]]] = None
+_sessie_lock = threading.Lock()
+_threads: Optional[int] = None
+
+
+# [FUNC: labels_pad]
+def labels_pad(model_path: str = MODEL_PATH) -> str:
+    return os.path.splitext(model_path)[0] + ".labels.txt"
+
+# [END: FUNC: labels_pad]
+
+
+# [FUNC: beschikbaar]
+def beschikbaar(model_path: str = MODEL_PATH) -> bool:
+    """Zijn onnxruntime, NumPy, het model en de labels aanwezig?"""
+    return (
+        ort is not None
+        and np is not None
+        and os.path.isfile(model_path)
+        and os.path.isfile(labels_pad(model_path))
+    )
+
+# [END: FUNC: beschikbaar]
+
+
+# [FUNC: laad_sessie]
+def laad_sessie(
+    model_path: str = MODEL_PATH, threads: Optional[int] = None
+) -> Tuple[Any, List[str], str, Optional[int]]:
+    """
+    Nieuwe CPU-sessie: (sessie, labels, inputnaam, vaste batchgrootte of None).
+    threads = intra-op threads; bij meerdere workerprocessen klein houden.
+    """
+    opts = ort.SessionOptions()
+    opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if threads:
+        opts.intra_op_num_threads = int(threads)
+        opts.inter_op_num_threads = 1
+    sess = ort.InferenceSession(model_path, opts, providers=["CPUExecutionProvider"])
+    with open(labels_pad(model_path), encoding="utf-8") as f:
+        labels = [line.strip() for line in f if line.strip()]
+    inp = sess.get_inputs()[0]
+    fixed = inp.shape[0] if isinstance(inp.shape[0], int) else None
+    logger.info(
+        "Tagmodel geladen: %s (%s labels, batch=%s, threads=%s)",
+        model_path, len(labels), fixed or "dynamisch", threads or "auto",
+    )
+    return sess, labels, inp.name, fixed
+
+# [END: FUNC: laad_sessie]
+
+
+# [FUNC: _get_sessie]
+def _get_sessie() -> Tuple[Any, List[str], str, Optional[int]]:
+    """Lazy, één keer per proces."""
+    global _sessie
+    if _sessie is None:
+        with _sessie_lock:
+            if _sessie is None:
+                _sessie = laad_sessie(MODEL_PATH, _threads)
+    return _sessie
+
+# [END: FUNC: _get_sessie]
+
+
+# [FUNC: _init_worker]
+def _init_worker(threads: Optional[int]) -> None:
+    """Initializer van de procespool: enkel het threadbudget zetten, model laadt lazy."""
+    global _threads
+    _threads = threads
+
+# [END: FUNC: _init_worker]
+
+
+# [FUNC: preprocess]
+def preprocess(image) -> "np.ndarray":
+    """PIL-beeld → genormaliseerde CHW float32-tensor van INPUT_SIZE x INPUT_SIZE."""
+    im = image if image.mode == "RGB" else image.convert("RGB")
+    im = ImageOps.fit(im, (INPUT_SIZE, INPUT_SIZE))
+    arr = np.asarray(im, dtype=np.float32) / 255.0
+    arr = (arr - np.asarray(MEAN, dtype=np.float32)) / np.asarray(STD, dtype=np.float32)
+    return arr.transpose(2, 0, 1)
+
+# [END: FUNC: preprocess]
+
+
+# [FUNC: infer_tensors]
+def infer_tensors(
+    tensors: Sequence["np.ndarray"],
+    sessie: Optional[Tuple[Any, List[str], str, Optional[int]]] = None,
+    batch_size: int = BATCH_SIZE,
+) -> List[List[str]]:
+    """
+    Tags per tensor. Invoer wordt in blokken van vaste grootte gegoten
+    (laatste blok opgevuld met nullen), zodat onnxruntime steeds dezelfde
+    vorm ziet en geheugen kan hergebruiken. Minder tensors dan batch_size
+    (bv. één beeld uit de analysepipeline) → blok van precies die grootte,
+    tenzij het model zelf een vaste batch vereist.
+    """
+    sess, labels, input_name, fixed = sessie or _get_sessie()
+    size = fixed or max(1, min(batch_size, len(tensors)))
+    out: List[List[str]] = []
+    block = np.zeros((size, 3, INPUT_SIZE, INPUT_SIZE), dtype=np.float32)
+    for i in range(0, len(tensors), size):
+        chunk = tensors[i : i + size]
+        block[: len(chunk)] = chunk
+        block[len(chunk) :] = 0.0
+        logits = sess.run(None, {input_name: block})[0][: len(chunk)]
+        logits = logits - logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        probs /= probs.sum(axis=1, keepdims=True)
+        for row in probs:
+            best = np.argsort(row)[::-1][:TOP_K]
+            out.append([labels[j] for j in best if row[j] >= MIN_PROB and j < len(labels)])
+    return out
+
+# [END: FUNC: infer_tensors]
+
 
 # [FUNC: bepaal_ai_tags]
 def bepaal_ai_tags(filepath: str) -> List[str]:
     """
-    Placeholder: bepaal AI-tags voor een mediabestand.
+    AI-tags voor één mediabestand (lokaal ONNX-model, CPU). Leeg als het
+    model ontbreekt of het beeld onleesbaar is.
     """
     logger.debug("bepaal_ai_tags() gestart voor: %s", filepath)
-    # TODO: implementeer AI-tagging
-    return []
+    if not beschikbaar():
+        return []
+    im = load_scaled_pil(filepath, (INPUT_SIZE * 2, INPUT_SIZE * 2))
+    if im is None:
+        return []
+    return bepaal_ai_tags_beeld(im)
 
 # [END: FUNC: bepaal_ai_tags]
 
 
+# [FUNC: bepaal_ai_tags_beeld]
+def bepaal_ai_tags_beeld(image) -> List[str]:
+    """AI-tags voor een reeds gedecodeerd beeld (analysepipeline)."""
+    return infer_tensors([preprocess(image)])[0]
+
+# [END: FUNC: bepaal_ai_tags_beeld]
+
+
+# [FUNC: _tag_paden]
+def _tag_paden(paths: List[str]) -> List[Optional[List[str]]]:
+    """Worker: decodeer een blok paden en tag ze in één vaste batch."""
+    tensors, idx = [], []
+    for i, p in enumerate(paths):
+        im = load_scaled_pil(p, (INPUT_SIZE * 2, INPUT_SIZE * 2))
+        if im is not None:
+            tensors.append(preprocess(im))
+            idx.append(i)
+    out: List[Optional[List[str]]] = [None] * len(paths)
+    if tensors:
+        for i, tags in zip(idx, infer_tensors(tensors)):
+            out[i] = tags
+    return out
+
+# [END: FUNC: _tag_paden]
+
+
+# [FUNC: tag_bibliotheek]
+def tag_bibliotheek(
+    db,
+    workers: int = 2,
+    threads_per_worker: Optional[int] = None,
+    limit: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> Dict[str, int]:
+    """
+    Tag alle images zonder geldige ai_tags-analyse. Elke worker laadt het model
+    één keer en verwerkt blokken van BATCH_SIZE beelden; resultaten gaan per
+    blok in tags/media_tags (aanvullend) en in analysis (tags als payload).
+    """
+    stats = {"todo": 0, "tagged": 0, "failed": 0}
+    if not beschikbaar():
+        logger.warning("AI-tagging overgeslagen: model of onnxruntime ontbreekt (%s)", MODEL_PATH)
+        return stats
+    todo = db.media_needing_analysis(ANALYZER, VERSIE, limit=limit)
+    stats["todo"] = len(todo)
+    if not todo:
+        return stats
+    workers = max(1, int(workers))
+    threads = threads_per_worker or max(1, (os.cpu_count() or 2) // workers)
+    logger.info("AI-tagging: %s images, %s workers x %s threads", len(todo), workers, threads)
+
+    blocks = iter([todo[i : i + BATCH_SIZE] for i in range(0, len(todo), BATCH_SIZE)])
+    pending: Dict[Future, List[Tuple]] = {}
+    done = 0
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(threads,)
+    ) as pool:
+        while True:
+            while len(pending) < workers * 2:
+                block = next(blocks, None)
+                if block is None:
+                    break
+                pending[pool.submit(_tag_paden, [r[1] for r in block])] = block
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                block = pending.pop(fut)
+                try:
+                    results = fut.result()
+                except Exception:
+                    logger.exception("Tag-worker faalde")
+                    results = [None] * len(block)
+                rows, tags = [], {}
+                for (mid, _, size, mtime), names in zip(block, results):
+                    if names is None:
+                        stats["failed"] += 1
+                        rows.append((mid, None, None, size, mtime))
+                        continue
+                    stats["tagged"] += 1
+                    tags[mid] = names
+                    rows.append((mid, float(len(names)), names, size, mtime))
+                db.write_analysis_batch({(ANALYZER, VERSIE): rows}, tags=tags)
+                done += len(block)
+                if progress:
+                    progress(done, len(todo))
+    logger.info("AI-tagging klaar: %s", stats)
+    return stats
+
+# [END: FUNC: tag_bibliotheek]
+
+
 # [SECTION: MAIN]
 if __name__ == "__main__":
     logger.info("ai/bepaal_ai_tags.py standalone run — demo")
@@ -1,26 +1,158 @@
 # [SECTION: IMPORTS]
+import io
 import logging
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
 
+from core.image_loader import Image, load_scaled_pil
 
 # [END: SECTION: IMPORTS]
+# NumPy optioneel (zonder NumPy geen score)
+try:
+    import numpy as np  # type: ignore
+except Exception:
+    np = None  # type: ignore
+
 logger = logging.getLogger(__name__)
 
+ANALYZER = "donkerheid"
+VERSIE = 1  # ophogen als de berekening wijzigt: bestaande scores worden herberekend
+ANALYSE_EDGE = 256  # een histogram heeft geen detail nodig
+# Gewichten van de luminantie-percentielen: mediaan en hoge lichten
+PERCENTIELEN = ((50, 0.6), (95, 0.4))
+
+ProgressCallback = Callable[[int, int], None]
+
+
+# [FUNC: _als_grijs]
+def _als_grijs(buf: Any):
+    """
+    Maak een 2D uint8-luminantiearray van een reeds gedecodeerde buffer:
+    NumPy-array (grijs of RGB), PIL-image of JPEG-bytes van een thumbnail.
+    """
+    if isinstance(buf, (bytes, bytearray, memoryview)):
+        with Image.open(io.BytesIO(buf)) as im:
+            im.draft("L", (ANALYSE_EDGE, ANALYSE_EDGE))
+            return np.asarray(im.convert("L"))
+    if Image is not None and isinstance(buf, Image.Image):
+        return np.asarray(buf if buf.mode == "L" else buf.convert("L"))
+    arr = np.asarray(buf)
+    if arr.ndim == 3:  # RGB(A) → luma (ITU-R 601, zoals PIL 'L')
+        arr = arr[..., 0] * 0.299 + arr[..., 1] * 0.587 + arr[..., 2] * 0.114
+    return np.clip(arr, 0, 255).astype(np.uint8, copy=False)
+
+# [END: FUNC: _als_grijs]
+
+
+# [FUNC: donkerheid_score]
+def donkerheid_score(buf: Any) -> float:
+    """
+    Donkerheid 0.0 (licht) – 1.0 (zwart) uit het luminantiehistogram:
+    gewogen mediaan en 95e percentiel, zodat één fel lampje een onderbelichte
+    foto niet 'licht' maakt en een donkere achtergrond alleen niet volstaat.
+    """
+    gray = _als_grijs(buf)
+    if gray.size == 0:
+        return 0.0
+    cdf = np.cumsum(np.bincount(gray.ravel(), minlength=256))
+    helderheid = 0.0
+    for pct, gewicht in PERCENTIELEN:
+        niveau = int(np.searchsorted(cdf, cdf[-1] * pct / 100.0))
+        helderheid += gewicht * niveau
+    return 1.0 - helderheid / 255.0
+
+# [END: FUNC: donkerheid_score]
+
 
 # [FUNC: detecteer_donkerheid]
-def detecteer_donkerheid(filepath: str) -> float:
+def detecteer_donkerheid(filepath: str) -> Optional[float]:
     """
-    Placeholder: retourneer een 'donkerheids-score' (0.0–1.0).
+    Donkerheidsscore (0.0–1.0) van één beeld op een verkleinde decode.
+    None als het beeld niet te lezen is of NumPy ontbreekt.
     """
     logger.debug("detecteer_donkerheid() gestart voor: %s", filepath)
-    # TODO: implementeer analyse
-    return 0.0
+    if np is None:
+        logger.warning("NumPy niet geïnstalleerd: geen donkerheidsscore")
+        return None
+    im = load_scaled_pil(filepath, (ANALYSE_EDGE, ANALYSE_EDGE), mode="L")
+    if im is None:
+        return None
+    return donkerheid_score(im)
 
 # [END: FUNC: detecteer_donkerheid]
 
 
+# [FUNC: detecteer_donkerheid_batch]
+def detecteer_donkerheid_batch(
+    paths: Iterable[str], buffers: Optional[Mapping[str, Any]] = None
+) -> Dict[str, Optional[float]]:
+    """
+    Donkerheidsscores voor meerdere beelden: {pad: score}.
+    buffers: {pad: thumbnail-bytes / PIL-image / array}; voor die paden wordt
+    het origineel niet geopend. Histogrammen zijn goedkoop genoeg om zonder
+    procespool te draaien zodra de decode al gebeurd is.
+    """
+    buffers = buffers or {}
+    out: Dict[str, Optional[float]] = {}
+    for path in paths:
+        buf = buffers.get(path)
+        if buf is not None and np is not None:
+            try:
+                out[path] = donkerheid_score(buf)
+                continue
+            except Exception:
+                logger.debug("Buffer onbruikbaar, origineel openen: %s", path, exc_info=True)
+        out[path] = detecteer_donkerheid(path)
+    return out
+
+# [END: FUNC: detecteer_donkerheid_batch]
+
+
+# [FUNC: scoor_bibliotheek]
+def scoor_bibliotheek(
+    db,
+    thumbs=None,
+    limit: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> Dict[str, int]:
+    """
+    Scoor alle images zonder geldige donkerheidsscore en bewaar ze in de
+    analysis-tabel. Met een ThumbnailService worden bestaande (geldige)
+    small-thumbnails gebruikt i.p.v. de originelen.
+    """
+    todo = db.media_needing_analysis(ANALYZER, VERSIE, limit=limit)
+    stats = {"todo": len(todo), "from_thumbnail": 0, "from_original": 0}
+    if not todo:
+        return stats
+    logger.info("Donkerheid scoren: %s images", len(todo))
+    done = 0
+    for i in range(0, len(todo), 500):
+        chunk = todo[i : i + 500]
+        paths = [path for _, path, _, _ in chunk]
+        buffers: Dict[str, Any] = {}
+        if thumbs is not None:
+            for path, ref in thumbs.lookup_many(paths, "small").items():
+                data = thumbs.read_thumbnail(ref)
+                if data:
+                    buffers[path] = data
+        scores = detecteer_donkerheid_batch(paths, buffers)
+        rows: List[Tuple[int, Optional[float], Optional[int], Optional[float]]] = [
+            (mid, scores.get(path), size, mtime) for mid, path, size, mtime in chunk
+        ]
+        db.set_analysis_scores(ANALYZER, rows, VERSIE)
+        stats["from_thumbnail"] += len(buffers)
+        stats["from_original"] += len(chunk) - len(buffers)
+        done += len(chunk)
+        if progress:
+            progress(done, len(todo))
+    logger.info("Donkerheid klaar: %s", stats)
+    return stats
+
+# [END: FUNC: scoor_bibliotheek]
+
+
 # [SECTION: MAIN]
 if __name__ == "__main__":
     logger.info("ai/detecteer_donkerheid.py standalone run — demo")
     score = detecteer_donkerheid("demo.jpg")
-    logger.info("Donkerheidsscore: %.3f", score)
+    logger.info("Donkerheidsscore: %s", score)
 # [END: SECTION: MAIN]
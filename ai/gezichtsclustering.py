@@ -0,0 +1,192 @@
+# [SECTION: IMPORTS]
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ai.gezichtsindex import EMBEDDING_DIM, get_face_index
+
+# [END: SECTION: IMPORTS]
+# NumPy optioneel (zonder geen clustering)
+try:
+    import numpy as np  # type: ignore
+except Exception:
+    np = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+ASSIGN_DISTANCE = 0.5  # max. afstand gezicht → centroïde van een bestaande persoon
+EDGE_DISTANCE = 0.5  # max. afstand tussen twee gezichten in de chinese-whispers-graaf
+MIN_CLUSTER_SIZE = 2  # kleinere groepjes blijven onbekend tot er meer foto's zijn
+CLUSTER_BATCH = 5000  # onbekende gezichten per ronde (begrenst de paarsgewijze matrix)
+ITERATIONS = 20
+ROW_CHUNK = 1024
+
+ProgressCallback = Callable[[int, int], None]
+
+
+# [FUNC: _sq_dist]
+def _sq_dist(a: "np.ndarray", b: "np.ndarray") -> "np.ndarray":
+    """Gekwadrateerde euclidische afstanden a x b via één matrixproduct."""
+    d2 = (a * a).sum(1)[:, None] - 2.0 * (a @ b.T) + (b * b).sum(1)[None, :]
+    return np.maximum(d2, 0.0)
+
+# [END: FUNC: _sq_dist]
+
+
+# [FUNC: _centroid_sums]
+def _centroid_sums(
+    emb: "np.ndarray", persons: "np.ndarray"
+) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+    """(person_ids, som van embeddings, aantal) over alle toegewezen gezichten."""
+    assigned = np.flatnonzero(persons >= 0)
+    if not len(assigned):
+        return (
+            np.zeros(0, np.int64),
+            np.zeros((0, EMBEDDING_DIM), np.float64),
+            np.zeros(0, np.int64),
+        )
+    pids, inv = np.unique(persons[assigned], return_inverse=True)
+    order = np.argsort(inv, kind="stable")
+    counts = np.bincount(inv, minlength=len(pids))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    sums = np.add.reduceat(np.asarray(emb[assigned[order]], dtype=np.float64), starts, axis=0)
+    return pids, sums, counts
+
+# [END: FUNC: _centroid_sums]
+
+
+# [FUNC: chinese_whispers]
+def chinese_whispers(
+    vecs: "np.ndarray",
+    threshold: float = EDGE_DISTANCE,
+    iterations: int = ITERATIONS,
+    seed: int = 0,
+) -> "np.ndarray":
+    """
+    Chinese whispers over de graaf "afstand ≤ threshold" (gewicht: hoe
+    dichter, hoe zwaarder). Return: clusterlabel per rij.
+    """
+    n = len(vecs)
+    labels = np.arange(n)
+    if n < 2:
+        return labels
+    vecs = np.asarray(vecs, dtype=np.float32)
+    limit = threshold * threshold
+    neighbours: List[Tuple["np.ndarray", "np.ndarray"]] = []
+    for lo in range(0, n, ROW_CHUNK):
+        d2 = _sq_dist(vecs[lo : lo + ROW_CHUNK], vecs)
+        for r, row in enumerate(d2):
+            js = np.flatnonzero(row <= limit)
+            js = js[js != lo + r]
+            neighbours.append((js, 1.0 - np.sqrt(row[js]) / threshold + 1e-3))
+
+    rng = np.random.default_rng(seed)
+    for _ in range(iterations):
+        changed = 0
+        for i in rng.permutation(n):
+            js, ws = neighbours[i]
+            if not len(js):
+                continue
+            uniq, inv = np.unique(labels[js], return_inverse=True)
+            best = uniq[np.argmax(np.bincount(inv, weights=ws))]
+            if best != labels[i]:
+                labels[i] = best
+                changed += 1
+        if not changed:
+            break
+    return labels
+
+# [END: FUNC: chinese_whispers]
+
+
+# [FUNC: cluster_gezichten]
+def cluster_gezichten(
+    db, full: bool = False, progress: Optional[ProgressCallback] = None
+) -> Dict[str, int]:
+    """
+    Incrementeel personen toewijzen. Enkel gezichten zonder person_id doen mee:
+      1. dichtstbijzijnde persoonscentroïde binnen ASSIGN_DISTANCE → die persoon;
+      2. de rest wordt per CLUSTER_BATCH met chinese whispers gegroepeerd;
+         groepen ≥ MIN_CLUSTER_SIZE worden nieuwe personen.
+    Centroïden worden na elke ronde bijgewerkt, zodat een volgende ronde al op
+    de nieuwe personen kan matchen. Bevestigde toewijzingen blijven altijd
+    staan en een afgewezen persoon (face_rejections) komt nooit terug;
+    full=True wist eerst enkel de automatische toewijzingen.
+    """
+    stats = {"faces": 0, "todo": 0, "assigned": 0, "new_people": 0, "unassigned": 0}
+    if np is None:
+        logger.warning("Gezichtsclustering overgeslagen: NumPy ontbreekt")
+        return stats
+    if full:
+        db.reset_face_assignments()
+    index = get_face_index(db)
+    ids, emb, persons = index.embeddings()
+    persons = np.array(persons, dtype=np.int64)
+    todo = np.flatnonzero(persons < 0)
+    stats["faces"], stats["todo"] = len(ids), len(todo)
+    if not len(todo):
+        return stats
+
+    rejected = db.face_rejections()  # {face_id: [person_id]}: "niet deze persoon"
+    pids, sums, counts = _centroid_sums(emb, persons)
+    for lo in range(0, len(todo), CLUSTER_BATCH):
+        batch = todo[lo : lo + CLUSTER_BATCH]
+        vecs = np.asarray(emb[batch], dtype=np.float32)
+        updates: List[Tuple[int, int]] = []
+
+        if len(pids):
+            centroids = (sums / counts[:, None]).astype(np.float32)
+            column = {int(p): j for j, p in enumerate(pids)}
+            batch_ids = ids[batch].tolist()
+            best = np.empty(len(batch), dtype=np.int64)
+            dist = np.empty(len(batch), dtype=np.float32)
+            for c in range(0, len(batch), ROW_CHUNK):
+                d2 = _sq_dist(vecs[c : c + ROW_CHUNK], centroids)
+                for r, face_id in enumerate(batch_ids[c : c + ROW_CHUNK]):
+                    for pid in rejected.get(face_id, ()):
+                        if pid in column:
+                            d2[r, column[pid]] = np.inf
+                best[c : c + ROW_CHUNK] = np.argmin(d2, axis=1)
+                dist[c : c + ROW_CHUNK] = np.sqrt(d2[np.arange(len(d2)), best[c : c + ROW_CHUNK]])
+            hit = dist <= ASSIGN_DISTANCE
+            np.add.at(sums, best[hit], vecs[hit])
+            counts += np.bincount(best[hit], minlength=len(pids))
+            persons[batch[hit]] = pids[best[hit]]
+            updates.extend(zip(ids[batch[hit]].tolist(), pids[best[hit]].tolist()))
+            stats["assigned"] += int(hit.sum())
+            batch, vecs = batch[~hit], vecs[~hit]
+
+        labels = chinese_whispers(vecs)
+        uniq, sizes = np.unique(labels, return_counts=True)
+        groups = uniq[sizes >= MIN_CLUSTER_SIZE]
+        new_ids = db.create_people(len(groups))
+        for label, pid in zip(groups, new_ids):
+            members = labels == label
+            persons[batch[members]] = pid
+            updates.extend((int(f), pid) for f in ids[batch[members]])
+            pids = np.append(pids, pid)
+            sums = np.vstack((sums, vecs[members].sum(0, dtype=np.float64)))
+            counts = np.append(counts, int(members.sum()))
+        stats["new_people"] += len(new_ids)
+        stats["assigned"] += sum(int((labels == g).sum()) for g in groups)
+
+        db.assign_faces(updates)
+        if updates:
+            index.set_persons([u[0] for u in updates], [u[1] for u in updates])
+        if progress:
+            progress(min(lo + CLUSTER_BATCH, len(todo)), len(todo))
+
+    stats["unassigned"] = stats["todo"] - stats["assigned"]
+    logger.info("Gezichtsclustering klaar: %s", stats)
+    return stats
+
+# [END: FUNC: cluster_gezichten]
+
+
+# [SECTION: MAIN]
+if __name__ == "__main__":
+    from core.db_interface import DbService
+
+    if not logging.getLogger().handlers:
+        logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    print(cluster_gezichten(DbService()))
+# [END: SECTION: MAIN]
@@ -0,0 +1,240 @@
+# [SECTION: IMPORTS]
+import logging
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.image_loader import Image, load_scaled_pil
+
+# [END: SECTION: IMPORTS]
+# dlib en NumPy optioneel (zonder beide geen gezichtsdetectie)
+try:
+    import dlib  # type: ignore
+except Exception:
+    dlib = None  # type: ignore
+try:
+    import numpy as np  # type: ignore
+except Exception:
+    np = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+ANALYZER = "faces"
+VERSIE = 1  # ophogen bij andere modellen/parameters: alle gezichten opnieuw
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_DIR = os.environ.get(
+    "MEDIA_ORG_FACE_MODELS", os.path.join(PROJECT_ROOT, "face_recognition_models", "models")
+)
+SHAPE_PREDICTOR = "shape_predictor_68_face_landmarks.dat"
+FACE_ENCODER = "dlib_face_recognition_resnet_model_v1.dat"
+DETECT_EDGE = 1024  # detectie op verkleinde decode; coördinaten terugschalen
+EMBEDDING_DIM = 128
+WRITE_EVERY = 50  # media per DB-transactie
+
+ProgressCallback = Callable[[int, int], None]
+Face = Tuple[int, int, int, int, bytes]
+
+# Per proces geladen (initializer van de pool, of lazy bij direct gebruik)
+_modellen: Optional[Tuple[Any, Any, Any]] = None
+_model_dir = MODEL_DIR
+
+
+# [FUNC: beschikbaar]
+def beschikbaar(model_dir: str = MODEL_DIR) -> bool:
+    """dlib, NumPy en beide modelbestanden aanwezig?"""
+    return (
+        dlib is not None
+        and np is not None
+        and os.path.isfile(os.path.join(model_dir, SHAPE_PREDICTOR))
+        and os.path.isfile(os.path.join(model_dir, FACE_ENCODER))
+    )
+
+# [END: FUNC: beschikbaar]
+
+
+# [FUNC: _laad_modellen]
+def _laad_modellen() -> Tuple[Any, Any, Any]:
+    """Detector, shape predictor en encoder: één keer per proces."""
+    global _modellen
+    if _modellen is None:
+        _modellen = (
+            dlib.get_frontal_face_detector(),
+            dlib.shape_predictor(os.path.join(_model_dir, SHAPE_PREDICTOR)),
+            dlib.face_recognition_model_v1(os.path.join(_model_dir, FACE_ENCODER)),
+        )
+        logger.debug("dlib-modellen geladen in proces %s", os.getpid())
+    return _modellen
+
+# [END: FUNC: _laad_modellen]
+
+
+# [FUNC: _init_worker]
+def _init_worker(model_dir: str) -> None:
+    """Initializer van de procespool: modellen meteen laden, niet per beeld."""
+    global _model_dir
+    _model_dir = model_dir
+    _laad_modellen()
+
+# [END: FUNC: _init_worker]
+
+
+# [FUNC: detecteer_gezichten]
+def detecteer_gezichten(filepath: str) -> Optional[List[Face]]:
+    """
+    Gezichten in één beeld: [(x, y, w, h, embedding-bytes)] in pixels van het
+    (EXIF-gedraaide) origineel; embedding = 128 x float32. None als onleesbaar.
+    Detectie gebeurt op een verkleinde decode; enkel als daar niets gevonden
+    wordt, volgt één poging met upsampling (kleine gezichten).
+    """
+    detector, predictor, encoder = _laad_modellen()
+    im = load_scaled_pil(filepath, (DETECT_EDGE, DETECT_EDGE))
+    if im is None:
+        return None
+    try:
+        with Image.open(filepath) as orig:
+            scale = max(orig.size) / max(im.size)
+    except Exception:
+        scale = 1.0
+    img = np.ascontiguousarray(np.asarray(im, dtype=np.uint8))
+
+    rects = detector(img, 0)
+    if len(rects) == 0:
+        rects = detector(img, 1)
+
+    faces: List[Face] = []
+    for r in rects:
+        shape = predictor(img, r)
+        vec = np.asarray(encoder.compute_face_descriptor(img, shape), dtype=np.float32)
+        x, y = max(0, r.left()), max(0, r.top())
+        w, h = r.right() - x, r.bottom() - y
+        faces.append(
+            (
+                int(round(x * scale)),
+                int(round(y * scale)),
+                int(round(w * scale)),
+                int(round(h * scale)),
+                vec.tobytes(),
+            )
+        )
+    return faces
+
+# [END: FUNC: detecteer_gezichten]
+
+
+# [FUNC: _detecteer_veilig]
+def _detecteer_veilig(filepath: str) -> Optional[List[Face]]:
+    try:
+        return detecteer_gezichten(filepath)
+    except Exception:
+        logger.warning("Gezichtsdetectie mislukt: %s", filepath, exc_info=True)
+        return None
+
+# [END: FUNC: _detecteer_veilig]
+
+
+# [FUNC: verwerk_bibliotheek]
+def verwerk_bibliotheek(
+    db,
+    workers: Optional[int] = None,
+    limit: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> Dict[str, int]:
+    """
+    Detecteer gezichten in alle images zonder geldige 'faces'-analyse en
+    schrijf ze per WRITE_EVERY media in één transactie (faces + analysis).
+    Hervatbaar: wat al vastgelegd is, wordt bij een volgende run overgeslagen.
+    Een native crash (dlib) breekt de pool: afgewerkte resultaten worden
+    weggeschreven, de pool herstart en het crashende bestand wordt als
+    mislukt (score NULL) vastgelegd, zodat een volgende run er niet opnieuw op valt.
+    """
+    stats = {"todo": 0, "done": 0, "failed": 0, "faces": 0}
+    if not beschikbaar():
+        logger.warning("Gezichtsdetectie overgeslagen: dlib of modellen ontbreken (%s)", MODEL_DIR)
+        return stats
+    todo = db.media_needing_analysis(ANALYZER, VERSIE, limit=limit)
+    stats["todo"] = len(todo)
+    if not todo:
+        return stats
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    logger.info("Gezichtsdetectie: %s images, %s workers", len(todo), workers)
+
+    def _nieuwe_pool() -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(MODEL_DIR,)
+        )
+
+    rows = iter(todo)
+    pending: Dict[Future, Tuple[int, str, Optional[int], Optional[float]]] = {}
+    # in de lucht toen een worker crashte: één voor één opnieuw, zodat het
+    # bestand dat dlib laat crashen gevonden en als mislukt vastgelegd wordt
+    suspects: List[Tuple[int, str, Optional[int], Optional[float]]] = []
+    results: List[Tuple] = []
+    faces: Dict[int, List[Face]] = {}
+    done = 0
+    pool = _nieuwe_pool()
+    try:
+        while True:
+            if suspects:
+                if not pending:
+                    row = suspects.pop()
+                    pending[pool.submit(_detecteer_veilig, row[1])] = row
+            else:
+                while len(pending) < workers * 4:
+                    row = next(rows, None)
+                    if row is None:
+                        break
+                    pending[pool.submit(_detecteer_veilig, row[1])] = row
+            if not pending:
+                break
+            alone = len(pending) == 1  # crash met één bestand in de lucht: dat is de dader
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            broken = False
+            for fut in finished:
+                media_id, path, size, mtime = row = pending.pop(fut)
+                try:
+                    found = fut.result()
+                except BrokenProcessPool:
+                    broken = True
+                    if not alone:
+                        suspects.append(row)
+                        continue
+                    logger.error("Gezichtsdetectie liet de worker crashen: %s", path)
+                    found = None
+                done += 1
+                if found is None:
+                    stats["failed"] += 1
+                    results.append((media_id, None, None, size, mtime))
+                    continue
+                stats["done"] += 1
+                stats["faces"] += len(found)
+                faces[media_id] = found
+                results.append((media_id, float(len(found)), None, size, mtime))
+            if broken:
+                suspects.extend(pending.values())
+                pending.clear()
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = _nieuwe_pool()
+            if broken or len(results) >= WRITE_EVERY:
+                db.write_analysis_batch({(ANALYZER, VERSIE): results}, faces=faces)
+                results, faces = [], {}
+            if progress:
+                progress(done, len(todo))
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    db.write_analysis_batch({(ANALYZER, VERSIE): results}, faces=faces)
+    logger.info("Gezichtsdetectie klaar: %s", stats)
+    return stats
+
+# [END: FUNC: verwerk_bibliotheek]
+
+
+# [SECTION: MAIN]
+if __name__ == "__main__":
+    from core.db_interface import DbService
+
+    if not logging.getLogger().handlers:
+        logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    print(verwerk_bibliotheek(DbService()))
+# [END: SECTION: MAIN]
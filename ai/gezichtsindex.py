@@ -0,0 +1,255 @@
+# [SECTION: IMPORTS]
+import logging
+import os
+import threading
+from typing import Dict, List, Tuple
+
+# [END: SECTION: IMPORTS]
+# NumPy optioneel (zonder geen gezichtsindex)
+try:
+    import numpy as np  # type: ignore
+except Exception:
+    np = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIM = 128  # dlib face_recognition_model_v1
+MATCH_DISTANCE = 0.6  # gangbare dlib-drempel (euclidisch) voor "zelfde persoon"
+COPY_CHUNK = 65_536  # rijen per blok bij herschrijven
+
+
+# [CLASS: FaceIndex]
+# [SECTION: CLASS: FaceIndex]
+class FaceIndex:
+    """
+    Alle gezichtsembeddings als één aaneengesloten float32-matrix naast de DB:
+      <db>.face_emb.npy  N x 128 float32 (rij i hoort bij face_ids[i])
+      <db>.face_ids.npy  N int64 faces.id, oplopend
+    Beide worden gememory-mapt. sync() leest enkel nieuwe faces-rijen uit
+    SQLite en laat verwijderde gezichten vallen; person_id's veranderen vaak
+    en worden daarom niet bewaard maar bij elke sync() opnieuw gelezen.
+    """
+
+# [FUNC: __init__]
+    def __init__(self, db_path: str) -> None:
+        base = os.path.splitext(os.path.abspath(db_path))[0]
+        self.emb_path = base + ".face_emb.npy"
+        self.ids_path = base + ".face_ids.npy"
+        self._lock = threading.Lock()
+        self._emb = None
+        self._ids = None
+        self._sq = None  # ||x||² per rij, voor de afstand via één matrixproduct
+        self._persons = None  # person_id per rij, -1 = niet toegewezen
+
+# [END: FUNC: __init__]
+
+# [FUNC: __len__]
+    def __len__(self) -> int:
+        return 0 if self._ids is None else len(self._ids)
+
+# [END: FUNC: __len__]
+
+# [FUNC: load]
+    def load(self) -> "FaceIndex":
+        """Map de bestanden (read-only) in het geheugen; leeg als ze ontbreken."""
+        with self._lock:
+            self._emb = self._ids = self._sq = None
+            if os.path.exists(self.emb_path) and os.path.exists(self.ids_path):
+                self._emb = np.load(self.emb_path, mmap_mode="r")
+                self._ids = np.load(self.ids_path, mmap_mode="r")
+                if len(self._emb) != len(self._ids) or (
+                    len(self._emb) and self._emb.shape[1] != EMBEDDING_DIM
+                ):
+                    logger.warning("Gezichtsindex inconsistent, wordt opnieuw opgebouwd")
+                    self._emb = self._ids = None
+            if self._ids is not None and len(self._ids):
+                self._sq = np.einsum("ij,ij->i", self._emb, self._emb)
+            if self._persons is None or len(self._persons) != len(self):
+                self._persons = np.full(len(self), -1, dtype=np.int64)
+        return self
+
+# [END: FUNC: load]
+
+# [FUNC: _rewrite]
+    def _rewrite(self, keep: "np.ndarray", new_ids: "np.ndarray", new_emb: "np.ndarray") -> None:
+        """Schrijf behouden rijen + nieuwe rijen naar tijdelijke .npy's en vervang atomisch."""
+        n_keep = int(keep.sum()) if len(keep) else 0
+        total = n_keep + len(new_ids)
+        tmp_emb, tmp_ids = self.emb_path + ".tmp.npy", self.ids_path + ".tmp.npy"
+        out_emb = np.lib.format.open_memmap(
+            tmp_emb, mode="w+", dtype=np.float32, shape=(total, EMBEDDING_DIM)
+        )
+        out_ids = np.lib.format.open_memmap(tmp_ids, mode="w+", dtype=np.int64, shape=(total,))
+        pos = 0
+        if n_keep:
+            rows = np.flatnonzero(keep)
+            for lo in range(0, len(rows), COPY_CHUNK):
+                part = rows[lo : lo + COPY_CHUNK]
+                out_emb[pos : pos + len(part)] = self._emb[part]
+                out_ids[pos : pos + len(part)] = self._ids[part]
+                pos += len(part)
+        out_emb[pos:] = new_emb
+        out_ids[pos:] = new_ids
+        out_emb.flush()
+        out_ids.flush()
+        del out_emb, out_ids
+        with self._lock:
+            self._emb = self._ids = self._sq = None  # mmaps los vóór os.replace (Windows)
+            os.replace(tmp_emb, self.emb_path)
+            os.replace(tmp_ids, self.ids_path)
+
+# [END: FUNC: _rewrite]
+
+# [FUNC: sync]
+    def sync(self, db) -> Dict[str, int]:
+        """
+        Breng de index in lijn met de faces-tabel: nieuwe gezichten toevoegen,
+        verwijderde weglaten (enkel dan wordt het bestand herschreven) en de
+        person_id's verversen. Return: {"added", "removed", "total"}.
+        """
+        if self._ids is None:
+            self.load()
+        rows = db.face_person_rows()
+        live = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        persons = np.fromiter(
+            (-1 if r[1] is None else r[1] for r in rows), dtype=np.int64, count=len(rows)
+        )
+        # kopie: een view hield de .npy-mmap open tijdens os.replace in _rewrite (Windows)
+        have = np.array(self._ids) if self._ids is not None else np.zeros(0, np.int64)
+        keep = np.isin(have, live)
+        missing = live[~np.isin(live, have)]
+
+        added = removed = 0
+        if len(missing) or not keep.all():
+            new_ids: List[int] = []
+            blobs: List[bytes] = []
+            for fid, blob in db.face_embeddings(missing.tolist()):
+                if len(blob) == EMBEDDING_DIM * 4:
+                    new_ids.append(fid)
+                    blobs.append(blob)
+                else:
+                    logger.warning("Gezicht %s: embedding van %s bytes overgeslagen", fid, len(blob))
+            new_emb = (
+                np.frombuffer(b"".join(blobs), dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+                if blobs
+                else np.zeros((0, EMBEDDING_DIM), np.float32)
+            )
+            added, removed = len(new_ids), int((~keep).sum())
+            self._rewrite(keep, np.asarray(new_ids, dtype=np.int64), new_emb)
+            self.load()
+            if len(self._ids) > 1 and np.any(np.diff(self._ids) < 0):
+                # nieuwe id's lager dan bestaande (bv. hersteld uit back-up): sorteren
+                order = np.argsort(self._ids, kind="stable")
+                self._rewrite(
+                    np.zeros(0, bool), np.asarray(self._ids)[order], np.asarray(self._emb)[order]
+                )
+                self.load()
+
+        # person_id's uitlijnen op de rijen van de index (beide oplopend op id)
+        pos = np.searchsorted(live, self._ids) if len(self) else np.zeros(0, np.int64)
+        self._persons = persons[pos] if len(self) else np.zeros(0, np.int64)
+        if added or removed:
+            logger.info("Gezichtsindex: +%s −%s → %s gezichten", added, removed, len(self))
+        return {"added": added, "removed": removed, "total": len(self)}
+
+# [END: FUNC: sync]
+
+# [FUNC: set_persons]
+    def set_persons(self, face_ids, person_ids) -> None:
+        """Werk de in-memory person_id's bij zonder een volledige sync()."""
+        if not len(self):
+            return
+        face_ids = np.asarray(face_ids, dtype=np.int64)
+        pos = np.searchsorted(self._ids, face_ids)
+        ok = (pos < len(self._ids)) & (self._ids[np.minimum(pos, len(self._ids) - 1)] == face_ids)
+        self._persons[pos[ok]] = np.asarray(person_ids, dtype=np.int64)[ok]
+
+# [END: FUNC: set_persons]
+
+# [FUNC: embeddings]
+    def embeddings(self) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+        """(face_ids, embeddings, person_ids) — gememory-mapt, niet kopiëren."""
+        if not len(self):
+            return (
+                np.zeros(0, np.int64),
+                np.zeros((0, EMBEDDING_DIM), np.float32),
+                np.zeros(0, np.int64),
+            )
+        return self._ids, self._emb, self._persons
+
+# [END: FUNC: embeddings]
+
+# [FUNC: distances]
+    def distances(self, query: "np.ndarray") -> "np.ndarray":
+        """Euclidische afstand van query tot elk gezicht: één matrix-vectorproduct."""
+        q = np.asarray(query, dtype=np.float32).reshape(-1)
+        if not len(self):
+            return np.zeros(0, np.float32)
+        d2 = self._sq - 2.0 * (self._emb @ q) + float(q @ q)
+        return np.sqrt(np.maximum(d2, 0.0))
+
+# [END: FUNC: distances]
+
+# [FUNC: nearest_faces]
+    def nearest_faces(self, query: "np.ndarray", k: int = 10) -> List[Tuple[int, float]]:
+        """Top-k dichtstbijzijnde gezichten: [(face_id, afstand)]."""
+        d = self.distances(query)
+        if not len(d):
+            return []
+        k = min(k, len(d))
+        top = np.argpartition(d, k - 1)[:k]
+        top = top[np.argsort(d[top])]
+        return [(int(self._ids[i]), float(d[i])) for i in top]
+
+# [END: FUNC: nearest_faces]
+
+# [FUNC: nearest_people]
+    def nearest_people(
+        self, query: "np.ndarray", k: int = 5, max_distance: float = MATCH_DISTANCE
+    ) -> List[Tuple[int, float, int]]:
+        """
+        Top-k personen voor een embedding: [(person_id, afstand, face_id)] met
+        per persoon het dichtstbijzijnde toegewezen gezicht binnen max_distance.
+        """
+        d = self.distances(query)
+        if not len(d):
+            return []
+        cand = np.flatnonzero((self._persons >= 0) & (d <= max_distance))
+        if not len(cand):
+            return []
+        cand = cand[np.argsort(d[cand], kind="stable")]
+        _, first = np.unique(self._persons[cand], return_index=True)
+        best = cand[np.sort(first)][:k]
+        return [(int(self._persons[i]), float(d[i]), int(self._ids[i])) for i in best]
+
+# [END: FUNC: nearest_people]
+# [END: SECTION: CLASS: FaceIndex]
+# [END: CLASS: FaceIndex]
+
+
+_indexes: Dict[str, FaceIndex] = {}
+
+
+# [FUNC: get_face_index]
+def get_face_index(db, sync: bool = True) -> FaceIndex:
+    """Gedeelde index naast de database, één per proces; standaard gesynchroniseerd."""
+    key = os.path.abspath(db.db_path)
+    idx = _indexes.get(key)
+    if idx is None:
+        idx = _indexes[key] = FaceIndex(key).load()
+    if sync:
+        idx.sync(db)
+    return idx
+
+# [END: FUNC: get_face_index]
+
+
+# [SECTION: MAIN]
+if __name__ == "__main__":
+    from core.db_interface import DbService
+
+    if not logging.getLogger().handlers:
+        logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    index = get_face_index(DbService())
+    print(f"{len(index)} gezichten in de index")
+# [END: SECTION: MAIN]
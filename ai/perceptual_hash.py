@@ -0,0 +1,225 @@
+# [SECTION: IMPORTS]
+from __future__ import annotations
+
+import logging
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from core.db_interface import DbService
+from core.image_loader import Image, load_scaled_pil
+
+# [END: SECTION: IMPORTS]
+
+# [SECTION: LOGGER]
+logger = logging.getLogger(__name__)
+# [END: SECTION: LOGGER]
+
+DECODE_EDGE = 64  # eerst goedkoop decoderen op ~64 px, dan pas naar 9x8
+DEFAULT_THRESHOLD = 6  # max. Hamming-afstand voor "bijna identiek"
+
+ProgressCallback = Callable[[int, int], None]
+
+
+# [FUNC: def hamming]
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+# [END: FUNC: def hamming]
+
+# [FUNC: def dhash_image]
+def dhash_image(im) -> str:
+    """
+    Verschil-hash (dHash) van een reeds gedecodeerd PIL-beeld: grijswaarden
+    9x8, per rij 'is pixel links helderder dan rechts' → 64 bits, als 16 hex-tekens.
+    Robuust tegen herschalen en hercomprimeren.
+    """
+    gray = im if im.mode == "L" else im.convert("L")
+    if max(gray.size) > DECODE_EDGE:
+        gray = gray.copy()
+        gray.thumbnail((DECODE_EDGE, DECODE_EDGE), Image.Resampling.BILINEAR)
+    px = list(gray.resize((9, 8), Image.Resampling.LANCZOS).getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (px[row * 9 + col] > px[row * 9 + col + 1])
+    return f"{value:016x}"
+
+# [END: FUNC: def dhash_image]
+
+# [FUNC: def dhash]
+def dhash(path: str) -> Optional[str]:
+    """dHash van een bestand (goedkope decode op ~64 px), of None als onleesbaar."""
+    im = load_scaled_pil(path, (DECODE_EDGE, DECODE_EDGE), mode="L")
+    if im is None:
+        return None
+    return dhash_image(im)
+
+# [END: FUNC: def dhash]
+
+
+# [CLASS: BKTree]
+# [SECTION: CLASS: BKTree]
+class BKTree:
+    """
+    Burkhard-Keller-boom over Hamming-afstand: een drempelquery bezoekt enkel
+    kinderen met afstand in [d - t, d + t] (driehoeksongelijkheid), waardoor
+    zoeken over de hele bibliotheek ruim onder kwadratisch blijft.
+    Identieke hashes delen één knoop.
+    """
+
+# [FUNC: __init__]
+    def __init__(self) -> None:
+        # knoop = [hash, [media_ids], {afstand: kindknoop}]
+        self._root: Optional[list] = None
+        self.size = 0
+
+# [END: FUNC: __init__]
+
+# [FUNC: add]
+    def add(self, value: int, media_id: int) -> None:
+        self.size += 1
+        if self._root is None:
+            self._root = [value, [media_id], {}]
+            return
+        node = self._root
+        while True:
+            d = hamming(value, node[0])
+            if d == 0:
+                node[1].append(media_id)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [value, [media_id], {}]
+                return
+            node = child
+
+# [END: FUNC: add]
+
+# [FUNC: search]
+    def search(self, value: int, threshold: int) -> Iterator[Tuple[int, int, int]]:
+        """Alle (media_id, hash, afstand) binnen threshold van value."""
+        if self._root is None:
+            return
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            d = hamming(value, node[0])
+            if d <= threshold:
+                for media_id in node[1]:
+                    yield media_id, node[0], d
+            lo, hi = d - threshold, d + threshold
+            stack.extend(child for dist, child in node[2].items() if lo <= dist <= hi)
+
+# [END: FUNC: search]
+# [END: SECTION: CLASS: BKTree]
+# [END: CLASS: BKTree]
+
+
+# [FUNC: def update_phashes]
+def update_phashes(
+    db: DbService,
+    workers: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> int:
+    """Bereken ontbrekende/verouderde dHashes in een procespool. Return: aantal."""
+    todo = db.media_needing_phash()
+    if not todo:
+        return 0
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    logger.info("Perceptuele hashes berekenen: %s images", len(todo))
+
+    rows = iter(todo)
+    pending: Dict[Future, Tuple[int, str, Optional[int], Optional[float]]] = {}
+    batch: List[Tuple[int, Optional[str], Optional[int], Optional[float]]] = []
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            while len(pending) < workers * 4:
+                row = next(rows, None)
+                if row is None:
+                    break
+                pending[pool.submit(dhash, row[1])] = row
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                media_id, path, size, mtime = pending.pop(fut)
+                try:
+                    value = fut.result()
+                except Exception:
+                    logger.warning("dHash mislukt: %s", path, exc_info=True)
+                    value = None
+                batch.append((media_id, value, size, mtime))
+                done += 1
+            if len(batch) >= 500:
+                db.set_phashes(batch)
+                batch = []
+            if progress:
+                progress(done, len(todo))
+    db.set_phashes(batch)
+    return done
+
+# [END: FUNC: def update_phashes]
+
+# [FUNC: def find_near_duplicates]
+def find_near_duplicates(
+    db: DbService,
+    threshold: int = DEFAULT_THRESHOLD,
+    workers: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> Dict[str, int]:
+    """
+    Job "bijna-duplicaten zoeken": werk dHashes bij, bouw een BK-tree en voeg
+    alle paren binnen threshold samen (union-find) tot groepen in near_duplicates.
+    """
+    hashed = update_phashes(db, workers=workers, progress=progress)
+    items = [(mid, int(ph, 16)) for mid, ph in db.valid_phashes()]
+
+    tree = BKTree()
+    for mid, value in items:
+        tree.add(value, mid)
+
+    parent: Dict[int, int] = {}
+
+    def find(x: int) -> int:
+        root = x
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while x != root:  # padcompressie
+            parent[x], x = root, parent[x]
+        return root
+
+    for mid, value in items:
+        for other, _, _ in tree.search(value, threshold):
+            if other != mid:
+                a, b = find(mid), find(other)
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+
+    by_id = dict(items)
+    out: List[Tuple[int, int, int]] = []
+    members: Dict[int, List[int]] = {}
+    for mid in list(parent):  # enkel ids die ooit samengevoegd zijn
+        members.setdefault(find(mid), []).append(mid)
+    for root, ids in members.items():
+        for mid in [root, *ids]:
+            out.append((mid, root, hamming(by_id[mid], by_id[root])))
+
+    db.replace_near_duplicates(out)
+    stats = {"hashed": hashed, "indexed": len(items), "groups": len(members), "members": len(out)}
+    logger.info("Bijna-duplicaten klaar: %s", stats)
+    return stats
+
+# [END: FUNC: def find_near_duplicates]
+
+
+# [SECTION: MAIN]
+if __name__ == "__main__":
+    if not logging.getLogger().handlers:
+        logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    _db = DbService()
+    print(find_near_duplicates(_db))
+    for g in _db.get_near_duplicate_groups(limit=20):
+        print(g["distances"], g["paths"])
+# [END: SECTION: MAIN]
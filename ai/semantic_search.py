@@ -0,0 +1,542 @@
+# [SECTION: IMPORTS]
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from core.image_loader import ImageOps, load_scaled_pil
+
+# [END: SECTION: IMPORTS]
+# NumPy, onnxruntime en tokenizers optioneel (zonder: geen semantisch zoeken)
+try:
+    import numpy as np  # type: ignore
+except Exception:
+    np = None  # type: ignore
+try:
+    import onnxruntime as ort  # type: ignore
+except Exception:
+    ort = None  # type: ignore
+try:
+    from tokenizers import Tokenizer  # type: ignore
+except Exception:
+    Tokenizer = None  # type: ignore
+
+# [SECTION: LOGGER]
+logger = logging.getLogger(__name__)
+# [END: SECTION: LOGGER]
+
+ANALYZER = "embedding"
+VERSIE = 1  # ophogen bij een ander model: alle embeddings worden herberekend
+
+# Lokale CLIP-achtige modellen (volledig offline) in <project>/ai_models/
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_DIR = os.environ.get("MEDIA_ORG_CLIP_DIR", os.path.join(PROJECT_ROOT, "ai_models"))
+IMAGE_MODEL = os.path.join(MODEL_DIR, "clip_image.onnx")
+TEXT_MODEL = os.path.join(MODEL_DIR, "clip_text.onnx")
+TOKENIZER = os.path.join(MODEL_DIR, "clip_tokenizer.json")
+INPUT_SIZE = 224
+CONTEXT_LENGTH = 77
+MEAN = (0.48145466, 0.4578275, 0.40821073)
+STD = (0.26862954, 0.26130258, 0.27577711)
+BATCH_SIZE = 16
+
+IVF_MIN_VECTORS = 50_000  # daaronder is brute force snel genoeg
+DEFAULT_NPROBE = 16
+SCAN_CHUNK = 65_536  # rijen per blok bij brute force (float16 → float32)
+
+ProgressCallback = Callable[[int, int], None]
+
+# Per proces: sessies pas bij het eerste gebruik laden
+_sessies: Dict[str, Any] = {}
+_sessie_lock = threading.Lock()
+_threads: Optional[int] = None
+
+
+# [FUNC: def beschikbaar]
+def beschikbaar(tekst: bool = False) -> bool:
+    """Beeldmodel (en voor tekstqueries: tekstmodel + tokenizer) aanwezig?"""
+    if np is None or ort is None or not os.path.isfile(IMAGE_MODEL):
+        return False
+    if tekst:
+        return Tokenizer is not None and os.path.isfile(TEXT_MODEL) and os.path.isfile(TOKENIZER)
+    return True
+
+# [END: FUNC: def beschikbaar]
+
+# [FUNC: def _sessie]
+def _sessie(path: str) -> Any:
+    """Lazy CPU-sessie per modelbestand, één keer per proces."""
+    sess = _sessies.get(path)
+    if sess is None:
+        with _sessie_lock:
+            sess = _sessies.get(path)
+            if sess is None:
+                opts = ort.SessionOptions()
+                opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+                if _threads:
+                    opts.intra_op_num_threads = int(_threads)
+                    opts.inter_op_num_threads = 1
+                sess = ort.InferenceSession(path, opts, providers=["CPUExecutionProvider"])
+                _sessies[path] = sess
+                logger.info("Embeddingmodel geladen: %s", path)
+    return sess
+
+# [END: FUNC: def _sessie]
+
+# [FUNC: def _init_worker]
+def _init_worker(threads: Optional[int]) -> None:
+    global _threads
+    _threads = threads
+
+# [END: FUNC: def _init_worker]
+
+# [FUNC: def _normaliseer]
+def _normaliseer(vecs: "np.ndarray") -> "np.ndarray":
+    vecs = np.asarray(vecs, dtype=np.float32)
+    norms = np.linalg.norm(vecs, axis=-1, keepdims=True)
+    return vecs / np.maximum(norms, 1e-12)
+
+# [END: FUNC: def _normaliseer]
+
+# [FUNC: def preprocess]
+def preprocess(image) -> "np.ndarray":
+    """PIL-beeld → genormaliseerde CHW float32-tensor voor het beeldmodel."""
+    im = image if image.mode == "RGB" else image.convert("RGB")
+    im = ImageOps.fit(im, (INPUT_SIZE, INPUT_SIZE))
+    arr = np.asarray(im, dtype=np.float32) / 255.0
+    arr = (arr - np.asarray(MEAN, dtype=np.float32)) / np.asarray(STD, dtype=np.float32)
+    return arr.transpose(2, 0, 1)
+
+# [END: FUNC: def preprocess]
+
+# [FUNC: def embed_tensors]
+def embed_tensors(tensors: Sequence["np.ndarray"]) -> "np.ndarray":
+    """Genormaliseerde beeld-embeddings (N x D) in vaste batches van BATCH_SIZE."""
+    sess = _sessie(IMAGE_MODEL)
+    inp = sess.get_inputs()[0]
+    size = inp.shape[0] if isinstance(inp.shape[0], int) else BATCH_SIZE
+    block = np.zeros((size, 3, INPUT_SIZE, INPUT_SIZE), dtype=np.float32)
+    out = []
+    for i in range(0, len(tensors), size):
+        chunk = tensors[i : i + size]
+        block[: len(chunk)] = chunk
+        block[len(chunk) :] = 0.0
+        out.append(sess.run(None, {inp.name: block})[0][: len(chunk)])
+    return _normaliseer(np.concatenate(out)) if out else np.zeros((0, 0), np.float32)
+
+# [END: FUNC: def embed_tensors]
+
+# [FUNC: def embed_tekst]
+def embed_tekst(tekst: str) -> "np.ndarray":
+    """Genormaliseerde tekst-embedding (D,) voor een zoekopdracht."""
+    sess = _sessie(TEXT_MODEL)
+    tok = Tokenizer.from_file(TOKENIZER)
+    ids = tok.encode(tekst).ids[:CONTEXT_LENGTH]
+    arr = np.zeros((1, CONTEXT_LENGTH), dtype=np.int64)
+    arr[0, : len(ids)] = ids
+    feed = {}
+    for inp in sess.get_inputs():
+        if "mask" in inp.name:
+            mask = np.zeros_like(arr)
+            mask[0, : len(ids)] = 1
+            feed[inp.name] = mask
+        else:
+            feed[inp.name] = arr
+    return _normaliseer(sess.run(None, feed)[0])[0]
+
+# [END: FUNC: def embed_tekst]
+
+
+# [CLASS: EmbeddingIndex]
+# [SECTION: CLASS: EmbeddingIndex]
+class EmbeddingIndex:
+    """
+    Embeddings als float16-matrix op schijf, bij openen gememory-mapt:
+      vectors.f16  N x D float16 (rij i hoort bij ids[i])
+      ids.i64      N int64 media_ids
+      ivf.npz      centroïden + offsets: de eerste ivf_count rijen staan
+                   per cluster aaneengesloten (IVF-lijsten als slices)
+      meta.json    dim, count, ivf_count
+    Nieuwe embeddings worden achteraan toegevoegd (ongeïndexeerde staart,
+    brute force doorzocht) tot build_ivf() alles opnieuw indeelt.
+    Een media_id die meermaals voorkomt telt enkel met zijn laatste rij.
+    """
+
+# [FUNC: __init__]
+    def __init__(self, folder: str) -> None:
+        self.folder = folder
+        self._lock = threading.Lock()
+        self.dim = 0
+        self.count = 0
+        self.ivf_count = 0
+        self._vectors = None
+        self._ids = None
+        self._live = None
+        self._centroids = None
+        self._offsets = None
+        self._loaded_count = -1
+
+# [END: FUNC: __init__]
+
+# [FUNC: _path]
+    def _path(self, name: str) -> str:
+        return os.path.join(self.folder, name)
+
+# [END: FUNC: _path]
+
+# [FUNC: _read_meta]
+    def _read_meta(self) -> Dict[str, int]:
+        try:
+            with open(self._path("meta.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"dim": 0, "count": 0, "ivf_count": 0}
+
+# [END: FUNC: _read_meta]
+
+# [FUNC: _write_meta]
+    def _write_meta(self) -> None:
+        tmp = self._path("meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "count": self.count, "ivf_count": self.ivf_count}, f)
+        os.replace(tmp, self._path("meta.json"))
+
+# [END: FUNC: _write_meta]
+
+# [FUNC: load]
+    def load(self) -> "EmbeddingIndex":
+        """(Her)map de bestanden als ze gewijzigd zijn sinds de vorige load."""
+        meta = self._read_meta()
+        with self._lock:
+            if meta["count"] == self._loaded_count and meta.get("ivf_count") == self.ivf_count:
+                return self
+            self.dim, self.count = int(meta["dim"]), int(meta["count"])
+            self.ivf_count = int(meta.get("ivf_count", 0))
+            if self.count == 0:
+                self._vectors = self._ids = self._live = None
+                self._loaded_count = 0
+                return self
+            self._vectors = np.memmap(
+                self._path("vectors.f16"), dtype=np.float16, mode="r", shape=(self.count, self.dim)
+            )
+            self._ids = np.memmap(self._path("ids.i64"), dtype=np.int64, mode="r", shape=(self.count,))
+            # laatste rij per media_id is geldig
+            _, last_rev = np.unique(self._ids[::-1], return_index=True)
+            live = np.zeros(self.count, dtype=bool)
+            live[self.count - 1 - last_rev] = True
+            self._live = live
+            self._centroids = self._offsets = None
+            if self.ivf_count and os.path.exists(self._path("ivf.npz")):
+                with np.load(self._path("ivf.npz")) as z:
+                    self._centroids = z["centroids"].astype(np.float32)
+                    self._offsets = z["offsets"].astype(np.int64)
+            else:
+                self.ivf_count = 0
+            self._loaded_count = self.count
+            logger.info(
+                "EmbeddingIndex geladen: %s vectoren (dim %s, ivf %s)",
+                self.count, self.dim, self.ivf_count,
+            )
+        return self
+
+# [END: FUNC: load]
+
+# [FUNC: add]
+    def add(self, media_ids: Sequence[int], vectors: "np.ndarray") -> None:
+        """Voeg (genormaliseerde) embeddings achteraan toe."""
+        vecs = np.asarray(vectors, dtype=np.float16)
+        if not len(vecs):
+            return
+        os.makedirs(self.folder, exist_ok=True)
+        meta = self._read_meta()
+        self.dim, self.count = int(meta["dim"]) or vecs.shape[1], int(meta["count"])
+        self.ivf_count = int(meta.get("ivf_count", 0))
+        if vecs.shape[1] != self.dim:
+            raise ValueError(f"Embedding-dimensie {vecs.shape[1]} ≠ index {self.dim}")
+        # meta["count"] is de waarheid: bytes van een onderbroken append (na de
+        # laatste meta-write) eerst afknippen, zodat vectoren en ids in de pas blijven
+        for name, row_bytes, data in (
+            ("vectors.f16", self.dim * 2, np.ascontiguousarray(vecs).tobytes()),
+            ("ids.i64", 8, np.asarray(media_ids, dtype=np.int64).tobytes()),
+        ):
+            path = self._path(name)
+            with open(path, "r+b" if os.path.exists(path) else "w+b") as f:
+                if os.fstat(f.fileno()).st_size != self.count * row_bytes:
+                    logger.warning("EmbeddingIndex: onvolledige append in %s hersteld", name)
+                    f.truncate(self.count * row_bytes)
+                f.seek(0, os.SEEK_END)
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+        self.count += len(vecs)
+        self._write_meta()  # pas nu tellen de nieuwe rijen mee
+
+# [END: FUNC: add]
+
+# [FUNC: vector_for]
+    def vector_for(self, media_id: int) -> Optional["np.ndarray"]:
+        self.load()
+        if self._ids is None:
+            return None
+        hits = np.flatnonzero((self._ids == media_id) & self._live)
+        return self._vectors[hits[-1]].astype(np.float32) if len(hits) else None
+
+# [END: FUNC: vector_for]
+
+# [FUNC: _scan]
+    def _scan(self, q: "np.ndarray", start: int, stop: int) -> Tuple["np.ndarray", "np.ndarray"]:
+        """Brute force over rijen [start, stop) in blokken; (rij-indexen, scores)."""
+        rows, scores = [], []
+        for lo in range(start, stop, SCAN_CHUNK):
+            hi = min(stop, lo + SCAN_CHUNK)
+            scores.append(self._vectors[lo:hi].astype(np.float32) @ q)
+            rows.append(np.arange(lo, hi))
+        if not rows:
+            return np.zeros(0, np.int64), np.zeros(0, np.float32)
+        return np.concatenate(rows), np.concatenate(scores)
+
+# [END: FUNC: _scan]
+
+# [FUNC: search]
+    def search(
+        self, query: "np.ndarray", k: int = 100, nprobe: int = DEFAULT_NPROBE
+    ) -> List[Tuple[int, float]]:
+        """
+        Top-k (media_id, cosinus-score). Met IVF: enkel de nprobe dichtstbijzijnde
+        clusters + de ongeïndexeerde staart; zonder: volledige scan.
+        """
+        self.load()
+        if self._vectors is None:
+            return []
+        q = _normaliseer(query).reshape(-1)
+        parts: List[Tuple["np.ndarray", "np.ndarray"]] = []
+        if self._centroids is not None:
+            nprobe = min(nprobe, len(self._centroids))
+            best = np.argpartition(self._centroids @ q, -nprobe)[-nprobe:]
+            for c in best:
+                lo, hi = int(self._offsets[c]), int(self._offsets[c + 1])
+                if hi > lo:
+                    parts.append(
+                        (np.arange(lo, hi), self._vectors[lo:hi].astype(np.float32) @ q)
+                    )
+            parts.append(self._scan(q, self.ivf_count, self.count))
+        else:
+            parts.append(self._scan(q, 0, self.count))
+        rows = np.concatenate([p[0] for p in parts])
+        scores = np.concatenate([p[1] for p in parts])
+        keep = self._live[rows]
+        rows, scores = rows[keep], scores[keep]
+        if len(scores) > k:
+            top = np.argpartition(scores, -k)[-k:]
+            rows, scores = rows[top], scores[top]
+        order = np.argsort(-scores)
+        return [(int(self._ids[rows[i]]), float(scores[i])) for i in order]
+
+# [END: FUNC: search]
+
+# [FUNC: build_ivf]
+    def build_ivf(self, nlist: Optional[int] = None, iterations: int = 10) -> int:
+        """
+        Deel alle geldige vectoren in met sferische k-means (NumPy) en schrijf
+        de matrix per cluster gesorteerd terug; verouderde rijen vallen weg.
+        Return: aantal clusters (0 = te weinig vectoren, enkel compactie).
+        """
+        self.load()
+        if self._vectors is None:
+            return 0
+        live_rows = np.flatnonzero(self._live)
+        n = len(live_rows)
+        nlist = nlist or (int(np.sqrt(n)) if n >= IVF_MIN_VECTORS else 0)
+        rng = np.random.default_rng(0)
+        if nlist:
+            sample = live_rows[rng.choice(n, size=min(n, nlist * 40), replace=False)]
+            data = self._vectors[np.sort(sample)].astype(np.float32)
+            centroids = data[rng.choice(len(data), size=nlist, replace=False)]
+            for _ in range(iterations):
+                assign = np.argmax(data @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assign, data)
+                empty = np.bincount(assign, minlength=nlist) == 0
+                sums[empty] = centroids[empty]
+                centroids = _normaliseer(sums)
+            assign = np.empty(n, dtype=np.int64)
+            for lo in range(0, n, SCAN_CHUNK):
+                block = self._vectors[live_rows[lo : lo + SCAN_CHUNK]].astype(np.float32)
+                assign[lo : lo + SCAN_CHUNK] = np.argmax(block @ centroids.T, axis=1)
+            order = live_rows[np.argsort(assign, kind="stable")]
+            offsets = np.concatenate(([0], np.cumsum(np.bincount(assign, minlength=nlist))))
+        else:
+            order, centroids, offsets = live_rows, None, None
+
+        # nieuw bestand schrijven en atomisch vervangen
+        tmp_vec, tmp_ids = self._path("vectors.f16.tmp"), self._path("ids.i64.tmp")
+        with open(tmp_vec, "wb") as fv, open(tmp_ids, "wb") as fi:
+            for lo in range(0, len(order), SCAN_CHUNK):
+                rows = order[lo : lo + SCAN_CHUNK]
+                fv.write(np.ascontiguousarray(self._vectors[rows]).tobytes())
+                fi.write(np.asarray(self._ids[rows], dtype=np.int64).tobytes())
+        with self._lock:
+            self._vectors = self._ids = None  # mmaps los vóór os.replace (Windows)
+            os.replace(tmp_vec, self._path("vectors.f16"))
+            os.replace(tmp_ids, self._path("ids.i64"))
+            if centroids is not None:
+                np.savez(self._path("ivf.npz"), centroids=centroids.astype(np.float32), offsets=offsets)
+            elif os.path.exists(self._path("ivf.npz")):
+                os.remove(self._path("ivf.npz"))
+            self.count = len(order)
+            self.ivf_count = len(order) if centroids is not None else 0
+            self._write_meta()
+            self._loaded_count = -1
+        self.load()
+        logger.info("IVF opgebouwd: %s vectoren in %s clusters", len(order), nlist)
+        return nlist
+
+# [END: FUNC: build_ivf]
+# [END: SECTION: CLASS: EmbeddingIndex]
+# [END: CLASS: EmbeddingIndex]
+
+
+_indexes: Dict[str, EmbeddingIndex] = {}
+
+
+# [FUNC: def get_index]
+def get_index(db) -> EmbeddingIndex:
+    """Gedeelde index naast de database (<db-map>/embeddings), één per proces."""
+    folder = os.path.join(os.path.dirname(os.path.abspath(db.db_path)), "embeddings")
+    idx = _indexes.get(folder)
+    if idx is None:
+        idx = _indexes[folder] = EmbeddingIndex(folder)
+    return idx.load()
+
+# [END: FUNC: def get_index]
+
+# [FUNC: def _embed_paden]
+def _embed_paden(paths: List[str]) -> Tuple[List[int], Optional["np.ndarray"]]:
+    """Worker: decodeer een blok paden en geef (geldige posities, embeddings)."""
+    tensors, idx = [], []
+    for i, p in enumerate(paths):
+        im = load_scaled_pil(p, (INPUT_SIZE * 2, INPUT_SIZE * 2))
+        if im is not None:
+            tensors.append(preprocess(im))
+            idx.append(i)
+    if not tensors:
+        return [], None
+    return idx, embed_tensors(tensors).astype(np.float16)
+
+# [END: FUNC: def _embed_paden]
+
+# [FUNC: def embed_bibliotheek]
+def embed_bibliotheek(
+    db,
+    workers: int = 2,
+    threads_per_worker: Optional[int] = None,
+    limit: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> Dict[str, int]:
+    """
+    Embed alle images zonder geldige embedding (analysis 'embedding') en voeg
+    ze toe aan de index. Bouwt daarna het IVF opnieuw als de ongeïndexeerde
+    staart groot geworden is.
+    """
+    stats = {"todo": 0, "embedded": 0, "failed": 0}
+    if not beschikbaar():
+        logger.warning("Embeddings overgeslagen: beeldmodel of onnxruntime ontbreekt (%s)", IMAGE_MODEL)
+        return stats
+    todo = db.media_needing_analysis(ANALYZER, VERSIE, limit=limit)
+    stats["todo"] = len(todo)
+    if not todo:
+        return stats
+    index = get_index(db)
+    workers = max(1, int(workers))
+    threads = threads_per_worker or max(1, (os.cpu_count() or 2) // workers)
+    blocks = iter([todo[i : i + BATCH_SIZE] for i in range(0, len(todo), BATCH_SIZE)])
+    pending: Dict[Future, List[Tuple]] = {}
+    done = 0
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(threads,)
+    ) as pool:
+        while True:
+            while len(pending) < workers * 2:
+                block = next(blocks, None)
+                if block is None:
+                    break
+                pending[pool.submit(_embed_paden, [r[1] for r in block])] = block
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                block = pending.pop(fut)
+                try:
+                    ok, vecs = fut.result()
+                except Exception:
+                    logger.exception("Embedding-worker faalde")
+                    ok, vecs = [], None
+                if vecs is not None:
+                    index.add([block[i][0] for i in ok], vecs)
+                okset = set(ok)
+                rows = [
+                    (mid, 1.0 if i in okset else None, None, size, mtime)
+                    for i, (mid, _, size, mtime) in enumerate(block)
+                ]
+                db.set_analysis_results(ANALYZER, VERSIE, rows)
+                stats["embedded"] += len(ok)
+                stats["failed"] += len(block) - len(ok)
+                done += len(block)
+                if progress:
+                    progress(done, len(todo))
+
+    index.load()
+    tail = index.count - index.ivf_count
+    if index.count >= IVF_MIN_VECTORS and tail > max(10_000, index.count // 10):
+        index.build_ivf()
+    logger.info("Embeddings klaar: %s", stats)
+    return stats
+
+# [END: FUNC: def embed_bibliotheek]
+
+# [FUNC: def zoek]
+def zoek(
+    db,
+    tekst: Optional[str] = None,
+    similar_to: Optional[int] = None,
+    k: int = 1000,
+    nprobe: int = DEFAULT_NPROBE,
+) -> List[Tuple[int, float]]:
+    """
+    Semantisch zoeken: op beschrijving (tekst) of op gelijkenis met een
+    bestaand beeld (media_id). Return: [(media_id, score)], beste eerst.
+    """
+    if np is None:
+        return []
+    index = get_index(db)
+    if similar_to is not None:
+        q = index.vector_for(int(similar_to))
+    elif tekst and beschikbaar(tekst=True):
+        q = embed_tekst(tekst)
+    else:
+        q = None
+    if q is None:
+        return []
+    return index.search(q, k=k, nprobe=nprobe)
+
+# [END: FUNC: def zoek]
+
+
+# [SECTION: MAIN]
+if __name__ == "__main__":
+    import sys
+
+    from core.db_interface import DbService
+
+    if not logging.getLogger().handlers:
+        logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    _db = DbService()
+    print(embed_bibliotheek(_db))
+    if len(sys.argv) > 1:
+        for r in _db.search_media(rank="semantic", semantic_text=" ".join(sys.argv[1:]), limit=20):
+            print(f"{r['score']:.3f}  {r['path']}")
+# [END: SECTION: MAIN]
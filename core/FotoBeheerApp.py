@@ -8,7 +8,7 @@ from PyQt6.QtCore import QUrl, QTimer
 from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput
 from PyQt6.QtMultimediaWidgets import QVideoWidget
 from gui.MainWindow import Ui_MainWindow
-from core import media_utils
+from core import media_types
 
 # [END: Imports]
 logging.basicConfig(
@@ -30,8 +30,8 @@ class FotoBeheerApp(QtWidgets.QMainWindow):
         self.ui.setupUi(self)
 
         self.folder_paths: list[str] = []
-        self.supported_photo_exts = tuple(media_utils.image_extensions)
-        self.supported_video_exts = tuple(media_utils.video_extensions)
+        self.supported_photo_exts = media_types.IMAGE_EXTS
+        self.supported_video_exts = media_types.VIDEO_EXTS
         self.media_items: list[str] = []
         self.current_index = 0
         self.is_playing = False
@@ -7,7 +7,7 @@ from PyQt6.QtMultimediaWidgets import QVideoWidget
 
 from gui.MainWindow import Ui_MainWindow
 from gui.MediaOrganizerGui import Ui_MediaOrganizerGui
-from core import media_utils
+from core import media_types, media_utils
 from core.media_player import MediaPlayer
 from core.db_interface import DbService
 from core.media_scanner import scan_folder_into_db
@@ -57,10 +57,11 @@ class MediaAppController:
         # State
         self.folder_paths: list[str] = []
         self.last_found_files: list[str] = []
+        self.found_kinds: dict[str, str] = {}  # inhoudelijk herkend: pad -> soort
         self.search_thread = None  # wordt dynamisch gezet
 
-        self.supported_photo_exts = tuple(media_utils.image_extensions)
-        self.supported_video_exts = tuple(media_utils.video_extensions)
+        self.supported_photo_exts = media_types.IMAGE_EXTS
+        self.supported_video_exts = media_types.VIDEO_EXTS
 
         # Multimedia
         self.player = QMediaPlayer(self.main_window)
@@ -91,6 +92,8 @@ class MediaAppController:
             video_widget=self.video_widget,
             player=self.player,
         )
+        # Prefetch-worker netjes stoppen bij afsluiten
+        self.app.aboutToQuit.connect(self.media_player.shutdown)
 
         # Hoofdvenster-knoppen
         self.ui.btnStart.clicked.connect(self._on_start_clicked)
@@ -281,41 +284,51 @@ class MediaAppController:
 
         # 4) Bouw de afspeellijst (eerst DB, dan fallback naar filesystem)
         media_list: list[str] = []
+        media_kinds: dict[str, str] = {}
         mtype = (
             "image"
             if type_filter == "images"
             else "video" if type_filter == "videos" else None
         )
+        allowed = (mtype,) if mtype else ("image", "video")
 
         if self.db and source_folders:
             try:
                 from itertools import chain
 
                 results_all = []
+                dir_ids = self.db.directory_ids(
+                    p for b in source_folders if b for p in (b, os.path.normpath(b))
+                )
                 for base in source_folders:
                     if not base:
                         continue
-                    # Zoek in DB op mtype en pad-fragment; filter hidden=0
+                    # Gescande map: indexbereik op de mappenboom; anders pad-fragment
+                    dir_id = dir_ids.get(base, dir_ids.get(os.path.normpath(base)))
                     res = self.db.search_media(
                         mtype=mtype,
                         hidden=False,
-                        text=base,  # path-fragment filter
+                        missing=False,
+                        under_dir=dir_id,
+                        text=None if dir_id is not None else base,
                         limit=100000,
                         offset=0,
                     )
-                    # Exclude missing
-                    res = [r for r in res if not r.get("missing")]
                     results_all.append(res)
+                # Soort uit de DB: ook inhoudelijk herkende bestanden met een
+                # vreemde extensie spelen af
                 for r in chain.from_iterable(results_all):
                     p = str(r.get("path") or "")
-                    if p and media_utils.is_media_file(p, type_filter):
+                    if p and r.get("type") in allowed:
                         media_list.append(p)
+                        media_kinds[p] = r["type"]
                 logger.info("Afspeellijst via DB opgebouwd: %d items", len(media_list))
             except Exception:
                 logger.exception(
                     "Fout tijdens DB-zoek voor afspeellijst; val terug op filesystem"
                 )
                 media_list = []
+                media_kinds = {}
 
         if not media_list:
             # Fallback: filesystem walk
@@ -328,6 +341,9 @@ class MediaAppController:
                             p = os.path.join(root, name)
                             if media_utils.is_media_file(p, type_filter):
                                 media_list.append(p)
+                            elif self.found_kinds.get(p) in allowed:
+                                media_list.append(p)
+                                media_kinds[p] = self.found_kinds[p]
                 except Exception:
                     continue  # ga door bij toegangsproblemen
 
@@ -347,6 +363,7 @@ class MediaAppController:
 
         # 6) Zet lijst in de player en start
         self.media_player.media_list = media_list
+        self.media_player.media_kinds = media_kinds
         self.media_player.current_index = -1  # laat player bij next starten
         logger.info(
             "Afspeellijst opgebouwd: %d items (%s)", len(media_list), type_filter
@@ -444,33 +461,43 @@ class MediaAppController:
 
         type_filter = self._current_play_filter()
         media_list: list[str] = []
+        media_kinds: dict[str, str] = {}
         mtype = (
             "image"
             if type_filter == "images"
             else "video" if type_filter == "videos" else None
         )
+        allowed = (mtype,) if mtype else ("image", "video")
 
         if self.db and source_folders:
             try:
                 from itertools import chain
 
                 results_all = []
+                dir_ids = self.db.directory_ids(
+                    p for b in source_folders if b for p in (b, os.path.normpath(b))
+                )
                 for base in source_folders:
                     if not base:
                         continue
+                    dir_id = dir_ids.get(base, dir_ids.get(os.path.normpath(base)))
                     res = self.db.search_media(
                         mtype=mtype,
                         hidden=False,
-                        text=base,
+                        missing=False,
+                        under_dir=dir_id,
+                        text=None if dir_id is not None else base,
                         limit=100000,
                         offset=0,
                     )
-                    res = [r for r in res if not r.get("missing")]
                     results_all.append(res)
+                # Soort uit de DB: ook inhoudelijk herkende bestanden met een
+                # vreemde extensie spelen af
                 for r in chain.from_iterable(results_all):
                     p = str(r.get("path") or "")
-                    if p and media_utils.is_media_file(p, type_filter):
+                    if p and r.get("type") in allowed:
                         media_list.append(p)
+                        media_kinds[p] = r["type"]
                 logger.info(
                     "Afspeellijst via DB vernieuwd (filter=%s): %d items",
                     type_filter,
@@ -479,6 +506,7 @@ class MediaAppController:
             except Exception:
                 logger.exception("Fout tijdens DB-zoek; val terug op filesystem")
                 media_list = []
+                media_kinds = {}
 
         if not media_list:
             for base in source_folders:
@@ -490,10 +518,14 @@ class MediaAppController:
                             p = os.path.join(root, name)
                             if media_utils.is_media_file(p, type_filter):
                                 media_list.append(p)
+                            elif self.found_kinds.get(p) in allowed:
+                                media_list.append(p)
+                                media_kinds[p] = self.found_kinds[p]
                 except Exception:
                     continue
 
         self.media_player.media_list = media_list
+        self.media_player.media_kinds = media_kinds
         self.media_player.current_index = -1
         logger.info(
             "Afspeellijst vernieuwd (filter=%s): %d items", type_filter, len(media_list)
@@ -690,10 +722,21 @@ class MediaAppController:
         except Exception:
             from MediaSearchThread import MediaSearchThread  # type: ignore
 
+        sniff = False
+        if self.db:
+            try:
+                sniff = self.db.get_preference("sniff_content", "0") == "1"
+            except Exception:
+                sniff = False
+
         # Thread aanmaken (ondersteun verschillende ctor-namen)
         try:
             self.search_thread = MediaSearchThread(
-                start_path=location, type_filter=type_filter, date_range=date_range
+                start_path=location,
+                type_filter=type_filter,
+                date_range=date_range,
+                sniff_content=sniff,
+                db=self.db,
             )
         except TypeError:
             try:
@@ -706,7 +749,9 @@ class MediaAppController:
                     start_path=location, type_filter=type_filter
                 )
 
-        # Signalen verbinden (found/finished/error/progress)
+        # Signalen verbinden (sniffed/found/finished/error/progress)
+        if hasattr(self.search_thread, "sniffed"):
+            self.search_thread.sniffed.connect(self.found_kinds.update)
         if hasattr(self.search_thread, "found"):
             self.search_thread.found.connect(self._on_found_items)
         if hasattr(self.search_thread, "finished"):
@@ -721,6 +766,7 @@ class MediaAppController:
         self.ui_dialog.listFoundedItems.clear()
         self.ui_dialog.treeVirtueleFotos.clear()
         self.last_found_files.clear()
+        self.found_kinds.clear()
         self._set_status("Scannen…")
         logger.info("Zoekthread starten: %s (%s)", location, type_filter)
         self.search_thread.start()
@@ -778,6 +824,15 @@ class MediaAppController:
             return
         self.last_found_files.extend(files)
 
+        # Gezichten/tags voor de hele batch in één query
+        summary = {}
+        if self.db:
+            try:
+                summary = self.db.face_tag_summary(files)
+            except Exception:
+                logger.exception("Gezichten/tags ophalen mislukt")
+
+        items = []
         for f in files:
             folder = os.path.dirname(f)
             name = os.path.basename(f)
@@ -787,8 +842,16 @@ class MediaAppController:
             except Exception:
                 dt = None
             date_str = dt.strftime("%Y-%m-%d %H:%M:%S") if dt else ""
-            item = QtWidgets.QTreeWidgetItem([date_str, name, folder, "", ""])
-            self.ui_dialog.treeVirtueleFotos.addTopLevelItem(item)
+            info = summary.get(f)
+            faces_str = tags_str = ""
+            if info:
+                if info["faces"]:
+                    faces_str = str(info["faces"])
+                    if info["people"]:
+                        faces_str += f" ({info['people'].replace(',', ', ')})"
+                tags_str = info["tags"] or ""
+            items.append(QtWidgets.QTreeWidgetItem([date_str, name, folder, faces_str, tags_str]))
+        self.ui_dialog.treeVirtueleFotos.addTopLevelItems(items)
 
 # [END: FUNC: _on_found_items]
 
@@ -798,12 +861,12 @@ class MediaAppController:
         # Mappenoverzicht opbouwen met tellingen
         counts: dict[str, tuple[int, int]] = {}  # map -> (photos, videos)
         for f in self.last_found_files:
-            ext = os.path.splitext(f)[1].lower()
+            kind = self.found_kinds.get(f) or media_types.kind_of(f)
             folder = os.path.dirname(f)
             p, v = counts.get(folder, (0, 0))
-            if ext in self.supported_photo_exts:
+            if kind == "image":
                 p += 1
-            elif ext in self.supported_video_exts:
+            elif kind == "video":
                 v += 1
             counts[folder] = (p, v)
 
@@ -927,12 +990,12 @@ class MediaAppController:
         """
         counts: dict[str, tuple[int, int]] = {}
         for f in self.last_found_files:
-            ext = os.path.splitext(f)[1].lower()
+            kind = self.found_kinds.get(f) or media_types.kind_of(f)
             folder = os.path.dirname(f)
             p, v = counts.get(folder, (0, 0))
-            if ext in self.supported_photo_exts:
+            if kind == "image":
                 p += 1
-            elif ext in self.supported_video_exts:
+            elif kind == "video":
                 v += 1
             counts[folder] = (p, v)
 
@@ -4,7 +4,7 @@ from __future__ import annotations
 import os
 import sqlite3
 import logging
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
 
 # [END: SECTION: IMPORTS]
@@ -16,10 +16,75 @@ DEFAULT_DB_PATH = os.environ.get(
         "media_analyse.db",
     ),
 )
-SCHEMA_VERSION = "1.0"
+SCHEMA_VERSION = "1.11"
 
 logger = logging.getLogger(__name__)
 
+# Mappen en media bewaren geen absoluut pad: een map is (parent_id, name), een
+# scanroot (parent_id NULL) haalt zijn pad uit folders.path, een mediabestand
+# is (dir_id, filename). DbService bouwt de volledige paden op uit een gecachete
+# mappenkaart; een verhuisde bibliotheekmap is zo één rij in folders.
+_DIRECTORIES_DDL = """
+    -- Mappen zoals bij de laatste scan gezien: ongewijzigde mtime = inhoud
+    -- (namen) ongewijzigd, dus niet opnieuw oplijsten bij een rescan
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        folder_id INTEGER NOT NULL,
+        parent_id INTEGER NULL, -- NULL = scanroot: pad = folders.path
+        name TEXT NOT NULL,
+        depth INTEGER NOT NULL DEFAULT 0, -- 0 = scanroot
+        mtime REAL, -- NULL = nog niet volledig gescand
+        file_count INTEGER,
+        dir_count INTEGER,
+        scanned_at TEXT,
+        UNIQUE(parent_id, name),
+        FOREIGN KEY(folder_id) REFERENCES folders(id) ON DELETE CASCADE,
+        FOREIGN KEY(parent_id) REFERENCES directories(id) ON DELETE CASCADE
+    );
+"""
+
+_MEDIA_DDL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        folder_id INTEGER NOT NULL,
+        dir_id INTEGER NOT NULL,
+        filename TEXT NOT NULL,
+        ext TEXT,
+        size INTEGER,
+        mtime REAL,
+        type TEXT, -- 'image' | 'video' | 'other'
+        width INTEGER,
+        height INTEGER,
+        duration_s REAL,
+        hash TEXT,
+        partial_hash TEXT, -- hash van eerste+laatste 64 KB
+        hash_size INTEGER, -- size waarvoor hash/partial_hash gelden
+        hash_mtime REAL, -- mtime waarvoor hash/partial_hash gelden
+        phash TEXT, -- perceptuele dHash (64 bit, hex)
+        phash_size INTEGER, -- size waarvoor phash geldt
+        phash_mtime REAL, -- mtime waarvoor phash geldt
+        created_exif TEXT,
+        imported_at TEXT DEFAULT (datetime('now')),
+        rating INTEGER,
+        favorite INTEGER DEFAULT 0,
+        hidden INTEGER DEFAULT 0,
+        missing INTEGER DEFAULT 0,
+        last_played_at TEXT,
+        UNIQUE(dir_id, filename),
+        FOREIGN KEY(folder_id) REFERENCES folders(id) ON DELETE CASCADE,
+        -- geen CASCADE: ontbrekende media (verplaatsingsdetectie) houden hun map
+        FOREIGN KEY(dir_id) REFERENCES directories(id)
+    );
+"""
+
+# Kolommen die _migrate_relative_paths uit de oude media-tabel overneemt
+_MEDIA_COPY_COLUMNS = (
+    "id", "folder_id", "ext", "size", "mtime", "type", "width", "height", "duration_s",
+    "hash", "partial_hash", "hash_size", "hash_mtime", "phash", "phash_size",
+    "phash_mtime", "created_exif", "imported_at", "rating", "favorite", "hidden",
+    "missing", "last_played_at",
+)
+
 
 # [FUNC: _ensure_folder]
 def _ensure_folder(db_path: str) -> None:
@@ -30,6 +95,281 @@ def _ensure_folder(db_path: str) -> None:
 # [END: FUNC: _ensure_folder]
 
 
+# [FUNC: _ensure_column]
+def _ensure_column(c: sqlite3.Cursor, table: str, column: str, decl: str) -> None:
+    """
+    Voegt een kolom toe aan een bestaande tabel als die nog ontbreekt.
+    Zo krijgen oudere databases nieuwe kolommen zonder dataverlies.
+    """
+    cols = {row[1] for row in c.execute(f"PRAGMA table_info({table})")}
+    if column not in cols:
+        c.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+        logger.info("Kolom toegevoegd: %s.%s", table, column)
+
+# [END: FUNC: _ensure_column]
+
+
+
+# [FUNC: _migrate_analysis]
+def _migrate_analysis(c: sqlite3.Cursor) -> None:
+    """
+    analysis had eerst sleutel (media_id, analyzer) zonder versie/payload.
+    SQLite kan een primary key niet wijzigen: tabel herbouwen, bestaande
+    rijen overnemen als versie 1.
+    """
+    cols = {row[1] for row in c.execute("PRAGMA table_info(analysis)")}
+    if "analyzer_version" in cols:
+        return
+    c.executescript(
+        """
+        ALTER TABLE analysis RENAME TO analysis_old;
+        CREATE TABLE analysis (
+            media_id INTEGER NOT NULL,
+            analyzer TEXT NOT NULL,
+            analyzer_version INTEGER NOT NULL DEFAULT 1,
+            score REAL,
+            payload TEXT,
+            src_size INTEGER,
+            src_mtime REAL,
+            updated_at TEXT DEFAULT (datetime('now')),
+            PRIMARY KEY (media_id, analyzer, analyzer_version),
+            FOREIGN KEY(media_id) REFERENCES media(id) ON DELETE CASCADE
+        );
+        INSERT INTO analysis(media_id, analyzer, analyzer_version, score, src_size, src_mtime, updated_at)
+            SELECT media_id, analyzer, 1, score, src_size, src_mtime, updated_at FROM analysis_old;
+        DROP TABLE analysis_old;
+        """
+    )
+    logger.info("Tabel analysis gemigreerd naar (media_id, analyzer, analyzer_version)")
+
+# [END: FUNC: _migrate_analysis]
+
+
+# [FUNC: _build_directory_closure]
+def _build_directory_closure(c: sqlite3.Cursor) -> None:
+    """Closure en diepte van de hele mappenboom uit parent_id (recursieve CTE)."""
+    c.execute("DELETE FROM directory_closure")
+    c.execute(
+        """
+        INSERT INTO directory_closure(ancestor_id, descendant_id, depth)
+        WITH RECURSIVE tree(ancestor_id, descendant_id, depth) AS (
+            SELECT id, id, 0 FROM directories
+            UNION ALL
+            SELECT t.ancestor_id, d.id, t.depth + 1
+            FROM tree t JOIN directories d ON d.parent_id = t.descendant_id
+        )
+        SELECT ancestor_id, descendant_id, depth FROM tree
+        """
+    )
+    c.execute(
+        """
+        UPDATE directories SET depth = (
+            SELECT MAX(depth) FROM directory_closure WHERE descendant_id = directories.id
+        )
+        """
+    )
+
+# [END: FUNC: _build_directory_closure]
+
+
+# [FUNC: _migrate_directory_tree]
+def _migrate_directory_tree(c: sqlite3.Cursor) -> None:
+    """
+    Mappen van vóór de closure-tabel: naam, diepte en closure eenmalig
+    afleiden uit parent_id (recursieve CTE).
+    """
+    c.execute("SELECT 1 FROM directories LIMIT 1")
+    if c.fetchone() is None:
+        return
+    c.execute("SELECT 1 FROM directory_closure LIMIT 1")
+    if c.fetchone() is not None:
+        return
+    _build_directory_closure(c)
+    if "path" in {row[1] for row in c.execute("PRAGMA table_info(directories)")}:
+        c.execute("SELECT id, path FROM directories WHERE name IS NULL")
+        c.executemany(
+            "UPDATE directories SET name=? WHERE id=?",
+            [(os.path.basename(p) or p, i) for i, p in c.fetchall()],
+        )
+    logger.info("Migratie: mappenboom (closure) opgebouwd")
+
+# [END: FUNC: _migrate_directory_tree]
+
+
+# [FUNC: _migrate_relative_paths]
+def _migrate_relative_paths(c: sqlite3.Cursor) -> None:
+    """
+    media.path en directories.path (absolute paden) vervangen door
+    (dir_id, filename) en (parent_id, name). Tabellen herbouwen met dezelfde
+    id's, zodat tags, thumbnails, analyses, gezichten en historiek blijven.
+    Elke map hangt daarna via zijn ouders aan de diepste bibliotheekmap die
+    hem bevat; een pad dat zo niet exact terug te bouwen is, krijgt een eigen,
+    inactieve folders-rij. Gebeurt met foreign_keys uit (DROP TABLE mag niet
+    cascaden).
+    """
+    if "path" not in {row[1] for row in c.execute("PRAGMA table_info(media)")}:
+        return
+    conn = c.connection
+    conn.commit()
+    c.execute("PRAGMA foreign_keys = OFF")
+    try:
+        c.execute("BEGIN")
+        folders = {path: int(fid) for fid, path in c.execute("SELECT id, path FROM folders")}
+        # baseline-schema: directories bestond nog niet en is net zonder path aangemaakt
+        old_dirs: Dict[str, Tuple] = {}
+        if "path" in {row[1] for row in c.execute("PRAGMA table_info(directories)")}:
+            old_dirs = {
+                r[0]: r[1:]
+                for r in c.execute(
+                    "SELECT path, id, mtime, file_count, dir_count, scanned_at FROM directories"
+                )
+            }
+        media = c.execute("SELECT id, path FROM media").fetchall()
+        roots = sorted(folders, key=len, reverse=True)
+
+        def strip(path: str) -> str:
+            return path.rstrip("/\\") or path
+
+        def root_of(path: str) -> Optional[str]:
+            for root in roots:
+                base = strip(root)
+                if strip(path) == base or path.startswith((base + "/", base + "\\")):
+                    return root
+            return None
+
+        # absoluut pad (zoals DbService het terugbouwt) → (folder-root, ouder, naam)
+        nodes: Dict[str, Tuple[str, Optional[str], str]] = {}
+        by_key: Dict[str, Optional[str]] = {}
+
+        def node(d: str) -> Optional[str]:
+            if d in by_key:
+                return by_key[d]
+            root = root_of(d)
+            found: Optional[str] = None
+            if root is not None and strip(d) == strip(root):
+                found = root
+                nodes.setdefault(root, (root, None, os.path.basename(strip(root)) or root))
+            elif root is not None and os.path.dirname(d) != d:
+                parent = node(os.path.dirname(d))
+                name = os.path.basename(d)
+                if parent is not None and os.path.join(parent, name) == d:
+                    found = d
+                    nodes.setdefault(d, (nodes[parent][0], parent, name))
+            by_key[d] = found
+            return found
+
+        media_dirs: List[Tuple[int, str, str, Optional[int]]] = []
+        for mid, path in media:
+            name = os.path.basename(path)
+            d = node(os.path.dirname(path))
+            moved_to: Optional[int] = None
+            if d is None or os.path.join(d, name) != path:
+                # niet terug te bouwen (buiten elke bibliotheekmap, afwijkend
+                # scheidingsteken): eigen inactieve bibliotheekmap = exact voorvoegsel
+                d = path[: len(path) - len(name)]
+                if d not in folders:
+                    c.execute("INSERT INTO folders(path, is_active) VALUES(?, 0)", (d,))
+                    folders[d] = int(c.lastrowid)
+                    logger.warning("Migratie: %s → inactieve bibliotheekmap %s", path, d)
+                nodes.setdefault(d, (d, None, os.path.basename(strip(d)) or d))
+                moved_to = folders[d]
+            media_dirs.append((int(mid), d, name, moved_to))
+        for d in old_dirs:
+            node(d)  # lege, onherleidbare mappen vallen weg
+
+        ids: Dict[str, int] = {}
+        kept: Dict[str, Tuple] = {}
+        for d, (old_id, *state) in old_dirs.items():
+            a = by_key.get(d)
+            if a is not None and a not in ids:
+                ids[a] = int(old_id)
+                kept[a] = tuple(state)
+        next_id = max([int(r[0]) for r in old_dirs.values()] + [0]) + 1
+        for a in nodes:
+            if a not in ids:
+                ids[a] = next_id
+                next_id += 1
+
+        c.execute(_DIRECTORIES_DDL.format(table="directories_new"))
+        c.execute(_MEDIA_DDL.format(table="media_new"))
+        dir_rows = []
+        for a, (root, parent, name) in nodes.items():
+            mtime, fc, dc, scanned = kept.get(a, (None, None, None, None))
+            dir_rows.append(
+                (
+                    ids[a], folders[root], None if parent is None else ids[parent],
+                    name, mtime, fc, dc, scanned,
+                )
+            )
+        c.executemany(
+            "INSERT INTO directories_new(id, folder_id, parent_id, name, mtime, file_count,"
+            " dir_count, scanned_at) VALUES(?, ?, ?, ?, ?, ?, ?, ?)",
+            dir_rows,
+        )
+        c.execute(
+            "CREATE TEMP TABLE _media_dirs("
+            "id INTEGER PRIMARY KEY, dir_id INTEGER, filename TEXT, folder_id INTEGER)"
+        )
+        c.executemany(
+            "INSERT INTO temp._media_dirs VALUES(?, ?, ?, ?)",
+            [(mid, ids[d], name, fid) for mid, d, name, fid in media_dirs],
+        )
+        # join(map, naam) == oud pad voor elke rij: (dir_id, filename) is uniek;
+        # rijen in een nieuwe inactieve bibliotheekmap krijgen ook diens folder_id
+        cols = ", ".join(_MEDIA_COPY_COLUMNS)
+        values = ", ".join(
+            "COALESCE(t.folder_id, m.folder_id)" if col == "folder_id" else "m." + col
+            for col in _MEDIA_COPY_COLUMNS
+        )
+        c.execute(
+            f"INSERT INTO media_new(dir_id, filename, {cols})"
+            f" SELECT t.dir_id, t.filename, {values}"
+            " FROM media m JOIN temp._media_dirs t ON t.id = m.id ORDER BY m.id"
+        )
+        c.execute("DROP TABLE temp._media_dirs")
+        c.execute("DROP TABLE media")
+        c.execute("DROP TABLE directories")
+        c.execute("ALTER TABLE directories_new RENAME TO directories")
+        c.execute("ALTER TABLE media_new RENAME TO media")
+        _build_directory_closure(c)
+        broken = c.execute("PRAGMA foreign_key_check(media)").fetchall()
+        broken += c.execute("PRAGMA foreign_key_check(directories)").fetchall()
+        if broken:
+            logger.warning("Migratie: %s rijen met ongeldige verwijzing", len(broken))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        c.execute("PRAGMA foreign_keys = ON")
+    logger.info(
+        "Migratie: media/mappen bewaren (map, naam) i.p.v. absolute paden"
+        " (%s media, %s mappen)",
+        len(media), len(dir_rows),
+    )
+
+# [END: FUNC: _migrate_relative_paths]
+
+
+# [FUNC: _migrate_sniff_cache]
+def _migrate_sniff_cache(c: sqlite3.Cursor) -> None:
+    """Andere herkenningsregels (SNIFF_VERSION): bewaarde uitkomsten zijn waardeloos."""
+    try:
+        from .media_types import SNIFF_VERSION
+    except ImportError:
+        from media_types import SNIFF_VERSION  # type: ignore
+    c.execute("SELECT value FROM preferences WHERE key = 'sniff_version'")
+    row = c.fetchone()
+    if row is not None and row[0] == str(SNIFF_VERSION):
+        return
+    c.execute("DELETE FROM sniff_cache")
+    c.execute(
+        "INSERT OR REPLACE INTO preferences(key, value) VALUES('sniff_version', ?)",
+        (str(SNIFF_VERSION),),
+    )
+
+# [END: FUNC: _migrate_sniff_cache]
+
 
 # [FUNC: create_database]
 def create_database(db_path: Optional[str] = None) -> None:
@@ -47,7 +387,7 @@ def create_database(db_path: Optional[str] = None) -> None:
 
         # Kern-tabellen
         c.executescript(
-            """
+            f"""
             PRAGMA foreign_keys = ON;
 
             CREATE TABLE IF NOT EXISTS folders (
@@ -57,29 +397,21 @@ def create_database(db_path: Optional[str] = None) -> None:
                 added_at TEXT DEFAULT (datetime('now'))
             );
 
-            CREATE TABLE IF NOT EXISTS media (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                folder_id INTEGER NOT NULL,
-                path TEXT NOT NULL UNIQUE,
-                filename TEXT,
-                ext TEXT,
-                size INTEGER,
-                mtime REAL,
-                type TEXT, -- 'image' | 'video' | 'other'
-                width INTEGER,
-                height INTEGER,
-                duration_s REAL,
-                hash TEXT,
-                created_exif TEXT,
-                imported_at TEXT DEFAULT (datetime('now')),
-                rating INTEGER,
-                favorite INTEGER DEFAULT 0,
-                hidden INTEGER DEFAULT 0,
-                missing INTEGER DEFAULT 0,
-                last_played_at TEXT,
-                FOREIGN KEY(folder_id) REFERENCES folders(id) ON DELETE CASCADE
+            {_DIRECTORIES_DDL.format(table="directories")}
+
+            -- Closure van de mappenboom: elke (voorouder, afstammeling)-combinatie,
+            -- incl. (map, map) op depth 0. "Alles onder map X" = één indexbereik.
+            CREATE TABLE IF NOT EXISTS directory_closure (
+                ancestor_id INTEGER NOT NULL,
+                descendant_id INTEGER NOT NULL,
+                depth INTEGER NOT NULL,
+                PRIMARY KEY (ancestor_id, descendant_id),
+                FOREIGN KEY(ancestor_id) REFERENCES directories(id) ON DELETE CASCADE,
+                FOREIGN KEY(descendant_id) REFERENCES directories(id) ON DELETE CASCADE
             );
 
+            {_MEDIA_DDL.format(table="media")}
+
             CREATE TABLE IF NOT EXISTS tags (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 name TEXT NOT NULL UNIQUE
@@ -103,11 +435,21 @@ def create_database(db_path: Optional[str] = None) -> None:
                 media_id INTEGER NOT NULL,
                 x INTEGER, y INTEGER, w INTEGER, h INTEGER,
                 person_id INTEGER NULL,
+                person_confirmed INTEGER NOT NULL DEFAULT 0,
                 embedding BLOB,
                 FOREIGN KEY(media_id) REFERENCES media(id) ON DELETE CASCADE,
                 FOREIGN KEY(person_id) REFERENCES people(id) ON DELETE SET NULL
             );
 
+            -- "Niet deze persoon": de clustering wijst dit gezicht die persoon niet meer toe
+            CREATE TABLE IF NOT EXISTS face_rejections (
+                face_id INTEGER NOT NULL,
+                person_id INTEGER NOT NULL,
+                PRIMARY KEY (face_id, person_id),
+                FOREIGN KEY(face_id) REFERENCES faces(id) ON DELETE CASCADE,
+                FOREIGN KEY(person_id) REFERENCES people(id) ON DELETE CASCADE
+            );
+
             CREATE TABLE IF NOT EXISTS playlists (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 name TEXT NOT NULL UNIQUE
@@ -138,10 +480,54 @@ def create_database(db_path: Optional[str] = None) -> None:
                 width INTEGER,
                 height INTEGER,
                 generated_at TEXT DEFAULT (datetime('now')),
+                src_size INTEGER, -- media.size bij generatie (invalidatie)
+                src_mtime REAL, -- media.mtime bij generatie (invalidatie)
+                bytes INTEGER, -- bestandsgrootte thumbnail (eviction)
+                last_access TEXT,
                 UNIQUE(media_id, kind),
                 FOREIGN KEY(media_id) REFERENCES media(id) ON DELETE CASCADE
             );
 
+            -- Optionele packed-opslag: thumbnails.thumb_path = 'pack://<digest>'
+            CREATE TABLE IF NOT EXISTS thumbnail_packs (
+                digest TEXT PRIMARY KEY,
+                pack_id INTEGER NOT NULL,
+                byte_offset INTEGER NOT NULL,
+                byte_length INTEGER NOT NULL
+            );
+
+            -- Groepen bijna-identieke beelden (burst, hercomprimeerde kopieën)
+            CREATE TABLE IF NOT EXISTS near_duplicates (
+                media_id INTEGER PRIMARY KEY,
+                group_id INTEGER NOT NULL, -- laagste media_id van de groep
+                distance INTEGER, -- Hamming-afstand tot dat eerste lid
+                FOREIGN KEY(media_id) REFERENCES media(id) ON DELETE CASCADE
+            );
+
+            -- Resultaten van beeldanalyses (onscherpte, donkerheid, ...) per media
+            CREATE TABLE IF NOT EXISTS analysis (
+                media_id INTEGER NOT NULL,
+                analyzer TEXT NOT NULL, -- 'onscherpte' | 'donkerheid' | ...
+                analyzer_version INTEGER NOT NULL DEFAULT 1, -- ophogen = herberekenen
+                score REAL, -- NULL = niet te analyseren / geen score
+                payload TEXT, -- optioneel JSON-resultaat (bv. tags)
+                src_size INTEGER, -- media.size bij analyse (invalidatie)
+                src_mtime REAL, -- media.mtime bij analyse (invalidatie)
+                updated_at TEXT DEFAULT (datetime('now')),
+                PRIMARY KEY (media_id, analyzer, analyzer_version),
+                FOREIGN KEY(media_id) REFERENCES media(id) ON DELETE CASCADE
+            );
+
+            -- Inhoudsherkenning (magic bytes) van bestanden zonder bekende extensie;
+            -- geldig zolang size/mtime gelijk blijven, zodat een rescan niets herleest
+            CREATE TABLE IF NOT EXISTS sniff_cache (
+                path TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime REAL,
+                kind TEXT NOT NULL, -- 'image' | 'video' | 'other'
+                mime TEXT
+            );
+
             CREATE TABLE IF NOT EXISTS preferences (
                 key TEXT PRIMARY KEY,
                 value TEXT
@@ -149,13 +535,82 @@ def create_database(db_path: Optional[str] = None) -> None:
             """
         )
 
+        # Migraties: kolommen die later bijkwamen
+        _ensure_column(c, "media", "dir_id", "INTEGER NULL REFERENCES directories(id) ON DELETE SET NULL")
+        _ensure_column(c, "media", "partial_hash", "TEXT")
+        _ensure_column(c, "media", "hash_size", "INTEGER")
+        _ensure_column(c, "media", "hash_mtime", "REAL")
+        _ensure_column(c, "media", "phash", "TEXT")
+        _ensure_column(c, "media", "phash_size", "INTEGER")
+        _ensure_column(c, "media", "phash_mtime", "REAL")
+        _ensure_column(c, "thumbnails", "src_size", "INTEGER")
+        _ensure_column(c, "thumbnails", "src_mtime", "REAL")
+        _ensure_column(c, "thumbnails", "bytes", "INTEGER")
+        _ensure_column(c, "thumbnails", "last_access", "TEXT")
+        _ensure_column(c, "faces", "person_confirmed", "INTEGER NOT NULL DEFAULT 0")
+        _ensure_column(c, "directories", "name", "TEXT")
+        _ensure_column(c, "directories", "depth", "INTEGER NOT NULL DEFAULT 0")
+        _migrate_analysis(c)
+        _migrate_directory_tree(c)
+        _migrate_sniff_cache(c)
+        _migrate_relative_paths(c)
+
         # Indexen
         c.executescript(
             """
-            CREATE INDEX IF NOT EXISTS idx_media_path ON media(path);
+            -- media(dir_id, filename) en directories(parent_id, name) zijn UNIQUE:
+            -- die indexen dekken ook de opzoekingen op dir_id / parent_id
+            DROP INDEX IF EXISTS idx_media_path;
+            DROP INDEX IF EXISTS idx_media_dir;
+            DROP INDEX IF EXISTS idx_directories_parent;
             CREATE INDEX IF NOT EXISTS idx_media_folder_type ON media(folder_id, type);
+            CREATE INDEX IF NOT EXISTS idx_directories_folder ON directories(folder_id);
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_directories_root
+                ON directories(folder_id) WHERE parent_id IS NULL;
+            CREATE INDEX IF NOT EXISTS idx_directory_closure_desc
+                ON directory_closure(descendant_id, depth);
+            CREATE INDEX IF NOT EXISTS idx_media_size ON media(size);
+            CREATE INDEX IF NOT EXISTS idx_media_hash ON media(hash);
             CREATE INDEX IF NOT EXISTS idx_media_tags_tag ON media_tags(tag_id);
             CREATE INDEX IF NOT EXISTS idx_history_media_played ON history(media_id, played_at);
+            CREATE INDEX IF NOT EXISTS idx_thumbnails_path ON thumbnails(thumb_path);
+            CREATE INDEX IF NOT EXISTS idx_thumbnail_packs_pack ON thumbnail_packs(pack_id);
+            CREATE INDEX IF NOT EXISTS idx_faces_media ON faces(media_id);
+            CREATE INDEX IF NOT EXISTS idx_faces_person ON faces(person_id);
+            CREATE INDEX IF NOT EXISTS idx_near_duplicates_group ON near_duplicates(group_id);
+            CREATE INDEX IF NOT EXISTS idx_analysis_analyzer_score
+                ON analysis(analyzer, analyzer_version, score);
+            """
+        )
+
+        # Mappenkaart van DbService: elke wijziging aan de boom of aan een
+        # bibliotheekpad verhoogt dir_tree_version, zodat de cache herbouwd wordt
+        c.execute(
+            "INSERT OR IGNORE INTO preferences(key, value) VALUES('dir_tree_version', '0')"
+        )
+        c.executescript(
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_directories_insert AFTER INSERT ON directories
+            BEGIN
+                UPDATE preferences SET value = CAST(value AS INTEGER) + 1
+                WHERE key = 'dir_tree_version';
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_directories_delete AFTER DELETE ON directories
+            BEGIN
+                UPDATE preferences SET value = CAST(value AS INTEGER) + 1
+                WHERE key = 'dir_tree_version';
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_directories_move
+            AFTER UPDATE OF parent_id, name, folder_id ON directories
+            BEGIN
+                UPDATE preferences SET value = CAST(value AS INTEGER) + 1
+                WHERE key = 'dir_tree_version';
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_folders_path AFTER UPDATE OF path ON folders
+            BEGIN
+                UPDATE preferences SET value = CAST(value AS INTEGER) + 1
+                WHERE key = 'dir_tree_version';
+            END;
             """
         )
 
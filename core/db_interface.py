@@ -1,6 +1,7 @@
 # [SECTION: IMPORTS]
 from __future__ import annotations
 
+import json
 import logging
 import os
 import sqlite3
@@ -10,6 +11,138 @@ from typing import Any, Dict, Iterable, List, Optional, Tuple
 # [END: SECTION: IMPORTS]
 logger = logging.getLogger(__name__)
 
+# Bij ON CONFLICT: bestaande waarde houden als het bestand ongewijzigd is
+_KEEP_IF_UNCHANGED = (
+    "CASE WHEN media.size IS excluded.size AND media.mtime IS excluded.mtime"
+    " THEN COALESCE(excluded.{col}, media.{col}) ELSE excluded.{col} END"
+)
+
+_UPSERT_MEDIA_SQL = f"""
+    INSERT INTO media(
+        folder_id, dir_id, filename, ext, size, mtime, type,
+        width, height, duration_s, hash, created_exif, missing
+    )
+    VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)
+    ON CONFLICT(dir_id, filename) DO UPDATE SET
+        folder_id=excluded.folder_id,
+        ext=excluded.ext,
+        size=excluded.size,
+        mtime=excluded.mtime,
+        type=excluded.type,
+        width={_KEEP_IF_UNCHANGED.format(col="width")},
+        height={_KEEP_IF_UNCHANGED.format(col="height")},
+        duration_s={_KEEP_IF_UNCHANGED.format(col="duration_s")},
+        hash={_KEEP_IF_UNCHANGED.format(col="hash")},
+        created_exif={_KEEP_IF_UNCHANGED.format(col="created_exif")},
+        missing=0
+"""
+
+_UPSERT_THUMBNAIL_SQL = """
+    INSERT INTO thumbnails(
+        media_id, kind, thumb_path, width, height,
+        src_size, src_mtime, bytes, last_access
+    )
+    VALUES(?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))
+    ON CONFLICT(media_id, kind) DO UPDATE SET
+        thumb_path=excluded.thumb_path,
+        width=excluded.width,
+        height=excluded.height,
+        src_size=excluded.src_size,
+        src_mtime=excluded.src_mtime,
+        bytes=excluded.bytes,
+        last_access=excluded.last_access,
+        generated_at=datetime('now')
+"""
+
+_UPSERT_ANALYSIS_SQL = """
+    INSERT INTO analysis(
+        media_id, analyzer, analyzer_version, score, payload, src_size, src_mtime
+    )
+    VALUES(?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(media_id, analyzer, analyzer_version) DO UPDATE SET
+        score=excluded.score,
+        payload=excluded.payload,
+        src_size=excluded.src_size,
+        src_mtime=excluded.src_mtime,
+        updated_at=datetime('now')
+"""
+
+# Resultaten van andere (oudere) analyzer-versies zijn na een herberekening waardeloos
+_DELETE_OTHER_VERSIONS_SQL = (
+    "DELETE FROM analysis WHERE media_id=? AND analyzer=? AND analyzer_version<>?"
+)
+
+_UPDATE_PHASH_SQL = "UPDATE media SET phash=?, phash_size=?, phash_mtime=? WHERE id=?"
+
+_DIR_TREE_VERSION_SQL = "SELECT value FROM preferences WHERE key = 'dir_tree_version'"
+
+# Alles onder een map (de map zelf inbegrepen) via directory_closure
+_UNDER_DIR_SQL = "SELECT descendant_id FROM directory_closure WHERE ancestor_id = ?"
+
+# Herdetectie: nieuw gezichtsvak neemt de toewijzing over van het oude vak
+# waarmee het minstens zoveel overlapt (intersection over union)
+FACE_MATCH_IOU = 0.5
+
+
+# [FUNC: def _box_iou]
+def _box_iou(a: Tuple[int, int, int, int], b: Tuple[int, int, int, int]) -> float:
+    """IoU van twee vakken (x, y, w, h)."""
+    ix = max(0, min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+# [END: FUNC: def _box_iou]
+
+
+# [FUNC: def _strip_sep]
+def _strip_sep(path: str) -> str:
+    """Pad zonder afsluitend scheidingsteken ('D:/Foto/' → 'D:/Foto'; '/' blijft)."""
+    return path.rstrip("/\\") or path
+
+# [END: FUNC: def _strip_sep]
+
+
+# [CLASS: _DirTree]
+# [SECTION: CLASS: _DirTree]
+class _DirTree:
+    """
+    Mappenkaart {dir_id: absoluut pad} en omgekeerd, zoals bij één waarde van
+    dir_tree_version. version None = ongeldig: de volgende opvraging herbouwt.
+    """
+
+    __slots__ = ("version", "paths", "ids")
+
+# [FUNC: __init__]
+    def __init__(self, version: Optional[str], paths: Dict[int, str]) -> None:
+        self.version = version
+        self.paths: Dict[int, str] = {}
+        self.ids: Dict[str, int] = {}
+        for dir_id, path in paths.items():
+            self.add(dir_id, path)
+
+# [END: FUNC: __init__]
+
+# [FUNC: add]
+    def add(self, dir_id: int, path: str) -> None:
+        self.paths[dir_id] = path
+        self.ids[path] = dir_id
+        # bibliotheekmap 'D:/Foto/': dirname() van zijn bestanden geeft 'D:/Foto'
+        self.ids.setdefault(_strip_sep(path), dir_id)
+
+# [END: FUNC: add]
+
+# [FUNC: locate]
+    def locate(self, path: str) -> Optional[Tuple[int, str]]:
+        """(dir_id, filename) van een mediapad; None als de map onbekend is."""
+        dir_id = self.ids.get(os.path.dirname(path))
+        return None if dir_id is None else (dir_id, os.path.basename(path))
+
+# [END: FUNC: locate]
+# [END: SECTION: CLASS: _DirTree]
+# [END: CLASS: _DirTree]
+
 
 # [CLASS: DbService]
 # [SECTION: CLASS: DbService]
@@ -17,6 +150,9 @@ class DbService:
     """
     Lichtgewicht servicelaag rond SQLite.
     Houdt verbinding kortlevend per call om UI-blokkades te vermijden.
+    media en directories bewaren geen absoluut pad maar (dir_id, filename) en
+    (parent_id, name); de API blijft met volledige paden werken via een
+    gecachete mappenkaart (_tree) en de SQL-functie media_path(dir_id, filename).
     """
 
     DEFAULT_DB_PATH = os.environ.get(
@@ -30,6 +166,7 @@ class DbService:
 # [FUNC: __init__]
     def __init__(self, db_path: Optional[str] = None) -> None:
         self.db_path = db_path or self.DEFAULT_DB_PATH
+        self._tree_cache: Optional[_DirTree] = None
         logger.debug("DbService init met pad: %s", self.db_path)
 
 # [END: FUNC: __init__]
@@ -38,10 +175,166 @@ class DbService:
     def _connect(self) -> sqlite3.Connection:
         conn = sqlite3.connect(self.db_path)
         conn.execute("PRAGMA foreign_keys = ON;")
+        conn.create_function("media_path", 2, self._media_path)
         return conn
 
 # [END: FUNC: _connect]
 
+# [FUNC: _media_path]
+    def _media_path(self, dir_id: Optional[int], filename: Optional[str]) -> Optional[str]:
+        """SQL-functie media_path(dir_id, filename); de kaart komt van de laatste _tree()."""
+        tree = self._tree_cache
+        base = tree.paths.get(dir_id) if tree is not None else None
+        if base is None or filename is None:
+            return None
+        return os.path.join(base, filename)
+
+# [END: FUNC: _media_path]
+
+# [FUNC: _tree]
+    def _tree(self, cur: sqlite3.Cursor) -> _DirTree:
+        """
+        Gecachete mappenkaart, herbouwd zodra dir_tree_version verandert (triggers
+        op directories/folders, dus ook na schrijven vanuit een andere verbinding
+        of een ander proces). Aanroepen vóór elke query met media_path() of
+        padopzoekingen. Pad van een map = pad van de ouder + naam; een scanroot
+        (parent_id NULL) krijgt folders.path, dus verhuizen = één rij.
+        """
+        cur.execute(_DIR_TREE_VERSION_SQL)
+        row = cur.fetchone()
+        version = row[0] if row else None
+        tree = self._tree_cache
+        if tree is not None and version is not None and tree.version == version:
+            return tree
+        cur.execute(
+            "SELECT d.id, d.parent_id, d.name, f.path FROM directories d"
+            " JOIN folders f ON f.id = d.folder_id ORDER BY d.depth, d.id"
+        )
+        paths: Dict[int, str] = {}
+        pending = cur.fetchall()
+        while pending:
+            rest = []
+            for dir_id, parent_id, name, root in pending:
+                if parent_id is None:
+                    paths[dir_id] = root
+                elif parent_id in paths:
+                    paths[dir_id] = os.path.join(paths[parent_id], name)
+                else:
+                    rest.append((dir_id, parent_id, name, root))
+            if len(rest) == len(pending):
+                break  # ouder onbereikbaar: die mappen kunnen niet bestaan
+            pending = rest
+        tree = _DirTree(version, paths)
+        self._tree_cache = tree
+        return tree
+
+# [END: FUNC: _tree]
+
+# [FUNC: _tree_begin]
+    def _tree_begin(self, cur: sqlite3.Cursor) -> _DirTree:
+        """
+        Schrijftransactie die mappen kan aanmaken: BEGIN IMMEDIATE houdt andere
+        schrijvers buiten, zodat de kaart binnen de transactie bijgewerkt kan
+        worden i.p.v. na elke nieuwe map volledig herbouwd (eerste scan).
+        Afsluiten met _tree_commit vóór conn.commit().
+        """
+        cur.execute("BEGIN IMMEDIATE")
+        tree = self._tree(cur)
+        tree.version = None  # tot _tree_commit: bij een fout wordt hij herbouwd
+        return tree
+
+# [END: FUNC: _tree_begin]
+
+# [FUNC: _tree_commit]
+    def _tree_commit(self, cur: sqlite3.Cursor, tree: _DirTree) -> None:
+        """De kaart (met de via _insert_dir toegevoegde mappen) is weer actueel."""
+        cur.execute(_DIR_TREE_VERSION_SQL)
+        row = cur.fetchone()
+        tree.version = row[0] if row else None
+
+# [END: FUNC: _tree_commit]
+
+# [FUNC: _insert_dir]
+    def _insert_dir(
+        self,
+        cur: sqlite3.Cursor,
+        tree: _DirTree,
+        path: str,
+        parent_id: Optional[int],
+        folder_id: int,
+    ) -> int:
+        cur.execute(
+            "INSERT INTO directories(folder_id, parent_id, name) VALUES(?, ?, ?)",
+            (folder_id, parent_id, os.path.basename(_strip_sep(path)) or path),
+        )
+        dir_id = int(cur.lastrowid)
+        self._link_directory(cur, dir_id, parent_id)
+        tree.add(dir_id, path)
+        return dir_id
+
+# [END: FUNC: _insert_dir]
+
+# [FUNC: _ensure_dir]
+    def _ensure_dir(
+        self, cur: sqlite3.Cursor, tree: _DirTree, path: str, folder_id: int
+    ) -> Optional[int]:
+        """
+        dir_id van path; een onbekende map wordt met zijn ontbrekende voorouders
+        tot aan de bibliotheekmap van folder_id aangemaakt (mtime NULL: de
+        volgende rescan lijst hem op). None als path daar niet onder ligt.
+        Binnen _tree_begin/_tree_commit.
+        """
+        dir_id = tree.ids.get(path)
+        if dir_id is not None:
+            return dir_id
+        cur.execute("SELECT path FROM folders WHERE id = ?", (folder_id,))
+        row = cur.fetchone()
+        if row is None:
+            return None
+        root = row[0]
+        chain: List[str] = []
+        p = path
+        while p not in tree.ids and _strip_sep(p) != _strip_sep(root):
+            parent = os.path.dirname(p)
+            if parent == p:
+                return None
+            chain.append(p)
+            p = parent
+        parent_id = tree.ids.get(p)
+        if parent_id is None:
+            parent_id = self._insert_dir(cur, tree, root, None, folder_id)
+        base = tree.paths[parent_id]
+        for q in reversed(chain):
+            base = os.path.join(base, os.path.basename(q))
+            if base != q:
+                return None  # niet als ouder + naam terug te bouwen
+            parent_id = self._insert_dir(cur, tree, q, parent_id, folder_id)
+        return parent_id
+
+# [END: FUNC: _ensure_dir]
+
+# [FUNC: _load_media_keys]
+    def _load_media_keys(self, cur: sqlite3.Cursor, paths: Iterable[str]) -> int:
+        """
+        Vul temp._media_keys(dir_id, filename, path) voor een join op de
+        UNIQUE-index media(dir_id, filename); paden in onbekende mappen vallen weg.
+        """
+        tree = self._tree(cur)
+        rows = []
+        for path in dict.fromkeys(paths):
+            key = tree.locate(path)
+            if key is not None:
+                rows.append((*key, path))
+        cur.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS _media_keys("
+            "dir_id INTEGER, filename TEXT, path TEXT, PRIMARY KEY(dir_id, filename))"
+        )
+        cur.execute("DELETE FROM temp._media_keys")
+        cur.executemany("INSERT OR IGNORE INTO temp._media_keys VALUES(?, ?, ?)", rows)
+        return len(rows)
+
+# [END: FUNC: _load_media_keys]
+
 # [FUNC: add_folder]
     def add_folder(self, path: str) -> int:
         logger.debug("add_folder(%s)", path)
@@ -74,53 +367,49 @@ class DbService:
         duration_s: Optional[float] = None,
         file_hash: Optional[str] = None,
         created_exif: Optional[str] = None,
+        dir_id: Optional[int] = None,
     ) -> int:
         """
-        Upsert per uniek 'path'. Markeer missing=0 bij (her)vinden.
+        Upsert per uniek (map, bestandsnaam). Markeer missing=0 bij (her)vinden.
+        Afgeleide velden (afmetingen, duur, hash, EXIF-datum) die niet meegegeven
+        worden blijven behouden zolang size/mtime van het bestand niet wijzigen.
+        Zonder dir_id wordt de map van path opgezocht of aangemaakt; 0 als path
+        niet onder de bibliotheekmap ligt.
         """
         logger.debug("upsert_media(path=%s, type=%s)", path, mtype)
         with self._connect() as conn:
             cur = conn.cursor()
-            cur.execute(
-                """
-                INSERT INTO media(
-                    folder_id, path, filename, ext, size, mtime, type,
-                    width, height, duration_s, hash, created_exif, missing
+            tree = self._tree_begin(cur)
+            if dir_id is None:
+                dir_id = self._ensure_dir(cur, tree, os.path.dirname(path), folder_id)
+            media_id = 0
+            if dir_id is not None:
+                cur.execute(
+                    _UPSERT_MEDIA_SQL,
+                    (
+                        folder_id,
+                        dir_id,
+                        filename,
+                        ext,
+                        size,
+                        mtime,
+                        mtype,
+                        width,
+                        height,
+                        duration_s,
+                        file_hash,
+                        created_exif,
+                    ),
                 )
-                VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)
-                ON CONFLICT(path) DO UPDATE SET
-                    folder_id=excluded.folder_id,
-                    filename=excluded.filename,
-                    ext=excluded.ext,
-                    size=excluded.size,
-                    mtime=excluded.mtime,
-                    type=excluded.type,
-                    width=excluded.width,
-                    height=excluded.height,
-                    duration_s=excluded.duration_s,
-                    hash=excluded.hash,
-                    created_exif=excluded.created_exif,
-                    missing=0
-                """,
-                (
-                    folder_id,
-                    path,
-                    filename,
-                    ext,
-                    size,
-                    mtime,
-                    mtype,
-                    width,
-                    height,
-                    duration_s,
-                    file_hash,
-                    created_exif,
-                ),
-            )
+                cur.execute(
+                    "SELECT id FROM media WHERE dir_id=? AND filename=?", (dir_id, filename)
+                )
+                row = cur.fetchone()
+                media_id = int(row[0]) if row else 0
+            else:
+                logger.warning("Media buiten bibliotheekmap %s genegeerd: %s", folder_id, path)
+            self._tree_commit(cur, tree)
             conn.commit()
-            cur.execute("SELECT id FROM media WHERE path=?", (path,))
-            row = cur.fetchone()
-            media_id = int(row[0]) if row else 0
         logger.info("Media upsert id=%s path=%s", media_id, path)
         return media_id
 
@@ -140,11 +429,13 @@ class DbService:
         with self._connect() as conn:
             cur = conn.cursor()
             # haal alle paden in folder
-            cur.execute("SELECT path FROM media WHERE folder_id=?", (folder_id,))
-            all_paths = [r[0] for r in cur.fetchall()]
-            to_mark = [p for p in all_paths if p not in existing]
-            for p in to_mark:
-                cur.execute("UPDATE media SET missing=1 WHERE path=?", (p,))
+            self._tree(cur)
+            cur.execute(
+                "SELECT id, media_path(dir_id, filename) FROM media WHERE folder_id=?",
+                (folder_id,),
+            )
+            to_mark = [(mid,) for mid, p in cur.fetchall() if p not in existing]
+            cur.executemany("UPDATE media SET missing=1 WHERE id=?", to_mark)
             conn.commit()
         logger.info("Missing gemarkeerd: %s records", len(to_mark))
         return len(to_mark)
@@ -159,13 +450,23 @@ class DbService:
         mtype: Optional[str] = None,  # 'image' | 'video'
         favorite: Optional[bool] = None,
         hidden: Optional[bool] = None,
+        missing: Optional[bool] = None,
+        under_dir: Optional[int] = None,  # directories.id: deze map + alle submappen
         tag_names: Optional[List[str]] = None,
         text: Optional[str] = None,
         limit: int = 500,
         offset: int = 0,
+        rank: Optional[str] = None,  # None (nieuwste eerst) | 'semantic'
+        semantic_text: Optional[str] = None,
+        similar_to: Optional[int] = None,
     ) -> List[Dict[str, Any]]:
         """
         Eenvoudige zoekfunctie met optionele filters.
+        under_dir: indexbereik op directory_closure i.p.v. een LIKE op het pad
+        (zie directory_ids() om een pad naar een map-id te vertalen).
+        rank='semantic': rangschik op gelijkenis met semantic_text (beschrijving)
+        of met het beeld similar_to (media_id) via de lokale embedding-index;
+        elk resultaat krijgt dan ook een 'score'.
         """
         logger.debug("search_media(filters...) start")
         params: List[Any] = []
@@ -183,8 +484,14 @@ class DbService:
         if hidden is not None:
             where.append("m.hidden = ?")
             params.append(1 if hidden else 0)
+        if missing is not None:
+            where.append("m.missing = ?")
+            params.append(1 if missing else 0)
+        if under_dir is not None:
+            where.append(f"m.dir_id IN ({_UNDER_DIR_SQL})")
+            params.append(under_dir)
         if text:
-            where.append("(m.filename LIKE ? OR m.path LIKE ?)")
+            where.append("(m.filename LIKE ? OR media_path(m.dir_id, m.filename) LIKE ?)")
             like = f"%{text}%"
             params.extend([like, like])
 
@@ -199,17 +506,46 @@ class DbService:
             where.append(f"t.name IN ({placeholders})")
             params.extend(tag_names)
 
+        ranking: List[Tuple[int, float]] = []
+        if rank == "semantic":
+            from ai.semantic_search import zoek  # lazy: NumPy/onnxruntime optioneel
+
+            # ruim kandidaten ophalen: de SQL-filters hieronder vallen er nog af
+            ranking = zoek(
+                self,
+                tekst=semantic_text,
+                similar_to=similar_to,
+                k=max(1000, (limit + offset) * 5),
+            )
+            if not ranking:
+                return []
+            join += " JOIN temp._rank r ON r.media_id = m.id"
+            order = "r.score DESC"
+            score_col = ", r.score"
+        else:
+            order = "m.id DESC"
+            score_col = ""
+
         sql = (
-            "SELECT m.id, m.path, m.filename, m.ext, m.size, m.mtime, m.type, m.favorite,"
-            " m.hidden, m.missing FROM media m"
+            "SELECT m.id, media_path(m.dir_id, m.filename), m.filename, m.ext, m.size,"
+            " m.mtime, m.type, m.favorite,"
+            f" m.hidden, m.missing{score_col} FROM media m"
             f"{join} WHERE {' AND '.join(where)}"
             " GROUP BY m.id"
-            " ORDER BY m.id DESC LIMIT ? OFFSET ?"
+            f" ORDER BY {order} LIMIT ? OFFSET ?"
         )
         params.extend([limit, offset])
 
         with self._connect() as conn:
             cur = conn.cursor()
+            if ranking:
+                cur.execute(
+                    "CREATE TEMP TABLE IF NOT EXISTS _rank("
+                    "media_id INTEGER PRIMARY KEY, score REAL)"
+                )
+                cur.execute("DELETE FROM temp._rank")
+                cur.executemany("INSERT OR IGNORE INTO temp._rank VALUES(?, ?)", ranking)
+            self._tree(cur)
             cur.execute(sql, tuple(params))
             rows = cur.fetchall()
 
@@ -225,6 +561,7 @@ class DbService:
                 "favorite": r[7],
                 "hidden": r[8],
                 "missing": r[9],
+                **({"score": r[10]} if ranking else {}),
             }
             for r in rows
         ]
@@ -320,26 +657,1474 @@ class DbService:
 
 # [FUNC: set_thumbnail]
     def set_thumbnail(
-        self, media_id: int, kind: str, thumb_path: str, width: int, height: int
+        self,
+        media_id: int,
+        kind: str,
+        thumb_path: str,
+        width: int,
+        height: int,
+        src_size: Optional[int] = None,
+        src_mtime: Optional[float] = None,
+        file_bytes: Optional[int] = None,
+    ) -> None:
+        self.set_thumbnails(
+            [(media_id, kind, thumb_path, width, height, src_size, src_mtime, file_bytes)]
+        )
+        logger.debug("Thumbnail gezet media_id=%s kind=%s", media_id, kind)
+
+# [END: FUNC: set_thumbnail]
+
+# [FUNC: set_thumbnails]
+    def set_thumbnails(self, rows: Iterable[Tuple[Any, ...]]) -> int:
+        """
+        Batch-variant van set_thumbnail in één transactie.
+        rows: (media_id, kind, thumb_path, width, height, src_size, src_mtime, bytes)
+        """
+        data = list(rows)
+        if not data:
+            return 0
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.executemany(
+                _UPSERT_THUMBNAIL_SQL,
+                data,
+            )
+            conn.commit()
+        return len(data)
+
+# [END: FUNC: set_thumbnails]
+
+# [FUNC: get_thumbnails_for_paths]
+    def get_thumbnails_for_paths(
+        self, paths: Iterable[str], kind: str
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Geldige thumbnails (src_size/src_mtime == media.size/mtime) per mediapad.
+        Raakt last_access aan zodat eviction recent gebruikte thumbs spaart.
+        """
+        wanted = list(dict.fromkeys(paths))
+        result: Dict[str, Dict[str, Any]] = {}
+        if not wanted:
+            return result
+        with self._connect() as conn:
+            cur = conn.cursor()
+            self._load_media_keys(cur, wanted)
+            cur.execute(
+                "SELECT t.id, k.path, t.thumb_path, t.width, t.height FROM temp._media_keys k"
+                " JOIN media m ON m.dir_id = k.dir_id AND m.filename = k.filename"
+                " JOIN thumbnails t ON t.media_id = m.id"
+                " WHERE t.kind = ? AND t.src_size IS m.size AND t.src_mtime IS m.mtime",
+                (kind,),
+            )
+            for tid, path, thumb_path, w, h in cur.fetchall():
+                result[path] = {
+                    "id": tid,
+                    "thumb_path": thumb_path,
+                    "width": w,
+                    "height": h,
+                }
+            if result:
+                ids = [r["id"] for r in result.values()]
+                cur.executemany(
+                    "UPDATE thumbnails SET last_access=datetime('now') WHERE id=?",
+                    [(i,) for i in ids],
+                )
+            conn.commit()
+        return result
+
+# [END: FUNC: get_thumbnails_for_paths]
+
+# [FUNC: media_needing_thumbnail]
+    def media_needing_thumbnail(
+        self, kind: str, mtype: str = "image", limit: Optional[int] = None
+    ) -> List[Tuple[int, str, Optional[int], Optional[float], Optional[str]]]:
+        """
+        (id, path, size, mtime, oude_thumb_path) van media zonder geldige thumbnail
+        van dit soort: geen rij, of gegenereerd bij een andere size/mtime.
+        """
+        sql = (
+            "SELECT m.id, media_path(m.dir_id, m.filename), m.size, m.mtime, t.thumb_path"
+            " FROM media m"
+            " LEFT JOIN thumbnails t ON t.media_id = m.id AND t.kind = ?"
+            " WHERE m.type = ? AND m.missing = 0"
+            " AND (t.id IS NULL OR t.src_size IS NOT m.size OR t.src_mtime IS NOT m.mtime)"
+            " ORDER BY m.id"
+        )
+        params: List[Any] = [kind, mtype]
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        with self._connect() as conn:
+            cur = conn.cursor()
+            self._tree(cur)
+            cur.execute(sql, tuple(params))
+            rows = [(int(r[0]), r[1], r[2], r[3], r[4]) for r in cur.fetchall()]
+        logger.debug("media_needing_thumbnail(kind=%s) → %s", kind, len(rows))
+        return rows
+
+# [END: FUNC: media_needing_thumbnail]
+
+# [FUNC: set_video_metadata]
+    def set_video_metadata(
+        self, rows: Iterable[Tuple[int, Optional[float], Optional[int], Optional[int]]]
+    ) -> int:
+        """Batch-update van (media_id, duration_s, width, height); None laat een veld ongemoeid."""
+        data = [(d, w, h, mid) for mid, d, w, h in rows]
+        if not data:
+            return 0
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.executemany(
+                "UPDATE media SET duration_s=COALESCE(?, duration_s),"
+                " width=COALESCE(?, width), height=COALESCE(?, height) WHERE id=?",
+                data,
+            )
+            conn.commit()
+        return len(data)
+
+# [END: FUNC: set_video_metadata]
+
+# [FUNC: thumbnail_bytes_total]
+    def thumbnail_bytes_total(self) -> int:
+        """
+        Bytes op schijf: elke thumb_path één keer (content-addressed opslag
+        deelt één bestand/pack-entry tussen identieke thumbnails).
+        """
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT COALESCE(SUM(b), 0) FROM ("
+                " SELECT MAX(COALESCE(bytes, 0)) AS b FROM thumbnails GROUP BY thumb_path)"
+            )
+            return int(cur.fetchone()[0])
+
+# [END: FUNC: thumbnail_bytes_total]
+
+# [FUNC: thumbnails_by_last_access]
+    def thumbnails_by_last_access(
+        self, limit: int = 1000
+    ) -> List[Tuple[int, str, int]]:
+        """(id, thumb_path, bytes) van minst recent gebruikte thumbnails eerst."""
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT id, thumb_path, COALESCE(bytes, 0) FROM thumbnails"
+                " ORDER BY COALESCE(last_access, generated_at) ASC, id ASC LIMIT ?",
+                (int(limit),),
+            )
+            return [(int(r[0]), r[1], int(r[2])) for r in cur.fetchall()]
+
+# [END: FUNC: thumbnails_by_last_access]
+
+# [FUNC: delete_thumbnails]
+    def delete_thumbnails(self, thumb_ids: Iterable[int]) -> List[str]:
+        """
+        Verwijdert thumbnail-rijen en retourneert de thumb_paths die daarna
+        door geen enkele rij meer gebruikt worden (veilig om te wissen).
+        """
+        ids = list(thumb_ids)
+        if not ids:
+            return []
+        candidates: set = set()
+        with self._connect() as conn:
+            cur = conn.cursor()
+            for i in range(0, len(ids), 500):
+                chunk = ids[i : i + 500]
+                placeholders = ",".join("?" for _ in chunk)
+                cur.execute(
+                    f"SELECT DISTINCT thumb_path FROM thumbnails WHERE id IN ({placeholders})",
+                    tuple(chunk),
+                )
+                candidates.update(r[0] for r in cur.fetchall())
+                cur.execute(
+                    f"DELETE FROM thumbnails WHERE id IN ({placeholders})", tuple(chunk)
+                )
+            conn.commit()
+        orphaned = self.unreferenced_thumb_paths(candidates)
+        logger.info("Thumbnails verwijderd: %s (bestanden vrij: %s)", len(ids), len(orphaned))
+        return orphaned
+
+# [END: FUNC: delete_thumbnails]
+
+# [FUNC: unreferenced_thumb_paths]
+    def unreferenced_thumb_paths(self, thumb_paths: Iterable[str]) -> List[str]:
+        """Subset van thumb_paths waar geen enkele thumbnails-rij nog naar wijst."""
+        result: List[str] = []
+        with self._connect() as conn:
+            cur = conn.cursor()
+            for path in set(p for p in thumb_paths if p):
+                cur.execute("SELECT 1 FROM thumbnails WHERE thumb_path=? LIMIT 1", (path,))
+                if cur.fetchone() is None:
+                    result.append(path)
+        return result
+
+# [END: FUNC: unreferenced_thumb_paths]
+
+# [FUNC: add_pack_entries]
+    def add_pack_entries(self, rows: Iterable[Tuple[str, int, int, int]]) -> int:
+        """
+        Registreer thumbnails in packbestanden: (digest, pack_id, offset, length).
+        Een digest die al bestaat blijft naar de eerste kopie wijzen.
+        """
+        data = list(rows)
+        if not data:
+            return 0
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.executemany(
+                "INSERT OR IGNORE INTO thumbnail_packs(digest, pack_id, byte_offset, byte_length)"
+                " VALUES(?, ?, ?, ?)",
+                data,
+            )
+            conn.commit()
+        return len(data)
+
+# [END: FUNC: add_pack_entries]
+
+# [FUNC: get_pack_entries]
+    def get_pack_entries(
+        self, digests: Iterable[str]
+    ) -> Dict[str, Tuple[int, int, int]]:
+        """{digest: (pack_id, offset, length)} voor de gevraagde digests."""
+        wanted = list(dict.fromkeys(digests))
+        result: Dict[str, Tuple[int, int, int]] = {}
+        with self._connect() as conn:
+            cur = conn.cursor()
+            for i in range(0, len(wanted), 500):
+                chunk = wanted[i : i + 500]
+                placeholders = ",".join("?" for _ in chunk)
+                cur.execute(
+                    "SELECT digest, pack_id, byte_offset, byte_length FROM thumbnail_packs"
+                    f" WHERE digest IN ({placeholders})",
+                    tuple(chunk),
+                )
+                for d, pack_id, off, length in cur.fetchall():
+                    result[d] = (int(pack_id), int(off), int(length))
+        return result
+
+# [END: FUNC: get_pack_entries]
+
+# [FUNC: pack_entries_with_liveness]
+    def pack_entries_with_liveness(self) -> List[Tuple[str, int, int, int, bool]]:
+        """
+        Alle pack-entries als (digest, pack_id, offset, length, live).
+        live = er wijst nog een thumbnails-rij naar 'pack://<digest>'.
+        """
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT p.digest, p.pack_id, p.byte_offset, p.byte_length,"
+                " EXISTS(SELECT 1 FROM thumbnails t WHERE t.thumb_path = 'pack://' || p.digest)"
+                " FROM thumbnail_packs p ORDER BY p.pack_id, p.byte_offset"
+            )
+            return [
+                (r[0], int(r[1]), int(r[2]), int(r[3]), bool(r[4]))
+                for r in cur.fetchall()
+            ]
+
+# [END: FUNC: pack_entries_with_liveness]
+
+# [FUNC: relocate_pack_entries]
+    def relocate_pack_entries(
+        self,
+        moved: Iterable[Tuple[str, int, int, int]],
+        dropped_packs: Iterable[int],
     ) -> None:
+        """
+        Compactie in één transactie: zet verplaatste entries op hun nieuwe
+        (pack_id, offset, length) en wis alle overige entries van dropped_packs.
+        """
+        packs = list(dropped_packs)
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.executemany(
+                "UPDATE thumbnail_packs SET pack_id=?, byte_offset=?, byte_length=?"
+                " WHERE digest=?",
+                [(p, o, n, d) for d, p, o, n in moved],
+            )
+            if packs:
+                placeholders = ",".join("?" for _ in packs)
+                cur.execute(
+                    f"DELETE FROM thumbnail_packs WHERE pack_id IN ({placeholders})",
+                    tuple(packs),
+                )
+            conn.commit()
+
+# [END: FUNC: relocate_pack_entries]
+
+# [FUNC: size_collision_candidates]
+    def size_collision_candidates(
+        self, min_size: int = 1
+    ) -> List[Tuple[int, str, int, Optional[float], Optional[str], Optional[str], bool]]:
+        """
+        Stap 1 van de duplicaatzoeker: alleen media waarvan de size met minstens
+        één ander (niet-missing) bestand overeenkomt, gesorteerd op size.
+        Return: (id, path, size, mtime, partial_hash, hash, hashes_geldig)
+        """
         with self._connect() as conn:
             cur = conn.cursor()
+            self._tree(cur)
             cur.execute(
                 """
-                INSERT INTO thumbnails(media_id, kind, thumb_path, width, height)
-                VALUES(?, ?, ?, ?, ?)
-                ON CONFLICT(media_id, kind) DO UPDATE SET
-                    thumb_path=excluded.thumb_path,
-                    width=excluded.width,
-                    height=excluded.height,
-                    generated_at=datetime('now')
+                SELECT m.id, media_path(m.dir_id, m.filename), m.size, m.mtime,
+                       m.partial_hash, m.hash,
+                       (m.hash_size IS m.size AND m.hash_mtime IS m.mtime)
+                FROM media m
+                WHERE m.missing = 0 AND m.size IN (
+                    SELECT size FROM media
+                    WHERE missing = 0 AND size >= ?
+                    GROUP BY size HAVING COUNT(*) > 1
+                )
+                ORDER BY m.size, m.id
                 """,
-                (media_id, kind, thumb_path, width, height),
+                (int(min_size),),
+            )
+            rows = [
+                (int(r[0]), r[1], int(r[2]), r[3], r[4], r[5], bool(r[6]))
+                for r in cur.fetchall()
+            ]
+        logger.debug("size_collision_candidates → %s", len(rows))
+        return rows
+
+# [END: FUNC: size_collision_candidates]
+
+# [FUNC: set_file_hashes]
+    def set_file_hashes(
+        self,
+        rows: Iterable[Tuple[int, Optional[str], Optional[str], int, Optional[float]]],
+    ) -> int:
+        """
+        Bewaar (media_id, partial_hash, hash, size, mtime): size/mtime leggen vast
+        voor welke versie van het bestand de hashes gelden.
+        """
+        data = [(ph, h, sz, mt, mid) for mid, ph, h, sz, mt in rows]
+        if not data:
+            return 0
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.executemany(
+                "UPDATE media SET partial_hash=?, hash=?, hash_size=?, hash_mtime=?"
+                " WHERE id=?",
+                data,
             )
             conn.commit()
-        logger.debug("Thumbnail gezet media_id=%s kind=%s", media_id, kind)
+        return len(data)
 
-# [END: FUNC: set_thumbnail]
+# [END: FUNC: set_file_hashes]
+
+# [FUNC: find_duplicate_groups]
+    def find_duplicate_groups(
+        self, min_size: int = 1, limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Groepen byte-identieke bestanden op basis van een geldige volledige hash.
+        Return: [{"hash", "size", "ids": [...], "paths": [...]}], grootste verspilling eerst.
+        """
+        sql = """
+            SELECT m.hash, m.size, m.id, media_path(m.dir_id, m.filename)
+            FROM media m
+            JOIN (
+                SELECT hash, size FROM media
+                WHERE missing = 0 AND hash IS NOT NULL AND size >= ?
+                  AND hash_size IS size AND hash_mtime IS mtime
+                GROUP BY hash, size HAVING COUNT(*) > 1
+            ) d ON d.hash = m.hash AND d.size = m.size
+            WHERE m.missing = 0 AND m.hash_size IS m.size AND m.hash_mtime IS m.mtime
+            ORDER BY m.size DESC, m.hash, m.id
+        """
+        groups: List[Dict[str, Any]] = []
+        with self._connect() as conn:
+            cur = conn.cursor()
+            self._tree(cur)
+            cur.execute(sql, (int(min_size),))
+            current: Optional[Dict[str, Any]] = None
+            for h, size, mid, path in cur.fetchall():
+                if current is None or current["hash"] != h or current["size"] != size:
+                    if limit is not None and len(groups) >= limit:
+                        break
+                    current = {"hash": h, "size": size, "ids": [], "paths": []}
+                    groups.append(current)
+                current["ids"].append(mid)
+                current["paths"].append(path)
+        logger.info("find_duplicate_groups → %s groepen", len(groups))
+        return groups
+
+# [END: FUNC: find_duplicate_groups]
+
+# [FUNC: media_needing_phash]
+    def media_needing_phash(
+        self, limit: Optional[int] = None
+    ) -> List[Tuple[int, str, Optional[int], Optional[float]]]:
+        """
+        Images zonder geldige perceptuele hash (ontbrekend of size/mtime gewijzigd).
+        Return: (id, path, size, mtime)
+        """
+        sql = """
+            SELECT id, media_path(dir_id, filename), size, mtime FROM media
+            WHERE type = 'image' AND missing = 0
+              AND (phash IS NULL OR phash_size IS NOT size OR phash_mtime IS NOT mtime)
+            ORDER BY id
+        """
+        params: Tuple[Any, ...] = ()
+        if limit is not None:
+            sql += " LIMIT ?"
+            params = (int(limit),)
+        with self._connect() as conn:
+            cur = conn.cursor()
+            self._tree(cur)
+            cur.execute(sql, params)
+            rows = [(int(r[0]), r[1], r[2], r[3]) for r in cur.fetchall()]
+        logger.debug("media_needing_phash → %s", len(rows))
+        return rows
+
+# [END: FUNC: media_needing_phash]
+
+# [FUNC: set_phashes]
+    def set_phashes(
+        self, rows: Iterable[Tuple[int, Optional[str], Optional[int], Optional[float]]]
+    ) -> int:
+        """Bewaar (media_id, phash, size, mtime); phash None = niet te decoderen."""
+        data = [(ph, sz, mt, mid) for mid, ph, sz, mt in rows]
+        if not data:
+            return 0
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.executemany(_UPDATE_PHASH_SQL, data)
+            conn.commit()
+        return len(data)
+
+# [END: FUNC: set_phashes]
+
+# [FUNC: valid_phashes]
+    def valid_phashes(self) -> List[Tuple[int, str]]:
+        """Alle geldige perceptuele hashes: (media_id, phash)."""
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                SELECT id, phash FROM media
+                WHERE missing = 0 AND phash IS NOT NULL
+                  AND phash_size IS size AND phash_mtime IS mtime
+                ORDER BY id
+                """
+            )
+            return [(int(r[0]), r[1]) for r in cur.fetchall()]
+
+# [END: FUNC: valid_phashes]
+
+# [FUNC: replace_near_duplicates]
+    def replace_near_duplicates(self, rows: Iterable[Tuple[int, int, int]]) -> int:
+        """
+        Vervang de volledige near_duplicates-tabel door (media_id, group_id, distance)
+        in één transactie, zodat lezers nooit een half resultaat zien.
+        """
+        data = list(rows)
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM near_duplicates")
+            cur.executemany(
+                "INSERT INTO near_duplicates(media_id, group_id, distance) VALUES(?, ?, ?)",
+                data,
+            )
+            conn.commit()
+        logger.info("near_duplicates vervangen: %s rijen", len(data))
+        return len(data)
+
+# [END: FUNC: replace_near_duplicates]
+
+# [FUNC: get_near_duplicate_groups]
+    def get_near_duplicate_groups(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Groepen bijna-identieke beelden, grootste groep eerst.
+        Return: [{"group_id", "ids": [...], "paths": [...], "distances": [...]}]
+        """
+        sql = """
+            SELECT n.group_id, m.id, media_path(m.dir_id, m.filename), n.distance
+            FROM near_duplicates n
+            JOIN media m ON m.id = n.media_id
+            JOIN (
+                SELECT group_id, COUNT(*) AS cnt FROM near_duplicates GROUP BY group_id
+            ) g ON g.group_id = n.group_id
+            ORDER BY g.cnt DESC, n.group_id, n.distance, m.id
+        """
+        groups: List[Dict[str, Any]] = []
+        with self._connect() as conn:
+            cur = conn.cursor()
+            self._tree(cur)
+            cur.execute(sql)
+            current: Optional[Dict[str, Any]] = None
+            for gid, mid, path, dist in cur.fetchall():
+                if current is None or current["group_id"] != gid:
+                    if limit is not None and len(groups) >= limit:
+                        break
+                    current = {"group_id": gid, "ids": [], "paths": [], "distances": []}
+                    groups.append(current)
+                current["ids"].append(mid)
+                current["paths"].append(path)
+                current["distances"].append(dist)
+        return groups
+
+# [END: FUNC: get_near_duplicate_groups]
+
+# [FUNC: media_needing_analysis]
+    def media_needing_analysis(
+        self,
+        analyzer: str,
+        version: int = 1,
+        mtype: str = "image",
+        limit: Optional[int] = None,
+    ) -> List[Tuple[int, str, Optional[int], Optional[float]]]:
+        """
+        Media zonder geldig resultaat voor deze analyzer-versie: nooit
+        geanalyseerd, bestand gewijzigd (size/mtime) of versie opgehoogd.
+        Return: (id, path, size, mtime)
+        """
+        sql = """
+            SELECT m.id, media_path(m.dir_id, m.filename), m.size, m.mtime
+            FROM media m
+            LEFT JOIN analysis a
+              ON a.media_id = m.id AND a.analyzer = ? AND a.analyzer_version = ?
+            WHERE m.type = ? AND m.missing = 0
+              AND (a.media_id IS NULL OR a.src_size IS NOT m.size OR a.src_mtime IS NOT m.mtime)
+            ORDER BY m.id
+        """
+        params: Tuple[Any, ...] = (analyzer, int(version), mtype)
+        if limit is not None:
+            sql += " LIMIT ?"
+            params += (int(limit),)
+        with self._connect() as conn:
+            cur = conn.cursor()
+            self._tree(cur)
+            cur.execute(sql, params)
+            rows = [(int(r[0]), r[1], r[2], r[3]) for r in cur.fetchall()]
+        logger.debug("media_needing_analysis(%s v%s) → %s", analyzer, version, len(rows))
+        return rows
+
+# [END: FUNC: media_needing_analysis]
+
+# [FUNC: _write_analysis]
+    def _write_analysis(
+        self,
+        cur: sqlite3.Cursor,
+        analyzer: str,
+        version: int,
+        rows: Iterable[Tuple[int, Optional[float], Any, Optional[int], Optional[float]]],
+    ) -> int:
+        """Upsert (media_id, score, payload, size, mtime) binnen een lopende transactie."""
+        data = [
+            (
+                mid, analyzer, int(version), score,
+                payload if payload is None or isinstance(payload, str) else json.dumps(payload),
+                sz, mt,
+            )
+            for mid, score, payload, sz, mt in rows
+        ]
+        cur.executemany(_UPSERT_ANALYSIS_SQL, data)
+        cur.executemany(
+            _DELETE_OTHER_VERSIONS_SQL, [(d[0], analyzer, int(version)) for d in data]
+        )
+        return len(data)
+
+# [END: FUNC: _write_analysis]
+
+# [FUNC: set_analysis_results]
+    def set_analysis_results(
+        self,
+        analyzer: str,
+        version: int,
+        rows: Iterable[Tuple[int, Optional[float], Any, Optional[int], Optional[float]]],
+    ) -> int:
+        """
+        Bewaar (media_id, score, payload, size, mtime) voor één analyzer-versie.
+        payload: JSON-tekst of een JSON-serialiseerbaar object (of None).
+        """
+        with self._connect() as conn:
+            n = self._write_analysis(conn.cursor(), analyzer, version, rows)
+            conn.commit()
+        return n
+
+# [END: FUNC: set_analysis_results]
+
+# [FUNC: set_analysis_scores]
+    def set_analysis_scores(
+        self,
+        analyzer: str,
+        rows: Iterable[Tuple[int, Optional[float], Optional[int], Optional[float]]],
+        version: int = 1,
+    ) -> int:
+        """Bewaar (media_id, score, size, mtime) zonder payload."""
+        return self.set_analysis_results(
+            analyzer, version, [(mid, score, None, sz, mt) for mid, score, sz, mt in rows]
+        )
+
+# [END: FUNC: set_analysis_scores]
+
+# [FUNC: get_analysis_results]
+    def get_analysis_results(
+        self, analyzer: str, media_ids: Iterable[int], version: Optional[int] = None
+    ) -> Dict[int, Dict[str, Any]]:
+        """
+        Geldige resultaten (bestand ongewijzigd) voor één analyzer:
+        {media_id: {"score", "payload", "version"}}. version=None: elke versie.
+        """
+        ids = list(media_ids)
+        out: Dict[int, Dict[str, Any]] = {}
+        version_sql = "" if version is None else " AND a.analyzer_version = ?"
+        with self._connect() as conn:
+            cur = conn.cursor()
+            for i in range(0, len(ids), 500):
+                chunk = ids[i : i + 500]
+                marks = ",".join("?" for _ in chunk)
+                params: Tuple[Any, ...] = (analyzer, *chunk)
+                if version is not None:
+                    params += (int(version),)
+                cur.execute(
+                    f"""
+                    SELECT a.media_id, a.score, a.payload, a.analyzer_version
+                    FROM analysis a JOIN media m ON m.id = a.media_id
+                    WHERE a.analyzer = ? AND a.media_id IN ({marks})
+                      AND a.src_size IS m.size AND a.src_mtime IS m.mtime{version_sql}
+                    ORDER BY a.analyzer_version
+                    """,
+                    params,
+                )
+                for mid, score, payload, ver in cur.fetchall():
+                    out[int(mid)] = {
+                        "score": score,
+                        "payload": json.loads(payload) if payload else None,
+                        "version": ver,
+                    }
+        return out
+
+# [END: FUNC: get_analysis_results]
+
+# [FUNC: get_analysis_scores]
+    def get_analysis_scores(
+        self, analyzer: str, media_ids: Iterable[int], version: Optional[int] = None
+    ) -> Dict[int, Optional[float]]:
+        """Geldige scores {media_id: score} voor één analyzer."""
+        results = self.get_analysis_results(analyzer, media_ids, version)
+        return {mid: r["score"] for mid, r in results.items()}
+
+# [END: FUNC: get_analysis_scores]
+
+# [FUNC: write_analysis_batch]
+    def write_analysis_batch(
+        self,
+        results: Optional[Dict[Tuple[str, int], List[Tuple[Any, ...]]]] = None,
+        phashes: Iterable[Tuple[int, Optional[str], Optional[int], Optional[float]]] = (),
+        thumbnails: Iterable[Tuple[Any, ...]] = (),
+        tags: Optional[Dict[int, List[str]]] = None,
+        faces: Optional[Dict[int, List[Tuple[int, int, int, int, bytes]]]] = None,
+    ) -> None:
+        """
+        Alle resultaten van één pipeline-batch in één transactie:
+        results {(analyzer, versie): [(media_id, score, payload, size, mtime)]}, phashes zoals
+        set_phashes, thumbnails zoals set_thumbnails en tags {media_id: [namen]}.
+        Tags worden enkel toegevoegd; handmatige tags blijven staan.
+        faces {media_id: [(x, y, w, h, embedding)]} vervangt de gezichten van die
+        media (toewijzingen gaan mee, zie _replace_faces).
+        """
+        with self._connect() as conn:
+            cur = conn.cursor()
+            for (analyzer, version), rows in (results or {}).items():
+                self._write_analysis(cur, analyzer, version, rows)
+            cur.executemany(_UPDATE_PHASH_SQL, [(ph, sz, mt, mid) for mid, ph, sz, mt in phashes])
+            cur.executemany(_UPSERT_THUMBNAIL_SQL, list(thumbnails))
+            for media_id, names in (tags or {}).items():
+                if not names:
+                    continue
+                cur.executemany(
+                    "INSERT OR IGNORE INTO tags(name) VALUES(?)", [(n,) for n in names]
+                )
+                marks = ",".join("?" for _ in names)
+                cur.execute(
+                    f"""
+                    INSERT OR IGNORE INTO media_tags(media_id, tag_id)
+                    SELECT ?, id FROM tags WHERE name IN ({marks})
+                    """,
+                    (media_id, *names),
+                )
+            if faces:
+                self._replace_faces(cur, faces)
+            conn.commit()
+
+# [END: FUNC: write_analysis_batch]
+
+# [FUNC: _replace_faces]
+    def _replace_faces(
+        self, cur: sqlite3.Cursor, faces: Dict[int, List[Tuple[int, int, int, int, bytes]]]
+    ) -> None:
+        """
+        Nieuwe detectie per media, binnen de transactie van de aanroeper. Elk
+        nieuw vak erft person_id, bevestiging en afwijzingen van het oude
+        gezicht waarmee het het best overlapt (IoU ≥ FACE_MATCH_IOU, elk oud
+        gezicht hooguit één keer). Bevestigde gezichten zonder opvolger
+        blijven staan: een bevestiging van de gebruiker gaat nooit verloren.
+        """
+        ids = list(faces)
+        old: Dict[int, List[Tuple]] = {}
+        for i in range(0, len(ids), 500):
+            chunk = ids[i : i + 500]
+            marks = ",".join("?" for _ in chunk)
+            cur.execute(
+                "SELECT id, media_id, x, y, w, h, person_id, person_confirmed FROM faces"
+                f" WHERE media_id IN ({marks})",
+                chunk,
+            )
+            for r in cur.fetchall():
+                old.setdefault(r[1], []).append(r)
+
+        for media_id, rows in faces.items():
+            previous = old.get(media_id, [])
+            pairs = sorted(
+                (
+                    (_box_iou(tuple(new[:4]), tuple(o[2:6])), n, k)
+                    for n, new in enumerate(rows)
+                    for k, o in enumerate(previous)
+                ),
+                reverse=True,
+            )
+            match: Dict[int, int] = {}
+            for iou, n, k in pairs:
+                if iou < FACE_MATCH_IOU:
+                    break
+                if n not in match and k not in match.values():
+                    match[n] = k
+            for n, (x, y, w, h, emb) in enumerate(rows):
+                o = previous[match[n]] if n in match else None
+                cur.execute(
+                    "INSERT INTO faces(media_id, x, y, w, h, embedding, person_id, person_confirmed)"
+                    " VALUES(?, ?, ?, ?, ?, ?, ?, ?)",
+                    (media_id, x, y, w, h, emb, o[6] if o else None, o[7] if o else 0),
+                )
+                if o is not None:
+                    cur.execute(
+                        "INSERT INTO face_rejections(face_id, person_id)"
+                        " SELECT ?, person_id FROM face_rejections WHERE face_id = ?",
+                        (cur.lastrowid, o[0]),
+                    )
+            matched = set(match.values())
+            cur.executemany(
+                "DELETE FROM faces WHERE id = ?",
+                [(o[0],) for k, o in enumerate(previous) if k in matched or not o[7]],
+            )
+
+# [END: FUNC: _replace_faces]
+
+# [FUNC: face_person_rows]
+    def face_person_rows(self) -> List[Tuple[int, Optional[int]]]:
+        """Alle gezichten met embedding: (face_id, person_id), oplopend op id."""
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT id, person_id FROM faces WHERE embedding IS NOT NULL ORDER BY id"
+            )
+            return [(int(r[0]), r[1]) for r in cur.fetchall()]
+
+# [END: FUNC: face_person_rows]
+
+# [FUNC: face_embeddings]
+    def face_embeddings(self, face_ids: Iterable[int]) -> List[Tuple[int, bytes]]:
+        """Embeddings van de opgegeven gezichten: (face_id, blob), oplopend op id."""
+        ids = list(face_ids)
+        out: List[Tuple[int, bytes]] = []
+        with self._connect() as conn:
+            cur = conn.cursor()
+            for i in range(0, len(ids), 500):
+                chunk = ids[i : i + 500]
+                marks = ",".join("?" for _ in chunk)
+                cur.execute(
+                    f"SELECT id, embedding FROM faces WHERE id IN ({marks}) AND embedding IS NOT NULL",
+                    chunk,
+                )
+                out.extend((int(r[0]), r[1]) for r in cur.fetchall())
+        out.sort()
+        return out
+
+# [END: FUNC: face_embeddings]
+
+# [FUNC: create_people]
+    def create_people(self, count: int, prefix: str = "Persoon") -> List[int]:
+        """Maak count nieuwe personen met een vrije naam '<prefix> <n>'; return hun id's."""
+        if count <= 0:
+            return []
+        ids: List[int] = []
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT name FROM people")
+            taken = {r[0] for r in cur.fetchall()}
+            n = 0
+            while len(ids) < count:
+                n += 1
+                name = f"{prefix} {n}"
+                if name in taken:
+                    continue
+                cur.execute("INSERT INTO people(name) VALUES(?)", (name,))
+                ids.append(int(cur.lastrowid))
+            conn.commit()
+        return ids
+
+# [END: FUNC: create_people]
+
+# [FUNC: assign_faces]
+    def assign_faces(self, rows: Iterable[Tuple[int, Optional[int]]]) -> int:
+        """
+        Automatische toewijzing (face_id, person_id). Door de gebruiker
+        bevestigde gezichten worden nooit overschreven, afgewezen personen
+        nooit opnieuw toegewezen.
+        """
+        data = [(pid, fid, pid) for fid, pid in rows]
+        if not data:
+            return 0
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.executemany(
+                "UPDATE faces SET person_id = ? WHERE id = ? AND person_confirmed = 0"
+                " AND NOT EXISTS (SELECT 1 FROM face_rejections r"
+                " WHERE r.face_id = faces.id AND r.person_id = ?)",
+                data,
+            )
+            conn.commit()
+            return cur.rowcount if cur.rowcount >= 0 else len(data)
+
+# [END: FUNC: assign_faces]
+
+# [FUNC: confirm_faces]
+    def confirm_faces(self, face_ids: Iterable[int], person_id: Optional[int]) -> int:
+        """
+        Toewijzing door de gebruiker: zet person_id en markeer als bevestigd.
+        person_id None = "niet deze persoon": de huidige persoon gaat naar
+        face_rejections (de clustering wijst hem niet opnieuw toe), daarna
+        ontkoppelen en vrijgeven voor een andere persoon.
+        """
+        ids = [(int(fid),) for fid in face_ids]
+        with self._connect() as conn:
+            cur = conn.cursor()
+            if person_id is None:
+                cur.executemany(
+                    "INSERT OR IGNORE INTO face_rejections(face_id, person_id)"
+                    " SELECT id, person_id FROM faces WHERE id = ? AND person_id IS NOT NULL",
+                    ids,
+                )
+                cur.executemany(
+                    "UPDATE faces SET person_id = NULL, person_confirmed = 0 WHERE id = ?", ids
+                )
+            else:
+                cur.executemany(
+                    "DELETE FROM face_rejections WHERE face_id = ? AND person_id = ?",
+                    [(fid, person_id) for (fid,) in ids],
+                )
+                cur.executemany(
+                    "UPDATE faces SET person_id = ?, person_confirmed = 1 WHERE id = ?",
+                    [(person_id, fid) for (fid,) in ids],
+                )
+            conn.commit()
+        return len(ids)
+
+# [END: FUNC: confirm_faces]
+
+# [FUNC: reset_face_assignments]
+    def reset_face_assignments(self, prefix: str = "Persoon") -> int:
+        """
+        Wis alle niet-bevestigde toewijzingen (volledige herclustering) en
+        ruim automatisch aangemaakte personen zonder gezichten op.
+        """
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "UPDATE faces SET person_id = NULL WHERE person_confirmed = 0 AND person_id IS NOT NULL"
+            )
+            n = cur.rowcount
+            cur.execute(
+                "DELETE FROM people WHERE name LIKE ? AND id NOT IN "
+                "(SELECT person_id FROM faces WHERE person_id IS NOT NULL)",
+                (prefix + " %",),
+            )
+            conn.commit()
+        logger.info("Gezichtstoewijzingen gewist: %s", n)
+        return n
+
+# [END: FUNC: reset_face_assignments]
+
+# [FUNC: face_tag_summary]
+    def face_tag_summary(self, paths: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Gezichten en tags per mediapad voor een hele batch in één query
+        (paden via een tijdelijke tabel, geen query per rij).
+        Return: {path: {"faces": n, "people": "A,B" | None, "tags": "x, y" | None}}
+        """
+        wanted = list(dict.fromkeys(paths))
+        result: Dict[str, Dict[str, Any]] = {}
+        if not wanted:
+            return result
+        with self._connect() as conn:
+            cur = conn.cursor()
+            self._load_media_keys(cur, wanted)
+            cur.execute(
+                """
+                SELECT k.path,
+                       (SELECT COUNT(*) FROM faces f WHERE f.media_id = m.id),
+                       (SELECT GROUP_CONCAT(DISTINCT pe.name) FROM faces f
+                          JOIN people pe ON pe.id = f.person_id WHERE f.media_id = m.id),
+                       (SELECT GROUP_CONCAT(t.name, ', ') FROM media_tags mt
+                          JOIN tags t ON t.id = mt.tag_id WHERE mt.media_id = m.id)
+                FROM temp._media_keys k
+                JOIN media m ON m.dir_id = k.dir_id AND m.filename = k.filename
+                """
+            )
+            for path, n_faces, people, tags in cur.fetchall():
+                result[path] = {"faces": int(n_faces or 0), "people": people, "tags": tags}
+        return result
+
+# [END: FUNC: face_tag_summary]
+
+# [FUNC: get_sniff_cache]
+    def get_sniff_cache(
+        self, paths: Iterable[str]
+    ) -> Dict[str, Tuple[Optional[int], Optional[float], str, Optional[str]]]:
+        """Bewaarde inhoudsherkenning per pad: {path: (size, mtime, kind, mime)}."""
+        wanted = list(dict.fromkeys(paths))
+        result: Dict[str, Tuple[Optional[int], Optional[float], str, Optional[str]]] = {}
+        with self._connect() as conn:
+            cur = conn.cursor()
+            for i in range(0, len(wanted), 500):
+                chunk = wanted[i : i + 500]
+                marks = ",".join("?" for _ in chunk)
+                cur.execute(
+                    f"SELECT path, size, mtime, kind, mime FROM sniff_cache WHERE path IN ({marks})",
+                    chunk,
+                )
+                for path, size, mtime, kind, mime in cur.fetchall():
+                    result[path] = (size, mtime, kind, mime)
+        return result
+
+# [END: FUNC: get_sniff_cache]
+
+# [FUNC: set_sniff_cache]
+    def set_sniff_cache(
+        self, rows: Iterable[Tuple[str, Optional[int], Optional[float], str, Optional[str]]]
+    ) -> int:
+        """Bewaar (path, size, mtime, kind, mime); kind 'other' = geen media (niet herlezen)."""
+        data = list(rows)
+        if not data:
+            return 0
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.executemany(
+                "INSERT OR REPLACE INTO sniff_cache(path, size, mtime, kind, mime)"
+                " VALUES(?, ?, ?, ?, ?)",
+                data,
+            )
+            conn.commit()
+        return len(data)
+
+# [END: FUNC: set_sniff_cache]
+
+# [FUNC: active_folders]
+    def active_folders(self) -> List[Tuple[int, str]]:
+        """Geregistreerde mappen met is_active=1: (id, path)."""
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT id, path FROM folders WHERE is_active = 1 ORDER BY path")
+            return [(int(r[0]), r[1]) for r in cur.fetchall()]
+
+# [END: FUNC: active_folders]
+
+# [FUNC: media_snapshot]
+    def media_snapshot(self, root: str) -> Dict[str, Tuple[int, float]]:
+        """
+        Bekende, aanwezige bestanden onder root als {path: (size, mtime)}:
+        beginsnapshot voor de polling-watcher (deelboom via directory_closure).
+        """
+        with self._connect() as conn:
+            cur = conn.cursor()
+            root_id = self._tree(cur).ids.get(root)
+            if root_id is None:
+                return {}
+            cur.execute(
+                "SELECT media_path(dir_id, filename), size, mtime FROM media"
+                f" WHERE dir_id IN ({_UNDER_DIR_SQL}) AND missing = 0",
+                (root_id,),
+            )
+            return {
+                r[0]: (int(r[1] or 0), float(r[2] or 0.0)) for r in cur.fetchall()
+            }
+
+# [END: FUNC: media_snapshot]
+
+# [FUNC: upsert_media_batch]
+    def upsert_media_batch(self, rows: Iterable[Tuple[Any, ...]]) -> int:
+        """
+        Zoals upsert_media, maar voor veel bestanden in één transactie:
+        (folder_id, path, filename, ext, size, mtime, type[, dir_id]).
+        Rijen buiten hun bibliotheekmap worden overgeslagen.
+        """
+        rows = list(rows)
+        if not rows:
+            return 0
+        with self._connect() as conn:
+            cur = conn.cursor()
+            tree = self._tree_begin(cur)
+            data = []
+            for r in rows:
+                dir_id = r[7] if len(r) > 7 else None
+                if dir_id is None:
+                    dir_id = self._ensure_dir(cur, tree, os.path.dirname(r[1]), r[0])
+                if dir_id is None:
+                    logger.warning("Media buiten bibliotheekmap %s genegeerd: %s", r[0], r[1])
+                    continue
+                data.append((r[0], dir_id, *r[2:7], None, None, None, None, None))
+            cur.executemany(_UPSERT_MEDIA_SQL, data)
+            self._tree_commit(cur, tree)
+            conn.commit()
+        logger.debug("upsert_media_batch → %s", len(data))
+        return len(data)
+
+# [END: FUNC: upsert_media_batch]
+
+# [FUNC: mark_missing_paths]
+    def mark_missing_paths(self, paths: Iterable[str], under: Iterable[str] = ()) -> int:
+        """
+        Zet missing=1 voor de opgegeven paden en voor alles onder de mappen
+        in under (verwijderde mappen); deelboom via directory_closure.
+        """
+        with self._connect() as conn:
+            cur = conn.cursor()
+            tree = self._tree(cur)
+            data = [key for key in map(tree.locate, paths) if key is not None]
+            roots = [(tree.ids[d],) for d in under if d in tree.ids]
+            cur.executemany(
+                "UPDATE media SET missing=1 WHERE dir_id=? AND filename=? AND missing=0", data
+            )
+            n = max(cur.rowcount, 0)
+            for root in roots:
+                cur.execute(
+                    f"UPDATE media SET missing=1 WHERE dir_id IN ({_UNDER_DIR_SQL}) AND missing=0",
+                    root,
+                )
+                n += max(cur.rowcount, 0)
+            conn.commit()
+        logger.debug("mark_missing_paths → %s", n)
+        return n
+
+# [END: FUNC: mark_missing_paths]
+
+# [FUNC: rename_media]
+    def rename_media(self, moves: Iterable[Tuple[Any, ...]]) -> int:
+        """
+        Verplaatste bestanden: (oud_pad, nieuw_pad, folder_id[, dir_id]). De rij
+        (en dus thumbnails, tags, rating, historiek, analyses, gezichten) blijft
+        behouden; een rij die al op het nieuwe pad stond (bestand overschreven) vervalt.
+        Return: aantal bijgewerkte rijen (oud pad niet in de DB → 0 voor die move).
+        """
+        n = 0
+        with self._connect() as conn:
+            cur = conn.cursor()
+            tree = self._tree_begin(cur)
+            for move in moves:
+                old, new, folder_id = move[:3]
+                dir_id = move[3] if len(move) > 3 else None
+                key = tree.locate(old)
+                if key is None:
+                    continue
+                cur.execute("SELECT id FROM media WHERE dir_id=? AND filename=?", key)
+                row = cur.fetchone()
+                if row is None:
+                    continue
+                if dir_id is None:
+                    dir_id = self._ensure_dir(cur, tree, os.path.dirname(new), folder_id)
+                if dir_id is None:
+                    continue
+                name = os.path.basename(new)
+                cur.execute(
+                    "DELETE FROM media WHERE dir_id=? AND filename=? AND id<>?",
+                    (dir_id, name, row[0]),
+                )
+                cur.execute(
+                    "UPDATE media SET dir_id=?, filename=?, ext=?, folder_id=?, missing=0"
+                    " WHERE id=?",
+                    (dir_id, name, os.path.splitext(name)[1].lower(), folder_id, row[0]),
+                )
+                n += 1
+            self._tree_commit(cur, tree)
+            conn.commit()
+        return n
+
+# [END: FUNC: rename_media]
+
+# [FUNC: rename_media_dir]
+    def rename_media_dir(self, old_dir: str, new_dir: str, folder_id: int) -> int:
+        """
+        Verplaatste map: enkel de map-rij krijgt een nieuwe ouder/naam; de
+        paden eronder volgen via de mappenkaart. Id's blijven, dus ook
+        media.dir_id. Een map die al op new_dir geregistreerd stond vervalt
+        (met de media eronder, zoals bij een overschreven bestand).
+        Return: aantal aanwezige (niet-missing) media onder de map.
+        """
+        with self._connect() as conn:
+            cur = conn.cursor()
+            tree = self._tree_begin(cur)
+            dir_id = tree.ids.get(old_dir)
+            if dir_id is None:
+                conn.commit()
+                return 0
+            stale = tree.ids.get(new_dir)
+            if stale is not None and stale != dir_id:
+                cur.execute(
+                    f"DELETE FROM media WHERE dir_id IN ({_UNDER_DIR_SQL})", (stale,)
+                )
+                cur.execute("DELETE FROM directories WHERE id = ?", (stale,))
+                tree.ids.pop(new_dir, None)
+            cur.execute("SELECT path FROM folders WHERE id = ?", (folder_id,))
+            root = cur.fetchone()
+            if root is not None and _strip_sep(root[0]) == _strip_sep(new_dir):
+                parent_id = None
+            else:
+                parent_id = self._ensure_dir(cur, tree, os.path.dirname(new_dir), folder_id)
+            cur.execute(
+                "UPDATE directories SET name = ?, parent_id = ?, folder_id = ? WHERE id = ?",
+                (os.path.basename(new_dir) or new_dir, parent_id, folder_id, dir_id),
+            )
+            self._link_directory(cur, dir_id, parent_id)
+            cur.execute(
+                f"UPDATE directories SET folder_id = ? WHERE id IN ({_UNDER_DIR_SQL})",
+                (folder_id, dir_id),
+            )
+            # missing blijft: een al verdwenen bestand verhuist niet mee tot leven
+            cur.execute(
+                f"UPDATE media SET folder_id = ? WHERE dir_id IN ({_UNDER_DIR_SQL})",
+                (folder_id, dir_id),
+            )
+            cur.execute(
+                f"SELECT COUNT(*) FROM media WHERE dir_id IN ({_UNDER_DIR_SQL}) AND missing = 0",
+                (dir_id,),
+            )
+            n = int(cur.fetchone()[0])
+            # geen _tree_commit: de triggers hoogden dir_tree_version op, de
+            # volgende _tree() herbouwt de kaart met de nieuwe deelboom
+            conn.commit()
+        logger.info("Map verplaatst in DB: %s → %s (%s media)", old_dir, new_dir, n)
+        return n
+
+# [END: FUNC: rename_media_dir]
+
+# [FUNC: get_directories]
+    def get_directories(
+        self, folder_id: int
+    ) -> Dict[str, Tuple[int, Optional[int], Optional[float]]]:
+        """Bekende mappen van een bibliotheekmap: {path: (id, parent_id, mtime)}."""
+        with self._connect() as conn:
+            cur = conn.cursor()
+            paths = self._tree(cur).paths
+            cur.execute(
+                "SELECT id, parent_id, mtime FROM directories WHERE folder_id = ?",
+                (folder_id,),
+            )
+            return {
+                paths[r[0]]: (int(r[0]), r[1], r[2]) for r in cur.fetchall() if r[0] in paths
+            }
+
+# [END: FUNC: get_directories]
+
+# [FUNC: upsert_directory]
+    def upsert_directory(self, path: str, parent_id: Optional[int], folder_id: int) -> int:
+        """
+        Registreer een map (mtime blijft NULL tot set_directory_state: een
+        onderbroken scan laat de map dus nooit als 'ongewijzigd' achter).
+        Nieuwe of van ouder veranderde mappen worden in directory_closure gehangen.
+        parent_id None = de bibliotheekmap zelf (pad uit folders).
+        """
+        with self._connect() as conn:
+            cur = conn.cursor()
+            tree = self._tree_begin(cur)
+            dir_id = tree.ids.get(path)
+            if dir_id is None:
+                dir_id = self._insert_dir(cur, tree, path, parent_id, folder_id)
+            else:
+                cur.execute("SELECT parent_id FROM directories WHERE id = ?", (dir_id,))
+                old_parent = cur.fetchone()[0]
+                cur.execute(
+                    "UPDATE directories SET folder_id = ?, parent_id = ?, mtime = NULL"
+                    " WHERE id = ?",
+                    (folder_id, parent_id, dir_id),
+                )
+                if old_parent != parent_id:
+                    self._link_directory(cur, dir_id, parent_id)
+            self._tree_commit(cur, tree)
+            conn.commit()
+        return dir_id
+
+# [END: FUNC: upsert_directory]
+
+# [FUNC: set_directory_state]
+    def set_directory_state(self, rows: Iterable[Tuple[int, float, int, int]]) -> int:
+        """Na het wegschrijven van de bestanden: (dir_id, mtime, file_count, dir_count)."""
+        data = [(mt, fc, dc, did) for did, mt, fc, dc in rows]
+        if not data:
+            return 0
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.executemany(
+                "UPDATE directories SET mtime=?, file_count=?, dir_count=?,"
+                " scanned_at=datetime('now') WHERE id=?",
+                data,
+            )
+            conn.commit()
+        return len(data)
+
+# [END: FUNC: set_directory_state]
+
+# [FUNC: delete_directories]
+    def delete_directories(self, dir_ids: Iterable[int]) -> int:
+        """
+        Verdwenen mappen vergeten (onderliggende mappen via ON DELETE CASCADE).
+        Mappen met media eronder blijven: ontbrekende rijen houden zo hun pad
+        (detect_moves, herstel van de map).
+        """
+        data = [(int(i),) for i in dir_ids]
+        if not data:
+            return 0
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.executemany(
+                "DELETE FROM directories WHERE id = ? AND NOT EXISTS ("
+                " SELECT 1 FROM directory_closure dc JOIN media m ON m.dir_id = dc.descendant_id"
+                " WHERE dc.ancestor_id = directories.id)",
+                data,
+            )
+            n = max(cur.rowcount, 0)
+            conn.commit()
+        return n
+
+# [END: FUNC: delete_directories]
+
+# [FUNC: media_paths_by_dir]
+    def media_paths_by_dir(self, folder_id: int) -> Dict[int, List[str]]:
+        """Niet-ontbrekende mediapaden per dir_id (één query voor een hele rescan)."""
+        out: Dict[int, List[str]] = {}
+        with self._connect() as conn:
+            cur = conn.cursor()
+            self._tree(cur)
+            cur.execute(
+                "SELECT dir_id, media_path(dir_id, filename) FROM media"
+                " WHERE folder_id = ? AND missing = 0",
+                (folder_id,),
+            )
+            for dir_id, path in cur.fetchall():
+                out.setdefault(int(dir_id), []).append(path)
+        return out
+
+# [END: FUNC: media_paths_by_dir]
+
+# [FUNC: missing_media_by_stat]
+    def missing_media_by_stat(
+        self, keys: Iterable[Tuple[int, float]]
+    ) -> Dict[Tuple[int, float], List[Tuple[int, str, Optional[str]]]]:
+        """
+        Ontbrekende media (missing=1, alle mappen) met een van de gegeven
+        (size, mtime)-combinaties: kandidaten voor een verplaatsing.
+        Return: {(size, mtime): [(id, path, partial_hash of None)]}; de
+        partiële hash enkel als die nog voor deze size/mtime geldt.
+        """
+        data = list(set(keys))
+        out: Dict[Tuple[int, float], List[Tuple[int, str, Optional[str]]]] = {}
+        if not data:
+            return out
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS _stat_keys("
+                "size INTEGER, mtime REAL, PRIMARY KEY(size, mtime))"
+            )
+            cur.execute("DELETE FROM temp._stat_keys")
+            cur.executemany("INSERT OR IGNORE INTO temp._stat_keys VALUES(?, ?)", data)
+            self._tree(cur)
+            cur.execute(
+                """
+                SELECT m.size, m.mtime, m.id, media_path(m.dir_id, m.filename),
+                       CASE WHEN m.hash_size IS m.size AND m.hash_mtime IS m.mtime
+                            THEN m.partial_hash END
+                FROM temp._stat_keys k
+                JOIN media m ON m.size = k.size AND m.mtime = k.mtime
+                WHERE m.missing = 1
+                ORDER BY m.id
+                """
+            )
+            for size, mtime, mid, path, ph in cur.fetchall():
+                out.setdefault((size, mtime), []).append((int(mid), path, ph))
+        return out
+
+# [END: FUNC: missing_media_by_stat]
+
+# [FUNC: move_candidate_keys]
+    def move_candidate_keys(self, folder_id: int) -> set:
+        """
+        (size, mtime) van rijen die na een rescan van folder_id ontbrekend
+        kunnen zijn: al ontbrekend (alle mappen) of aanwezig in deze map.
+        Enkel nieuwe bestanden met zo'n sleutel zijn verplaatsingskandidaten.
+        """
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT DISTINCT size, mtime FROM media"
+                " WHERE missing = 1 OR folder_id = ?",
+                (folder_id,),
+            )
+            return {(r[0], r[1]) for r in cur.fetchall()}
+
+# [END: FUNC: move_candidate_keys]
+
+# [FUNC: existing_paths]
+    def existing_paths(self, paths: Iterable[str]) -> set:
+        """Welke van deze paden staan al in media (ongeacht missing)?"""
+        with self._connect() as conn:
+            cur = conn.cursor()
+            if not self._load_media_keys(cur, paths):
+                return set()
+            cur.execute(
+                "SELECT k.path FROM temp._media_keys k"
+                " JOIN media m ON m.dir_id = k.dir_id AND m.filename = k.filename"
+            )
+            return {r[0] for r in cur.fetchall()}
+
+# [END: FUNC: existing_paths]
+# [FUNC: _link_directory]
+    def _link_directory(
+        self, cur: sqlite3.Cursor, dir_id: int, parent_id: Optional[int]
+    ) -> None:
+        """
+        Hang de deelboom onder dir_id (opnieuw) onder parent_id in
+        directory_closure en werk de diepte van die deelboom bij.
+        Binnen de transactie van de aanroeper.
+        """
+        # losmaken van de oude voorouders (interne paden van de deelboom blijven)
+        cur.execute(
+            """
+            DELETE FROM directory_closure
+            WHERE descendant_id IN (
+                SELECT descendant_id FROM directory_closure WHERE ancestor_id = ?
+            )
+            AND ancestor_id NOT IN (
+                SELECT descendant_id FROM directory_closure WHERE ancestor_id = ?
+            )
+            """,
+            (dir_id, dir_id),
+        )
+        cur.execute(
+            "INSERT OR IGNORE INTO directory_closure(ancestor_id, descendant_id, depth)"
+            " VALUES(?, ?, 0)",
+            (dir_id, dir_id),
+        )
+        if parent_id is not None:
+            cur.execute(
+                """
+                INSERT OR IGNORE INTO directory_closure(ancestor_id, descendant_id, depth)
+                SELECT a.ancestor_id, s.descendant_id, a.depth + s.depth + 1
+                FROM directory_closure a, directory_closure s
+                WHERE a.descendant_id = ? AND s.ancestor_id = ?
+                """,
+                (parent_id, dir_id),
+            )
+        cur.execute(
+            """
+            UPDATE directories SET depth = (
+                SELECT MAX(depth) FROM directory_closure WHERE descendant_id = directories.id
+            )
+            WHERE id IN (SELECT descendant_id FROM directory_closure WHERE ancestor_id = ?)
+            """,
+            (dir_id,),
+        )
+
+# [END: FUNC: _link_directory]
+
+# [FUNC: directory_ids]
+    def directory_ids(self, paths: Iterable[str]) -> Dict[str, int]:
+        """Bekende mappen: {path: id} voor de gegeven paden (onbekend → ontbreekt)."""
+        with self._connect() as conn:
+            ids = self._tree(conn.cursor()).ids
+        return {p: ids[p] for p in set(paths) if p in ids}
+
+# [END: FUNC: directory_ids]
+
+# [FUNC: directory_counts]
+    def directory_counts(
+        self, dir_ids: Iterable[int], include_hidden: bool = False
+    ) -> Dict[int, Tuple[int, int]]:
+        """
+        Aantal (foto's, video's) in elke map inclusief alle submappen, in SQL
+        geaggregeerd via directory_closure. Ontbrekende media tellen niet mee.
+        """
+        data = list({int(i) for i in dir_ids})
+        out: Dict[int, Tuple[int, int]] = {i: (0, 0) for i in data}
+        hidden = "" if include_hidden else " AND m.hidden = 0"
+        with self._connect() as conn:
+            cur = conn.cursor()
+            for i in range(0, len(data), 500):
+                chunk = data[i : i + 500]
+                placeholders = ",".join("?" for _ in chunk)
+                cur.execute(
+                    f"""
+                    SELECT dc.ancestor_id,
+                           SUM(m.type = 'image'), SUM(m.type = 'video')
+                    FROM directory_closure dc
+                    JOIN media m ON m.dir_id = dc.descendant_id
+                    WHERE dc.ancestor_id IN ({placeholders}) AND m.missing = 0{hidden}
+                    GROUP BY dc.ancestor_id
+                    """,
+                    chunk,
+                )
+                out.update((int(r[0]), (int(r[1]), int(r[2]))) for r in cur.fetchall())
+        return out
+
+# [END: FUNC: directory_counts]
+# [FUNC: relocate_folder]
+    def relocate_folder(self, old_root: str, new_root: str) -> int:
+        """
+        Bibliotheekmap verhuisd (andere schijf/letter, hernoemde OneDrive-map):
+        enkel folders.path wijzigt; mappen en media volgen via de mappenkaart
+        (pad = root + namen). sniff_cache (op pad) gaat mee in dezelfde
+        transactie. Id's blijven, dus tags, rating, historiek, thumbnails,
+        analyses en gezichten ook. Return: aantal media.
+        """
+        old_root, new_root = old_root.rstrip("/\\"), new_root.rstrip("/\\")
+        cut = len(old_root) + 1
+        lo, hi = old_root + os.sep, old_root + chr(ord(os.sep) + 1)
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT id FROM folders WHERE path = ?", (old_root,))
+            row = cur.fetchone()
+            if row is None:
+                raise ValueError(f"Onbekende bibliotheekmap: {old_root}")
+            cur.execute("SELECT 1 FROM folders WHERE path = ?", (new_root,))
+            if cur.fetchone() is not None:
+                raise ValueError(f"Bibliotheekmap bestaat al: {new_root}")
+            folder_id = int(row[0])
+            cur.execute("UPDATE folders SET path = ? WHERE id = ?", (new_root, folder_id))
+            cur.execute(
+                "UPDATE OR REPLACE sniff_cache SET path = ? || substr(path, ?)"
+                " WHERE path >= ? AND path < ?",
+                (new_root, cut, lo, hi),
+            )
+            cur.execute("SELECT COUNT(*) FROM media WHERE folder_id = ?", (folder_id,))
+            n = int(cur.fetchone()[0])
+            conn.commit()
+        logger.info("Bibliotheekmap verplaatst: %s → %s (%s media)", old_root, new_root, n)
+        return n
+
+# [END: FUNC: relocate_folder]
+# [FUNC: face_rejections]
+    def face_rejections(self) -> Dict[int, List[int]]:
+        """Door de gebruiker afgewezen toewijzingen: {face_id: [person_id]}."""
+        out: Dict[int, List[int]] = {}
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT face_id, person_id FROM face_rejections")
+            for fid, pid in cur.fetchall():
+                out.setdefault(int(fid), []).append(int(pid))
+        return out
+
+# [END: FUNC: face_rejections]
 # [END: SECTION: CLASS: DbService]
 
 
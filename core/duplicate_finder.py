@@ -0,0 +1,145 @@
+# [SECTION: IMPORTS]
+from __future__ import annotations
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .db_interface import DbService
+from .file_hashing import hash_files, partial_bytes_read, partial_hash
+
+# [END: SECTION: IMPORTS]
+
+# [SECTION: LOGGER]
+logger = logging.getLogger(__name__)
+# [END: SECTION: LOGGER]
+
+ProgressCallback = Callable[[int, int], None]
+Candidate = Tuple[int, str, int, Optional[float], Optional[str], Optional[str], bool]
+
+
+# [FUNC: def _still_current]
+def _still_current(path: str, size: int, mtime: Optional[float]) -> bool:
+    """Komt het bestand op schijf nog overeen met de DB? Anders eerst herscannen."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    return int(st.st_size) == size and (mtime is None or float(st.st_mtime) == mtime)
+
+# [END: FUNC: def _still_current]
+
+# [FUNC: def find_duplicates]
+def find_duplicates(
+    db: DbService,
+    min_size: int = 1,
+    workers: int = 4,
+    progress: Optional[ProgressCallback] = None,
+) -> Dict[str, int]:
+    """
+    Getrapte duplicaatzoeker; vult media.partial_hash/hash en retourneert statistiek.
+      1. groeperen op size (SQL) — unieke groottes worden nooit gelezen
+      2. partiële hash (kop + staart 64 KB) van alle kandidaten
+      3. volledige hash enkel voor bestanden die dan nog botsen; bij kleine
+         bestanden (≤ 2×PARTIAL_BYTES) dekt de partiële hash al de hele inhoud
+         en geldt hij ook als media.hash (zelfde size → zelfde soort hash)
+    Geldige hashes uit een vorige run (zelfde size/mtime) worden hergebruikt.
+    workers: aantal bestanden dat in stap 2 en 3 tegelijk gelezen wordt; beide
+    stappen lopen over alle size-groepen heen door één threadpool.
+    progress(done, total) telt eerst de kandidaten van stap 2, daarna
+    (opnieuw vanaf 0) de bestanden van stap 3.
+    De groepen zelf: DbService.find_duplicate_groups().
+    """
+    candidates = db.size_collision_candidates(min_size=min_size)
+    stats = {
+        "candidates": len(candidates),
+        "partial_hashed": 0,
+        "full_hashed": 0,
+        "bytes_read": 0,
+        "bytes_total": sum(c[2] for c in candidates),
+        "skipped": 0,
+    }
+
+    # stap 2: partiële hash per kandidaat (geldige hash uit de DB hergebruiken)
+    def _partial(c: Candidate) -> Tuple[Optional[str], bool]:
+        media_id, path, size, mtime, old_partial, _, valid = c
+        if valid and old_partial:
+            return old_partial, False
+        if not _still_current(path, size, mtime):
+            return None, False
+        try:
+            return partial_hash(path, size), True
+        except OSError:
+            logger.warning("Partiële hash mislukt: %s", path, exc_info=True)
+            return None, False
+
+    partials: Dict[int, str] = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for done, (c, (ph, read)) in enumerate(
+            zip(candidates, pool.map(_partial, candidates)), 1
+        ):
+            if ph is None:
+                stats["skipped"] += 1
+            else:
+                partials[c[0]] = ph
+            if read:
+                stats["partial_hashed"] += 1
+                stats["bytes_read"] += partial_bytes_read(c[2])
+            if progress and (done % 100 == 0 or done == len(candidates)):
+                progress(done, len(candidates))
+
+    # stap 3: volledige hash enkel binnen botsende partiële groepen (alle sizes samen)
+    need: List[str] = []
+    for size, group_iter in groupby(candidates, key=lambda c: c[2]):
+        if partial_bytes_read(size) == size:
+            continue  # partiële hash = volledige inhoud: niet nog eens lezen
+        group: List[Candidate] = list(group_iter)
+        counts: Dict[str, int] = {}
+        for c in group:
+            if c[0] in partials:
+                counts[partials[c[0]]] = counts.get(partials[c[0]], 0) + 1
+        need.extend(
+            c[1]
+            for c in group
+            if c[0] in partials and counts[partials[c[0]]] > 1 and not (c[6] and c[5])
+        )
+    fulls = hash_files(need, workers=workers, progress=progress)
+    sizes = {c[1]: c[2] for c in candidates}
+    for path, full in fulls.items():
+        if full is not None:
+            stats["full_hashed"] += 1
+            stats["bytes_read"] += sizes[path]
+
+    updates: List[Tuple[int, Optional[str], Optional[str], int, Optional[float]]] = []
+    for media_id, path, size, mtime, old_partial, old_full, valid in candidates:
+        ph = partials.get(media_id)
+        if ph is None:
+            continue
+        if partial_bytes_read(size) == size:
+            full: Optional[str] = ph
+        else:
+            full = fulls.get(path, old_full if valid else None)
+        if not valid or ph != old_partial or full != old_full:
+            updates.append((media_id, ph, full, size, mtime))
+        if len(updates) >= 500:
+            db.set_file_hashes(updates)
+            updates = []
+
+    db.set_file_hashes(updates)
+    logger.info("Duplicaatzoeker klaar: %s", stats)
+    return stats
+
+# [END: FUNC: def find_duplicates]
+
+
+# [SECTION: MAIN]
+if __name__ == "__main__":
+    if not logging.getLogger().handlers:
+        logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    _db = DbService()
+    print(find_duplicates(_db))
+    for g in _db.find_duplicate_groups(limit=20):
+        print(g["size"], g["paths"])
+# [END: SECTION: MAIN]
@@ -0,0 +1,199 @@
+# [SECTION: IMPORTS]
+from __future__ import annotations
+
+import hashlib
+import logging
+import mmap
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional
+
+# [END: SECTION: IMPORTS]
+# xxhash optioneel (sneller dan blake2b, niet cryptografisch)
+try:
+    import xxhash  # type: ignore
+except Exception:
+    xxhash = None  # type: ignore
+
+# [SECTION: LOGGER]
+logger = logging.getLogger(__name__)
+# [END: SECTION: LOGGER]
+
+PARTIAL_BYTES = 64 * 1024  # kop en staart voor de partiële hash
+CHUNK_BYTES = 1024 * 1024
+# media.hash is blake2b: enkel hashes van hetzelfde algoritme zijn vergelijkbaar.
+# Voor bestanden ≤ 2×PARTIAL_BYTES is het de partial_hash (die leest alles);
+# hashes worden altijd per size vergeleken, dus dat mengt nooit.
+DEFAULT_ALGORITHM = "blake2b"
+
+_local = threading.local()
+
+
+# [FUNC: def available_algorithms]
+def available_algorithms() -> list:
+    """Algoritmes die new_hasher() in deze omgeving kan leveren."""
+    algos = ["blake2b", "sha256"]
+    if xxhash is not None:
+        algos.insert(0, "xxh3")
+    return algos
+
+# [END: FUNC: def available_algorithms]
+
+# [FUNC: def new_hasher]
+def new_hasher(algorithm: str = DEFAULT_ALGORITHM, digest_size: int = 32) -> Any:
+    """Hash-object met update()/hexdigest(): blake2b, xxh3 (indien geïnstalleerd) of hashlib."""
+    if algorithm == "blake2b":
+        return hashlib.blake2b(digest_size=digest_size)
+    if algorithm == "xxh3":
+        if xxhash is None:
+            raise ValueError("xxhash is niet geïnstalleerd")
+        return xxhash.xxh3_128()
+    return hashlib.new(algorithm)
+
+# [END: FUNC: def new_hasher]
+
+# [FUNC: def _buffer]
+def _buffer() -> bytearray:
+    """Herbruikbare leesbuffer per thread (geen nieuwe bytes-objecten per blok)."""
+    buf = getattr(_local, "buf", None)
+    if buf is None:
+        buf = _local.buf = bytearray(CHUNK_BYTES)
+    return buf
+
+# [END: FUNC: def _buffer]
+
+# [FUNC: def is_local_path]
+def is_local_path(path: str) -> bool:
+    """
+    False voor UNC-paden en (op Windows) netwerkstations: daar is mmap niet
+    betrouwbaar en niet sneller, dus lezen we met readinto.
+    """
+    p = os.path.abspath(path)
+    if p.startswith(("\\\\", "//")):
+        return False
+    if sys.platform == "win32":
+        try:
+            import ctypes
+
+            drive = os.path.splitdrive(p)[0] + "\\"
+            return ctypes.windll.kernel32.GetDriveTypeW(drive) != 4  # DRIVE_REMOTE
+        except Exception:
+            return True
+    return True
+
+# [END: FUNC: def is_local_path]
+
+# [FUNC: def partial_hash]
+def partial_hash(path: str, size: Optional[int] = None) -> str:
+    """
+    Hash van de eerste en laatste PARTIAL_BYTES (plus de size), genoeg om
+    bijna alle bestanden van gelijke grootte uit elkaar te houden.
+    Kleine bestanden worden volledig gelezen.
+    """
+    if size is None:
+        size = os.path.getsize(path)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(size.to_bytes(8, "little"))
+    view = memoryview(_buffer())
+    with open(path, "rb", buffering=0) as f:
+        if size <= 2 * PARTIAL_BYTES:
+            spans = [(0, size)]
+        else:
+            spans = [(0, PARTIAL_BYTES), (size - PARTIAL_BYTES, PARTIAL_BYTES)]
+        for offset, length in spans:
+            f.seek(offset)
+            while length > 0:
+                n = f.readinto(view[: min(length, CHUNK_BYTES)])
+                if not n:
+                    break
+                h.update(view[:n])
+                length -= n
+    return h.hexdigest()
+
+# [END: FUNC: def partial_hash]
+
+# [FUNC: def partial_bytes_read]
+def partial_bytes_read(size: int) -> int:
+    """Aantal bytes dat partial_hash voor een bestand van deze grootte leest."""
+    return size if size <= 2 * PARTIAL_BYTES else 2 * PARTIAL_BYTES
+
+# [END: FUNC: def partial_bytes_read]
+
+# [FUNC: def full_hash]
+def full_hash(
+    path: str, algorithm: str = DEFAULT_ALGORITHM, use_mmap: Optional[bool] = None
+) -> str:
+    """
+    Hash van de volledige inhoud zonder kopieën per blok: mmap voor lokale
+    bestanden, anders readinto in een herbruikbare buffer. hashlib geeft de
+    GIL vrij tijdens update(), dus meerdere threads overlappen I/O en hashing.
+    """
+    h = new_hasher(algorithm)
+    if use_mmap is None:
+        use_mmap = is_local_path(path)
+    with open(path, "rb", buffering=0) as f:
+        size = os.fstat(f.fileno()).st_size
+        if use_mmap and size > 0:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    with memoryview(mm) as mv:
+                        for offset in range(0, size, CHUNK_BYTES):
+                            h.update(mv[offset : offset + CHUNK_BYTES])
+                return h.hexdigest()
+            except (OSError, ValueError):
+                logger.debug("mmap niet bruikbaar, terugval op readinto: %s", path)
+                h = new_hasher(algorithm)
+                f.seek(0)
+        buf = _buffer()
+        view = memoryview(buf)
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            h.update(view[:n])
+    return h.hexdigest()
+
+# [END: FUNC: def full_hash]
+
+# [FUNC: def hash_files]
+def hash_files(
+    paths: Iterable[str],
+    workers: int = 4,
+    algorithm: str = DEFAULT_ALGORITHM,
+    use_mmap: Optional[bool] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, Optional[str]]:
+    """
+    full_hash voor meerdere bestanden in een threadpool, zodat het wachten op
+    schijf/netwerk van het ene bestand overlapt met het hashen van het andere.
+    Return: {pad: hash}; None als het bestand niet leesbaar was.
+    """
+
+    def _one(path: str) -> Optional[str]:
+        try:
+            return full_hash(path, algorithm, use_mmap)
+        except OSError:
+            logger.warning("Volledige hash mislukt: %s", path, exc_info=True)
+            return None
+
+    paths = list(paths)
+    result: Dict[str, Optional[str]] = {}
+    if len(paths) <= 1 or workers <= 1:
+        hashes = map(_one, paths)
+        pool = None
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers)
+        hashes = pool.map(_one, paths)
+    try:
+        for done, (path, h) in enumerate(zip(paths, hashes), 1):
+            result[path] = h
+            if progress:
+                progress(done, len(paths))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return result
+
+# [END: FUNC: def hash_files]
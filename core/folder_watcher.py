@@ -0,0 +1,493 @@
+# [SECTION: IMPORTS]
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from itertools import chain
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .db_interface import DbService
+from .media_types import kind_of
+# [END: SECTION: IMPORTS]
+
+# watchdog optioneel (inotify op Linux, ReadDirectoryChangesW op Windows,
+# FSEvents op macOS); zonder watchdog valt de watcher terug op polling
+try:
+    from watchdog.events import FileSystemEventHandler  # type: ignore
+    from watchdog.observers import Observer  # type: ignore
+except Exception:
+    FileSystemEventHandler = object  # type: ignore
+    Observer = None  # type: ignore
+
+# [SECTION: LOGGER]
+logger = logging.getLogger(__name__)
+# [END: SECTION: LOGGER]
+
+DEBOUNCE_S = 1.5  # zoveel rust na de laatste gebeurtenis vóór een DB-batch
+MAX_DELAY_S = 10.0  # bij aanhoudende activiteit (grote kopie) toch periodiek wegschrijven
+POLL_INTERVAL_S = 30.0
+
+Snapshot = Dict[str, Tuple[int, float]]
+FlushCallback = Callable[[Dict[str, int]], None]
+
+
+# [CLASS: _EventHandler]
+# [SECTION: CLASS: _EventHandler]
+class _EventHandler(FileSystemEventHandler):  # type: ignore[misc]
+    """Vertaalt watchdog-events naar notify_*-aanroepen van de watcher."""
+
+# [FUNC: __init__]
+    def __init__(self, watcher: "FolderWatcher") -> None:
+        super().__init__()
+        self._watcher = watcher
+
+# [END: FUNC: __init__]
+
+# [FUNC: on_any_event]
+    def on_any_event(self, event) -> None:
+        kind = event.event_type
+        if kind not in ("created", "modified", "deleted", "moved", "closed"):
+            return
+        src = os.fsdecode(event.src_path)
+        w = self._watcher
+        if kind == "moved":
+            w.notify_moved(src, os.fsdecode(event.dest_path), event.is_directory)
+        elif kind == "deleted":
+            w.notify_deleted(src, event.is_directory)
+        elif event.is_directory:
+            if kind == "created":
+                w.notify_dir_created(src)
+        else:
+            w.notify_changed(src)
+
+# [END: FUNC: on_any_event]
+# [END: SECTION: CLASS: _EventHandler]
+# [END: CLASS: _EventHandler]
+
+
+# [CLASS: FolderWatcher]
+# [SECTION: CLASS: FolderWatcher]
+class FolderWatcher:
+    """
+    Houdt de media-tabel actueel voor alle actieve mappen (folders.is_active=1).
+    Gebeurtenissen worden verzameld en pas na DEBOUNCE_S rust (uiterlijk
+    MAX_DELAY_S) samengevoegd tot één reeks batch-aanroepen op de DbService:
+    verplaatsingen, ontbrekend markeren en upserts. Een bestand dat tien keer
+    wijzigt tijdens het kopiëren wordt zo één keer ge-upsert, met de
+    uiteindelijke size/mtime.
+    Met watchdog: native events; anders (of use_watchdog=False) polling met
+    snapshot-vergelijking elke poll_interval_s seconden, vanuit de pollthread
+    en met de DB als beginsnapshot (start() wandelt zelf niets af).
+    on_flush(stats) wordt vanuit de watcher-thread aangeroepen.
+    """
+
+# [FUNC: __init__]
+    def __init__(
+        self,
+        db: DbService,
+        debounce_s: float = DEBOUNCE_S,
+        poll_interval_s: float = POLL_INTERVAL_S,
+        use_watchdog: Optional[bool] = None,
+        on_flush: Optional[FlushCallback] = None,
+    ) -> None:
+        self.db = db
+        self.debounce_s = debounce_s
+        self.poll_interval_s = poll_interval_s
+        self.use_watchdog = Observer is not None if use_watchdog is None else use_watchdog
+        self.on_flush = on_flush
+
+        self._roots: List[Tuple[int, str]] = []
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._observer = None
+        self._snapshots: Dict[str, Snapshot] = {}
+
+        # wachtende wijzigingen (onder self._cond)
+        self._touched: Set[str] = set()
+        self._moves: List[Tuple[str, str]] = []
+        self._dir_moves: List[Tuple[str, str]] = []
+        self._deleted_dirs: Set[str] = set()
+        self._created_dirs: Set[str] = set()
+        self._first_event = 0.0
+        self._last_event = 0.0
+
+# [END: FUNC: __init__]
+
+# [FUNC: start]
+    def start(self) -> None:
+        """Start de watcher (idempotent)."""
+        if self._threads:
+            return
+        self._stop.clear()
+        self._roots = [
+            (fid, path) for fid, path in self.db.active_folders() if os.path.isdir(path)
+        ]
+        if not self._roots:
+            logger.info("FolderWatcher: geen actieve mappen om te bewaken")
+        if self.use_watchdog:
+            try:
+                self._observer = Observer()
+                handler = _EventHandler(self)
+                for _, path in self._roots:
+                    self._observer.schedule(handler, path, recursive=True)
+                self._observer.start()
+            except Exception:
+                # bv. inotify-limiet (OSError) of geen toegang tot een submap
+                logger.warning(
+                    "FolderWatcher: watchdog start mislukt, val terug op polling",
+                    exc_info=True,
+                )
+                try:
+                    self._observer.stop()
+                except Exception:
+                    pass
+                self._observer = None
+                self.use_watchdog = False
+        if not self.use_watchdog:
+            self._spawn(self._poll_loop, "FolderWatcherPoll")
+        self._spawn(self._flush_loop, "FolderWatcherFlush")
+        logger.info(
+            "FolderWatcher gestart (%s) voor %s mappen",
+            "watchdog" if self.use_watchdog else "polling", len(self._roots),
+        )
+
+# [END: FUNC: start]
+
+# [FUNC: stop]
+    def stop(self) -> None:
+        """Stop de watcher; wachtende wijzigingen worden nog weggeschreven."""
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+            self._observer = None
+        with self._cond:
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout=5)
+        self._threads = []
+        self.flush()
+        logger.info("FolderWatcher gestopt")
+
+# [END: FUNC: stop]
+
+# [FUNC: restart]
+    def restart(self) -> None:
+        """Opnieuw starten, bv. nadat er mappen zijn toegevoegd of (de)activeerd."""
+        self.stop()
+        self.start()
+
+# [END: FUNC: restart]
+
+# [FUNC: _spawn]
+    def _spawn(self, target, name: str) -> None:
+        t = threading.Thread(target=target, name=name, daemon=True)
+        t.start()
+        self._threads.append(t)
+
+# [END: FUNC: _spawn]
+
+# [FUNC: _root_for]
+    def _root_for(self, path: str) -> Optional[Tuple[int, str]]:
+        """(folder_id, pad) van de diepste actieve map die path bevat."""
+        best: Optional[Tuple[int, str]] = None
+        for fid, root in self._roots:
+            if path == root or path.startswith(root.rstrip(os.sep) + os.sep):
+                if best is None or len(root) > len(best[1]):
+                    best = (fid, root)
+        return best
+
+# [END: FUNC: _root_for]
+
+# [FUNC: _folder_for]
+    def _folder_for(self, path: str) -> Optional[int]:
+        """folder_id van de diepste actieve map die path bevat."""
+        best = self._root_for(path)
+        return best[0] if best else None
+
+# [END: FUNC: _folder_for]
+
+# [FUNC: _ensure_directories]
+    def _ensure_directories(self, dirs: Iterable[str]) -> Dict[str, int]:
+        """
+        {map: dir_id} voor de gegeven mappen. Onbekende (bestaande) mappen onder
+        een actieve map komen met hun ontbrekende voorouders in de mappenboom,
+        zodat elke upsert een dir_id krijgt en in de boomfilters meetelt.
+        Hun mtime blijft NULL: de volgende rescan lijst ze gewoon op.
+        """
+        chains: Dict[str, Tuple[int, str]] = {}
+        for d in set(dirs):
+            found = self._root_for(d)
+            if found is None:
+                continue
+            p = d
+            while p not in chains:
+                chains[p] = found
+                if p == found[1] or os.path.dirname(p) == p:
+                    break
+                p = os.path.dirname(p)
+        ids = self.db.directory_ids(chains)
+        # ouders vóór kinderen
+        for d in sorted(chains.keys() - ids.keys(), key=lambda x: x.count(os.sep)):
+            fid, root = chains[d]
+            if not os.path.isdir(d):
+                continue
+            parent_id = None if d == root else ids.get(os.path.dirname(d))
+            ids[d] = self.db.upsert_directory(d, parent_id, fid)
+        return ids
+
+# [END: FUNC: _ensure_directories]
+
+# [FUNC: _event]
+    def _event(self) -> None:
+        """Boekhouding na elke gebeurtenis; aanroepen onder self._cond."""
+        now = time.monotonic()
+        if not self._first_event:
+            self._first_event = now
+        self._last_event = now
+        self._cond.notify_all()
+
+# [END: FUNC: _event]
+
+# [FUNC: notify_changed]
+    def notify_changed(self, path: str) -> None:
+        """Bestand aangemaakt of gewijzigd."""
+        if kind_of(path) == "other":
+            return
+        with self._cond:
+            self._touched.add(path)
+            self._event()
+
+# [END: FUNC: notify_changed]
+
+# [FUNC: notify_deleted]
+    def notify_deleted(self, path: str, is_dir: bool = False) -> None:
+        with self._cond:
+            if is_dir:
+                self._deleted_dirs.add(path)
+            elif kind_of(path) != "other":
+                self._touched.add(path)  # bij flush: bestaat niet meer → missing
+            else:
+                return
+            self._event()
+
+# [END: FUNC: notify_deleted]
+
+# [FUNC: notify_moved]
+    def notify_moved(self, src: str, dest: str, is_dir: bool = False) -> None:
+        with self._cond:
+            if is_dir:
+                self._dir_moves.append((src, dest))
+            elif kind_of(dest) != "other":
+                if kind_of(src) != "other":
+                    self._moves.append((src, dest))
+                self._touched.add(dest)
+            elif kind_of(src) != "other":
+                self._touched.add(src)  # hernoemd naar niet-media: weg uit de bibliotheek
+            else:
+                return
+            self._event()
+
+# [END: FUNC: notify_moved]
+
+# [FUNC: notify_dir_created]
+    def notify_dir_created(self, path: str) -> None:
+        """Nieuwe map (ook: map van buitenaf binnengeschoven): inhoud bij flush inlezen."""
+        with self._cond:
+            self._created_dirs.add(path)
+            self._event()
+
+# [END: FUNC: notify_dir_created]
+
+# [FUNC: _flush_loop]
+    def _flush_loop(self) -> None:
+        while not self._stop.is_set():
+            with self._cond:
+                if not self._last_event:
+                    self._cond.wait(timeout=1.0)
+                    continue
+                now = time.monotonic()
+                quiet = now - self._last_event
+                waited = now - self._first_event
+                if quiet < self.debounce_s and waited < MAX_DELAY_S:
+                    self._cond.wait(timeout=min(self.debounce_s - quiet, MAX_DELAY_S - waited))
+                    continue
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("FolderWatcher: wegschrijven mislukt")
+
+# [END: FUNC: _flush_loop]
+
+# [FUNC: flush]
+    def flush(self) -> Dict[str, int]:
+        """
+        Schrijf alle wachtende wijzigingen weg. Volgorde: mapverplaatsingen,
+        bestandsverplaatsingen, verwijderde mappen, daarna per aangeraakt pad
+        de actuele toestand op schijf (bestaat → upsert, anders → missing).
+        """
+        with self._cond:
+            touched, self._touched = self._touched, set()
+            moves, self._moves = self._moves, []
+            dir_moves, self._dir_moves = self._dir_moves, []
+            deleted_dirs, self._deleted_dirs = self._deleted_dirs, set()
+            created_dirs, self._created_dirs = self._created_dirs, set()
+            self._first_event = self._last_event = 0.0
+        stats = {"moved": 0, "missing": 0, "upserts": 0}
+        if not (touched or moves or dir_moves or deleted_dirs or created_dirs):
+            return stats
+
+        for src, dest in dir_moves:
+            fid = self._folder_for(dest)
+            if fid is None:
+                deleted_dirs.add(src)  # uit de bewaakte mappen geschoven
+            else:
+                stats["moved"] += self.db.rename_media_dir(src, dest, fid)
+
+        for d in created_dirs:
+            for dirpath, _, filenames in os.walk(d):
+                touched.update(
+                    os.path.join(dirpath, fn) for fn in filenames if kind_of(fn) != "other"
+                )
+
+        # Map → dir_id (mappenboom); nieuwe mappen worden meteen geregistreerd
+        dir_ids = self._ensure_directories(
+            os.path.dirname(p) for p in chain(touched, (dest for _, dest in moves))
+        )
+
+        file_moves = []
+        for src, dest in moves:
+            fid = self._folder_for(dest)
+            if fid is None:
+                touched.add(src)
+            else:
+                file_moves.append((src, dest, fid, dir_ids.get(os.path.dirname(dest))))
+        if file_moves:
+            stats["moved"] += self.db.rename_media(file_moves)
+
+        upserts, gone = [], []
+        for path in touched:
+            fid = self._folder_for(path)
+            if fid is None:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                gone.append(path)
+                continue
+            name = os.path.basename(path)
+            upserts.append(
+                (
+                    fid, path, name, os.path.splitext(name)[1].lower(),
+                    int(st.st_size), float(st.st_mtime), kind_of(name),
+                    dir_ids.get(os.path.dirname(path)),
+                )
+            )
+        stats["missing"] = self.db.mark_missing_paths(gone, under=deleted_dirs)
+        stats["upserts"] = self.db.upsert_media_batch(upserts)
+        logger.info("FolderWatcher: %s", stats)
+        if self.on_flush:
+            try:
+                self.on_flush(stats)
+            except Exception:
+                logger.exception("FolderWatcher: on_flush-callback faalde")
+        return stats
+
+# [END: FUNC: flush]
+
+# [FUNC: _snapshot]
+    def _snapshot(self, root: str) -> Snapshot:
+        """(size, mtime) van alle mediabestanden onder root."""
+        snap: Snapshot = {}
+        for dirpath, _, filenames in os.walk(root):
+            for fn in filenames:
+                if kind_of(fn) == "other":
+                    continue
+                path = os.path.join(dirpath, fn)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                snap[path] = (int(st.st_size), float(st.st_mtime))
+        return snap
+
+# [END: FUNC: _snapshot]
+
+# [FUNC: poll_once]
+    def poll_once(self) -> None:
+        """
+        Vergelijk elke map met de vorige snapshot en meld de verschillen.
+        Verdwenen + nieuwe bestanden met dezelfde (size, mtime) gelden als
+        verplaatsing, zodat hun thumbnails/tags/analyses behouden blijven.
+        """
+        for _, root in self._roots:
+            old = self._snapshots.get(root, {})
+            new = self._snapshot(root)
+            self._snapshots[root] = new
+            removed = old.keys() - new.keys()
+            added = new.keys() - old.keys()
+            by_stat: Dict[Tuple[int, float], List[str]] = {}
+            for p in removed:
+                by_stat.setdefault(old[p], []).append(p)
+            for p in added:
+                cands = by_stat.get(new[p])
+                if cands and len(cands) == 1:
+                    self.notify_moved(cands.pop(), p)
+                else:
+                    self.notify_changed(p)
+            for cands in by_stat.values():
+                for p in cands:
+                    self.notify_deleted(p)
+            for p in old.keys() & new.keys():
+                if old[p] != new[p]:
+                    self.notify_changed(p)
+
+# [END: FUNC: poll_once]
+
+# [FUNC: _seed_snapshots]
+    def _seed_snapshots(self) -> None:
+        """
+        Beginsnapshot uit de DB i.p.v. een eerste wandeling over de schijf:
+        de eerste poll_once meldt zo ook wat sinds de laatste scan veranderde.
+        """
+        self._snapshots = {}
+        for _, root in self._roots:
+            try:
+                known = self.db.media_snapshot(root)
+            except Exception:
+                logger.exception("FolderWatcher: beginsnapshot uit DB mislukt (%s)", root)
+                known = {}
+            self._snapshots[root] = {p: v for p, v in known.items() if kind_of(p) != "other"}
+
+# [END: FUNC: _seed_snapshots]
+
+# [FUNC: _poll_loop]
+    def _poll_loop(self) -> None:
+        self._seed_snapshots()
+        while not self._stop.wait(self.poll_interval_s):
+            try:
+                self.poll_once()
+            except Exception:
+                logger.exception("FolderWatcher: polling mislukt")
+
+# [END: FUNC: _poll_loop]
+# [END: SECTION: CLASS: FolderWatcher]
+# [END: CLASS: FolderWatcher]
+
+
+# [SECTION: MAIN]
+if __name__ == "__main__":
+    # Standalone demo: bewaak de actieve mappen tot Ctrl+C
+    if not logging.getLogger().handlers:
+        logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    watcher = FolderWatcher(DbService())
+    watcher.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        watcher.stop()
+# [END: SECTION: MAIN]
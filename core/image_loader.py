@@ -0,0 +1,99 @@
+# [SECTION: IMPORTS]
+from __future__ import annotations
+
+import logging
+from typing import Optional, Tuple
+
+from PyQt6.QtCore import QSize, Qt
+from PyQt6.QtGui import QImage, QImageIOHandler, QImageReader
+
+# [END: SECTION: IMPORTS]
+# Pillow optioneel (draft-decode voor achtergrondjobs zonder Qt)
+try:
+    from PIL import Image, ImageOps  # type: ignore
+except Exception:
+    Image = None  # type: ignore
+    ImageOps = None  # type: ignore
+
+# [SECTION: LOGGER]
+logger = logging.getLogger(__name__)
+# [END: SECTION: LOGGER]
+
+# EXIF-orientaties 5..8 draaien het beeld een kwartslag (breedte <-> hoogte)
+_EXIF_ORIENTATION_TAG = 0x0112
+_ROTATED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+# [FUNC: def _fit]
+def _fit(width: int, height: int, max_w: int, max_h: int) -> Tuple[int, int]:
+    """Grootte binnen (max_w, max_h) met behoud van beeldverhouding; nooit vergroten."""
+    if width <= 0 or height <= 0 or max_w <= 0 or max_h <= 0:
+        return width, height
+    scale = min(max_w / width, max_h / height, 1.0)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+# [END: FUNC: def _fit]
+
+# [FUNC: def load_scaled_qimage]
+def load_scaled_qimage(path: str, target: QSize) -> Optional[QImage]:
+    """
+    Decodeer een afbeelding meteen op doelgrootte (QImageReader.setScaledSize).
+    Voor JPEG gebruikt Qt dan DCT-schaling in libjpeg, zodat de volle resolutie
+    nooit in het geheugen komt. EXIF-oriëntatie wordt in dezelfde pass toegepast.
+    Retourneert None als het bestand niet leesbaar is.
+    """
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    original = reader.size()  # grootte vóór EXIF-rotatie
+    if original.isValid() and target.width() > 0 and target.height() > 0:
+        max_w, max_h = target.width(), target.height()
+        rotated = bool(
+            reader.transformation()
+            & QImageIOHandler.Transformation.TransformationRotate90
+        )
+        if rotated:
+            # scaledSize geldt vóór de rotatie: doelkader mee draaien
+            max_w, max_h = max_h, max_w
+        w, h = _fit(original.width(), original.height(), max_w, max_h)
+        if w < original.width():
+            reader.setScaledSize(QSize(w, h))
+    image = reader.read()
+    if image.isNull():
+        logger.debug("load_scaled_qimage mislukt: %s (%s)", path, reader.errorString())
+        return None
+    return image
+
+# [END: FUNC: def load_scaled_qimage]
+
+# [FUNC: def load_scaled_pil]
+def load_scaled_pil(path: str, max_size: Tuple[int, int], mode: str = "RGB"):
+    """
+    Pillow-variant: draft() laat de JPEG-decoder op 1/2, 1/4 of 1/8 schaal
+    decoderen, daarna EXIF-transpose en een laatste thumbnail() tot max_size.
+    Retourneert een PIL.Image of None (geen Pillow / onleesbaar).
+    """
+    if Image is None:
+        return None
+    max_w, max_h = max_size
+    try:
+        with Image.open(path) as im:
+            try:
+                orientation = im.getexif().get(_EXIF_ORIENTATION_TAG, 1)
+            except Exception:
+                orientation = 1
+            draft_w, draft_h = (
+                (max_h, max_w) if orientation in _ROTATED_ORIENTATIONS else (max_w, max_h)
+            )
+            # draft kiest de kleinste DCT-schaal die nog >= gevraagde grootte is
+            im.draft(mode, (draft_w, draft_h))
+            im = ImageOps.exif_transpose(im)
+            if im.mode != mode:
+                im = im.convert(mode)
+            im.thumbnail((max_w, max_h), Image.Resampling.BILINEAR)
+            im.load()
+            return im
+    except Exception:
+        logger.debug("load_scaled_pil mislukt: %s", path, exc_info=True)
+        return None
+
+# [END: FUNC: def load_scaled_pil]
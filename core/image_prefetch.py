@@ -0,0 +1,178 @@
+# [SECTION: IMPORTS]
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+from PyQt6 import QtCore
+from PyQt6.QtCore import QSize
+from PyQt6.QtGui import QImage
+
+from core.image_loader import load_scaled_qimage
+
+# [END: SECTION: IMPORTS]
+logger = logging.getLogger(__name__)
+
+# Standaard: ~256 MB aan klaarstaande beelden (± 20 full-HD frames in ARGB32)
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
+CacheKey = Tuple[str, int, int]
+
+
+# [FUNC: _cache_key]
+def _cache_key(path: str, size: QSize) -> CacheKey:
+    return (path, int(size.width()), int(size.height()))
+
+# [END: FUNC: _cache_key]
+
+
+# [CLASS: ImageCache]
+# [SECTION: CLASS: ImageCache]
+class ImageCache:
+    """
+    Thread-safe LRU van gedecodeerde QImages, begrensd in bytes.
+    Sleutel = (pad, doelbreedte, doelhoogte): een andere labelgrootte geeft
+    dus een nieuwe decode in plaats van een verkeerd geschaald beeld.
+    """
+
+# [FUNC: __init__]
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES) -> None:
+        self.max_bytes = max(0, int(max_bytes))
+        self._items: "OrderedDict[CacheKey, QImage]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+# [END: FUNC: __init__]
+
+# [FUNC: get]
+    def get(self, path: str, size: QSize) -> Optional[QImage]:
+        key = _cache_key(path, size)
+        with self._lock:
+            image = self._items.get(key)
+            if image is not None:
+                self._items.move_to_end(key)
+            return image
+
+# [END: FUNC: get]
+
+# [FUNC: contains]
+    def contains(self, path: str, size: QSize) -> bool:
+        with self._lock:
+            return _cache_key(path, size) in self._items
+
+# [END: FUNC: contains]
+
+# [FUNC: put]
+    def put(self, path: str, size: QSize, image: QImage) -> None:
+        cost = int(image.sizeInBytes())
+        if cost > self.max_bytes:
+            return  # groter dan de hele cache: niet bewaren
+        key = _cache_key(path, size)
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= int(old.sizeInBytes())
+            self._items[key] = image
+            self._bytes += cost
+            while self._bytes > self.max_bytes and self._items:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= int(evicted.sizeInBytes())
+
+# [END: FUNC: put]
+
+# [FUNC: clear]
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+# [END: FUNC: clear]
+
+# [FUNC: size_bytes]
+    def size_bytes(self) -> int:
+        with self._lock:
+            return self._bytes
+
+# [END: FUNC: size_bytes]
+# [END: SECTION: CLASS: ImageCache]
+# [END: CLASS: ImageCache]
+
+
+# [CLASS: ImagePrefetchThread]
+# [SECTION: CLASS: ImagePrefetchThread]
+class ImagePrefetchThread(QtCore.QThread):
+    """
+    Worker die de volgende K afbeeldingen van de slideshow vooraf decodeert
+    en geschaald in een ImageCache zet.
+    - request(paths, size): vervangt de openstaande wachtrij
+    Signalen:
+      - ready(path: str)
+    """
+
+    ready = QtCore.pyqtSignal(str)
+
+# [FUNC: __init__]
+    def __init__(
+        self,
+        cache: Optional[ImageCache] = None,
+        parent: Optional[QtCore.QObject] = None,
+    ) -> None:
+        super().__init__(parent)
+        self.cache = cache or ImageCache()
+        self._jobs: "queue.Queue[Tuple[int, str, QSize]]" = queue.Queue()
+        self._generation = 0
+        self._gen_lock = threading.Lock()
+        logger.debug("ImagePrefetchThread init (max %d bytes)", self.cache.max_bytes)
+
+# [END: FUNC: __init__]
+
+# [FUNC: request]
+    def request(self, paths: Iterable[str], size: QSize) -> None:
+        """Plan nieuwe prefetch-jobs; oudere, nog niet gestarte jobs vervallen."""
+        target = QSize(size)
+        with self._gen_lock:
+            self._generation += 1
+            gen = self._generation
+        for p in paths:
+            if not self.cache.contains(p, target):
+                self._jobs.put((gen, p, target))
+        if not self.isRunning():
+            self.start(QtCore.QThread.Priority.LowPriority)
+
+# [END: FUNC: request]
+
+# [FUNC: run]
+    def run(self) -> None:
+        while not self.isInterruptionRequested():
+            try:
+                gen, path, target = self._jobs.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            with self._gen_lock:
+                stale = gen != self._generation
+            if stale or self.cache.contains(path, target):
+                continue
+            try:
+                image = load_scaled_qimage(path, target)
+            except Exception:
+                logger.exception("Prefetch-decode mislukt: %s", path)
+                continue
+            if image is None:
+                continue
+            self.cache.put(path, target, image)
+            self.ready.emit(path)
+
+# [END: FUNC: run]
+
+# [FUNC: stop]
+    def stop(self) -> None:
+        """Publieke stopmethode: onderbreek de worker en wacht kort."""
+        self.requestInterruption()
+        self.wait(2000)
+
+# [END: FUNC: stop]
+# [END: SECTION: CLASS: ImagePrefetchThread]
+# [END: CLASS: ImagePrefetchThread]
@@ -2,13 +2,18 @@
 import logging
 import os
 from PyQt6.QtGui import QPixmap
-from PyQt6.QtCore import Qt, QUrl
+from PyQt6.QtCore import QUrl
+
+from core.image_loader import load_scaled_qimage
+from core.media_types import kind_of
+from core.image_prefetch import ImageCache, ImagePrefetchThread
 # [END: SECTION: IMPORTS]
 
 # [SECTION: LOGGER]
 logger = logging.getLogger(__name__)
 # [END: SECTION: LOGGER]
 
+
 # [CLASS: MediaPlayer]
 class MediaPlayer:
 # [FUNC: def __init__]
@@ -19,10 +24,17 @@ class MediaPlayer:
         self.player = player
 
         self.media_list: list[str] = []
+        # soort per pad uit de DB (media.type); nodig voor bestanden die enkel
+        # aan hun inhoud herkend zijn. Ontbreekt een pad: op extensie.
+        self.media_kinds: dict[str, str] = {}
         self.current_index: int = -1  # vóór eerste item
         self.slideshow_running: bool = False
         self.loop_enabled: bool = False
         self.delay_ms: int = 3000
+        self.prefetch_count: int = 3  # aantal volgende afbeeldingen vooraf decoderen
+
+        # Achtergrond-decoder voor de volgende afbeeldingen
+        self._prefetcher = ImagePrefetchThread(ImageCache())
 
         # Timer voor afbeeldingen
         from PyQt6.QtCore import QTimer  # lokale import om globale imports intact te laten
@@ -114,45 +126,97 @@ class MediaPlayer:
 
 # [END: FUNC: def play_next_media]
 
+# [FUNC: def _kind]
+    def _kind(self, pad: str) -> str:
+        return self.media_kinds.get(pad) or kind_of(pad)
+
+# [END: FUNC: def _kind]
+
 # [FUNC: def play_media]
     def play_media(self, pad: str):
         if not os.path.exists(pad):
             logger.error("Bestand bestaat niet: %s", pad)
             return
 
+        kind = self._kind(pad)
+
         # Afbeelding
-        if pad.lower().endswith((".png", ".jpg", ".jpeg", ".bmp", ".gif", ".tiff", ".webp", ".heic")):
+        if kind == "image":
             logger.debug("Afbeelding tonen: %s", pad)
             self._timer.stop()  # straks herstarten met juiste delay
             self.video_widget.setVisible(False)
 
-            pixmap = QPixmap(pad)
-            self.media_label.setPixmap(
-                pixmap.scaled(
-                    self.media_label.size(),
-                    Qt.AspectRatioMode.KeepAspectRatio,
-                    Qt.TransformationMode.SmoothTransformation,
-                )
-            )
+            target = self.media_label.size()
+            image = self._prefetcher.cache.get(pad, target)
+            if image is None:
+                # Niet vooraf klaar: toch meteen op labelgrootte decoderen
+                image = load_scaled_qimage(pad, target)
+            if image is None:
+                logger.error("Afbeelding niet leesbaar: %s", pad)
+                pixmap = QPixmap()
+            else:
+                pixmap = QPixmap.fromImage(image)
+            self.media_label.setPixmap(pixmap)
             self.media_label.setVisible(True)
 
             if self.slideshow_running:
                 self._timer.start(self.delay_ms)
+            self._prefetch_upcoming()
 
         # Video
-        elif pad.lower().endswith((".mp4", ".avi", ".mov", ".mkv", ".wmv", ".flv", ".webm", ".mpeg", ".mpg")):
+        elif kind == "video":
             logger.debug("Video afspelen: %s", pad)
             self._timer.stop()  # video bepaalt tempo
             self.media_label.setVisible(False)
             self.video_widget.setVisible(True)
             self.player.setSource(QUrl.fromLocalFile(pad))
             self.player.play()
+            self._prefetch_upcoming()
 
         else:
             logger.warning("Niet-ondersteund mediabestand: %s", pad)
 
 # [END: FUNC: def play_media]
 
+# [FUNC: def _upcoming_images]
+    def _upcoming_images(self) -> list[str]:
+        """Volgende prefetch_count afbeeldingen na current_index (video's overgeslagen)."""
+        n = len(self.media_list)
+        result: list[str] = []
+        for step in range(1, n):
+            idx = self.current_index + step
+            if idx >= n:
+                if not self.loop_enabled:
+                    break
+                idx %= n
+            p = self.media_list[idx]
+            if self._kind(p) == "image":
+                result.append(p)
+                if len(result) >= self.prefetch_count:
+                    break
+        return result
+
+# [END: FUNC: def _upcoming_images]
+
+# [FUNC: def _prefetch_upcoming]
+    def _prefetch_upcoming(self) -> None:
+        if self.prefetch_count <= 0:
+            return
+        upcoming = self._upcoming_images()
+        if upcoming:
+            self._prefetcher.request(upcoming, self.media_label.size())
+
+# [END: FUNC: def _prefetch_upcoming]
+
+# [FUNC: def shutdown]
+    def shutdown(self) -> None:
+        """Stop de prefetch-worker en geef de cache vrij (bij afsluiten van de app)."""
+        logger.debug("MediaPlayer shutdown")
+        self._prefetcher.stop()
+        self._prefetcher.cache.clear()
+
+# [END: FUNC: def shutdown]
+
 # [FUNC: def _on_timeout]
     def _on_timeout(self):
         logger.debug("Slideshow-timeout → volgende media")
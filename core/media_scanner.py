@@ -4,97 +4,278 @@ from __future__ import annotations
 import logging
 import os
 import time
-from typing import Dict, Iterable, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
 # Externe libs (PIL/ffprobe) bewust vermeden; we beperken ons tot mtime/size/ext.
 from .db_interface import DbService
+from .file_hashing import partial_hash
+from .media_types import IMAGE_EXTS, VIDEO_EXTS, kind_for_ext, sniff  # noqa: F401 (re-export)
 # [END: SECTION: IMPORTS]
 
 # [SECTION: LOGGER]
 logger = logging.getLogger(__name__)
 # [END: SECTION: LOGGER]
 
-IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".gif", ".tiff", ".webp"}
-VIDEO_EXTS = {".mp4", ".avi", ".mov", ".mkv", ".wmv", ".m4v", ".webm"}
-
 # [FUNC: def _detect_type]
 def _detect_type(ext: str) -> str:
-    ext_l = ext.lower()
-    if ext_l in IMAGE_EXTS:
-        return "image"
-    if ext_l in VIDEO_EXTS:
-        return "video"
-    return "other"
+    return kind_for_ext(ext)
 
 # [END: FUNC: def _detect_type]
 
-# [FUNC: def iter_media_files]
-def iter_media_files(root: str) -> Iterable[Tuple[str, str, str]]:
+SNIFF_WORKERS = 4  # begrensde threadpool: I/O-gebonden, klein houden op HDD/NAS
+BATCH_SIZE = 500  # media per upsert-transactie
+
+# [FUNC: def sniff_unknown]
+def sniff_unknown(
+    db: DbService,
+    candidates: List[Tuple[str, int, float]],
+    workers: int = SNIFF_WORKERS,
+) -> Dict[str, str]:
     """
-    Yield (full_path, filename, ext) voor bestanden onder root.
+    Herken bestanden zonder bekende extensie aan hun eerste bytes.
+    candidates: (path, size, mtime). Return: {path: 'image' | 'video'}.
+    Resultaten (ook 'other') gaan naar sniff_cache; bij een rescan wordt een
+    bestand met ongewijzigde size/mtime niet opnieuw geopend.
     """
-    for dirpath, _, filenames in os.walk(root):
-        for fn in filenames:
-            full = os.path.join(dirpath, fn)
-            _, ext = os.path.splitext(fn)
-            yield full, fn, ext
+    if not candidates:
+        return {}
+    cached = db.get_sniff_cache(p for p, _, _ in candidates)
+    kinds: Dict[str, str] = {}
+    todo: List[Tuple[str, int, float]] = []
+    for path, size, mtime in candidates:
+        hit = cached.get(path)
+        if hit is not None and hit[0] == size and hit[1] == mtime:
+            kinds[path] = hit[2]
+        else:
+            todo.append((path, size, mtime))
+    if todo:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            found = list(pool.map(sniff, [p for p, _, _ in todo]))
+        rows = []
+        for (path, size, mtime), t in zip(todo, found):
+            kinds[path] = t.kind if t else "other"
+            rows.append((path, size, mtime, kinds[path], t.mime if t else None))
+        db.set_sniff_cache(rows)
+    logger.info(
+        "Inhoudsherkenning: %s kandidaten, %s gelezen, %s media",
+        len(candidates), len(todo), sum(1 for k in kinds.values() if k != "other"),
+    )
+    return {p: k for p, k in kinds.items() if k != "other"}
 
-# [END: FUNC: def iter_media_files]
+# [END: FUNC: def sniff_unknown]
+
+# [FUNC: def detect_moves]
+def detect_moves(db: DbService, fresh: List[Tuple], folder_id: int) -> int:
+    """
+    Koppel nieuwe bestanden aan ontbrekende rijen met dezelfde (size, mtime)
+    en zet die rij om naar het nieuwe pad, zodat tags, rating, favoriet,
+    historiek, gezichten en analyses behouden blijven.
+    fresh: upsert-rijen (folder_id, path, filename, ext, size, mtime, type, dir_id).
+    Bevestiging via de partiële hash wanneer de oude rij er een heeft; zonder
+    opgeslagen hash enkel bij precies één kandidaat aan beide kanten.
+    Return: aantal verplaatsingen.
+    """
+    cands = db.missing_media_by_stat((r[4], r[5]) for r in fresh)
+    if not cands:
+        return 0
+    by_key: Dict[Tuple[int, float], List[Tuple]] = {}
+    for r in fresh:
+        if (r[4], r[5]) in cands:
+            by_key.setdefault((r[4], r[5]), []).append(r)
+    exists = db.existing_paths(r[1] for rows in by_key.values() for r in rows)
+
+    moves: List[Tuple[str, str, int, Optional[int]]] = []
+    for key, rows in by_key.items():
+        rows = [r for r in rows if r[1] not in exists]
+        olds = list(cands[key])
+        if not rows:
+            continue
+        if any(ph for _, _, ph in olds):
+            for r in rows:
+                try:
+                    ph = partial_hash(r[1], r[4])
+                except OSError:
+                    continue
+                for i, (_, old_path, old_ph) in enumerate(olds):
+                    if old_ph == ph:
+                        moves.append((old_path, r[1], folder_id, r[7]))
+                        del olds[i]
+                        break
+        elif len(rows) == 1 and len(olds) == 1:
+            moves.append((olds[0][1], rows[0][1], folder_id, rows[0][7]))
+    if not moves:
+        return 0
+    n = db.rename_media(moves)
+    logger.info("Verplaatste bestanden herkend: %s", n)
+    return n
+
+# [END: FUNC: def detect_moves]
 
 # [FUNC: def scan_folder_into_db]
-def scan_folder_into_db(root: str, db: DbService) -> Dict[str, int]:
+def scan_folder_into_db(
+    root: str,
+    db: DbService,
+    sniff_content: bool = False,
+    sniff_workers: int = SNIFF_WORKERS,
+    deep_verify: bool = False,
+) -> Dict[str, int]:
     """
     Scant een map en schrijft/actualiseert media in de DB.
     - Voegt folder toe (indien nieuw)
-    - Upsert elk bestand
+    - Upsert elk bestand (in batches van BATCH_SIZE)
     - Markeert ontbrekende bestanden in DB als missing=1
+    - sniff_content: bestanden met onbekende/ontbrekende extensie alsnog
+      herkennen aan hun magic bytes (gecachet per size/mtime)
+    - Mappen waarvan de mtime sinds de vorige scan gelijk bleef, worden niet
+      opnieuw opgelijst: hun bekende media gelden als gezien. Een wijziging
+      ín een bestand verandert de map-mtime niet; deep_verify=True lijst en
+      stat dan toch alles (de folder watcher vangt zulke wijzigingen live op).
+    - Nieuwe bestanden die overeenkomen met een ontbrekende rij (size, mtime,
+      partiële hash) nemen die rij over i.p.v. een nieuwe (detect_moves).
     Return: dict met simpele statistiek.
     """
-    logger.info("Start scan: %s", root)
+    logger.info("Start scan: %s%s", root, " (deep verify)" if deep_verify else "")
     start = time.time()
 
     folder_id = db.add_folder(root)
+    known_dirs = db.get_directories(folder_id)
+    known_media = db.media_paths_by_dir(folder_id)
+    # Enkel nieuwe bestanden met zo'n (size, mtime) wachten op detect_moves;
+    # leeg (eerste import, niets ontbrekend) → alles meteen in batches
+    move_keys = db.move_candidate_keys(folder_id)
+    children: Dict[int, List[str]] = {}
+    for path, (_, parent_id, _) in known_dirs.items():
+        if parent_id is not None:
+            children.setdefault(parent_id, []).append(path)
+
     seen_paths: List[str] = []
+    visited: set = set()
     upserts = 0
     skipped = 0
+    dirs_listed = dirs_skipped = 0
+    pending: List[Tuple] = []
+    fresh: List[Tuple] = []  # nieuw en mogelijk verplaatst: eerst detect_moves
+    pending_dirs: List[Tuple[int, float, int, int]] = []
+    late_dirs: List[Tuple[int, float, int, int]] = []  # pas na fresh/sniff vastleggen
+    unknown: List[Tuple[str, str, str, int, float, int]] = []
 
-    for full_path, filename, ext in iter_media_files(root):
-        mtype = _detect_type(ext)
-        if mtype == "other":
-            skipped += 1
-            continue
+    def _flush() -> None:
+        nonlocal pending, pending_dirs
+        db.upsert_media_batch(pending)
+        db.set_directory_state(pending_dirs)
+        pending, pending_dirs = [], []
 
+    stack: List[Tuple[str, Optional[int]]] = [(root, None)]
+    while stack:
+        dirpath, parent_id = stack.pop()
         try:
-            stat = os.stat(full_path)
-            size = int(stat.st_size)
-            mtime = float(stat.st_mtime)
-        except FileNotFoundError:
-            # race condition: bestand verdween tijdens scan
-            skipped += 1
+            dir_mtime = float(os.stat(dirpath).st_mtime)
+        except OSError:
             continue
-        except Exception:
-            logger.exception("Metadata ophalen mislukt: %s", full_path)
-            skipped += 1
+        rec = known_dirs.get(dirpath)
+        if rec is not None and not deep_verify and rec[2] == dir_mtime:
+            # Ongewijzigde map: niet oplijsten, bekende inhoud uit de DB
+            dirs_skipped += 1
+            visited.add(rec[0])
+            seen_paths.extend(known_media.get(rec[0], ()))
+            stack.extend((child, rec[0]) for child in children.get(rec[0], ()))
+            continue
+
+        dirs_listed += 1
+        dir_id = db.upsert_directory(dirpath, parent_id, folder_id)
+        visited.add(dir_id)
+        files = subdirs = 0
+        known_here = set(known_media.get(dir_id, ()))
+        n_late = len(fresh) + len(unknown)
+        try:
+            entries = list(os.scandir(dirpath))
+        except OSError:
+            logger.warning("Map niet leesbaar: %s", dirpath)
             continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs += 1
+                    stack.append((entry.path, dir_id))
+                    continue
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+            files += 1
+            filename = entry.name
+            ext = os.path.splitext(filename)[1]
+            mtype = _detect_type(ext)
+            if mtype == "other" and not sniff_content:
+                skipped += 1
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                # race condition: bestand verdween tijdens scan
+                skipped += 1
+                continue
+            except Exception:
+                logger.exception("Metadata ophalen mislukt: %s", entry.path)
+                skipped += 1
+                continue
+            size, mtime = int(st.st_size), float(st.st_mtime)
+            if mtype == "other":
+                if size > 0:
+                    unknown.append((entry.path, filename, ext, size, mtime, dir_id))
+                else:
+                    skipped += 1
+                continue
+            row = (folder_id, entry.path, filename, ext.lower(), size, mtime, mtype, dir_id)
+            if entry.path in known_here or (size, mtime) not in move_keys:
+                pending.append(row)
+                if len(pending) >= BATCH_SIZE:
+                    _flush()
+            else:
+                fresh.append(row)
+            seen_paths.append(entry.path)
+            upserts += 1
+        state = (dir_id, dir_mtime, files, subdirs)
+        (late_dirs if len(fresh) + len(unknown) > n_late else pending_dirs).append(state)
+    _flush()
 
-        db.upsert_media(
-            folder_id=folder_id,
-            path=full_path,
-            filename=filename,
-            ext=ext.lower(),
-            size=size,
-            mtime=mtime,
-            mtype=mtype,
-        )
-        seen_paths.append(full_path)
-        upserts += 1
+    sniffed = 0
+    if unknown:
+        kinds = sniff_unknown(db, [(u[0], u[3], u[4]) for u in unknown], sniff_workers)
+        for full_path, filename, ext, size, mtime, dir_id in unknown:
+            mtype = kinds.get(full_path)
+            if mtype is None:
+                skipped += 1
+                continue
+            row = (folder_id, full_path, filename, ext.lower(), size, mtime, mtype, dir_id)
+            (fresh if (size, mtime) in move_keys else pending).append(row)
+            seen_paths.append(full_path)
+            upserts += 1
+            sniffed += 1
+            if len(pending) >= BATCH_SIZE:
+                _flush()
+        _flush()
 
+    # Eerst ontbrekend markeren, dan nieuwe bestanden tegen ontbrekende rijen
+    # (ook uit andere mappen) matchen, pas daarna de rest invoegen
+    db.delete_directories(
+        rec[0] for rec in known_dirs.values() if rec[0] not in visited
+    )
     missing_marked = db.mark_missing_in_folder(folder_id, seen_paths)
+    moved = detect_moves(db, fresh, folder_id) if fresh else 0
+    for i in range(0, len(fresh), BATCH_SIZE):
+        db.upsert_media_batch(fresh[i : i + BATCH_SIZE])
+    db.set_directory_state(late_dirs)
     elapsed = time.time() - start
     stats = {
         "folder_id": folder_id,
         "upserts": upserts,
         "skipped": skipped,
+        "sniffed": sniffed,
+        "moved": moved,
+        "dirs_listed": dirs_listed,
+        "dirs_skipped": dirs_skipped,
         "missing_marked": missing_marked,
         "elapsed_s": int(elapsed),
     }
@@ -0,0 +1,165 @@
+# [SECTION: IMPORTS]
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Optional, Tuple
+# [END: SECTION: IMPORTS]
+
+# Eén bron voor ondersteunde mediatypes (scanner, zoekthread, player, UI).
+# Classificatie is een dict-lookup op de extensie en logt bewust niets:
+# deze functies draaien voor elk bestand tijdens een scan.
+
+
+# [CLASS: MediaType]
+@dataclass(frozen=True)
+class MediaType:
+    ext: str  # met punt, lowercase
+    kind: str  # "image" | "video"
+    mime: str
+
+# [END: CLASS: MediaType]
+
+
+_TYPES: Tuple[MediaType, ...] = (
+    MediaType(".jpg", "image", "image/jpeg"),
+    MediaType(".jpeg", "image", "image/jpeg"),
+    MediaType(".png", "image", "image/png"),
+    MediaType(".bmp", "image", "image/bmp"),
+    MediaType(".gif", "image", "image/gif"),
+    MediaType(".tif", "image", "image/tiff"),
+    MediaType(".tiff", "image", "image/tiff"),
+    MediaType(".webp", "image", "image/webp"),
+    MediaType(".heic", "image", "image/heic"),
+    MediaType(".heif", "image", "image/heif"),
+    MediaType(".mp4", "video", "video/mp4"),
+    MediaType(".m4v", "video", "video/x-m4v"),
+    MediaType(".mov", "video", "video/quicktime"),
+    MediaType(".avi", "video", "video/x-msvideo"),
+    MediaType(".mkv", "video", "video/x-matroska"),
+    MediaType(".webm", "video", "video/webm"),
+    MediaType(".wmv", "video", "video/x-ms-wmv"),
+    MediaType(".flv", "video", "video/x-flv"),
+    MediaType(".mpeg", "video", "video/mpeg"),
+    MediaType(".mpg", "video", "video/mpeg"),
+)
+
+BY_EXT: Dict[str, MediaType] = {t.ext: t for t in _TYPES}
+IMAGE_EXTS: FrozenSet[str] = frozenset(t.ext for t in _TYPES if t.kind == "image")
+VIDEO_EXTS: FrozenSet[str] = frozenset(t.ext for t in _TYPES if t.kind == "video")
+MEDIA_EXTS: FrozenSet[str] = IMAGE_EXTS | VIDEO_EXTS
+
+# filtertypes van de zoek-UI ("images" | "videos" | "all") → toegestane extensies
+FILTER_EXTS: Dict[str, FrozenSet[str]] = {
+    "images": IMAGE_EXTS,
+    "videos": VIDEO_EXTS,
+    "all": MEDIA_EXTS,
+}
+
+SNIFF_BYTES = 32  # genoeg voor alle signaturen in sniff_bytes()
+SNIFF_VERSION = 2  # ophogen bij andere herkenningsregels: sniff_cache wordt gewist
+
+# ISO-BMFF major brands (bytes 8-12 na 'ftyp') die we als video kennen; andere
+# brands (avif, crx = Canon CR3, ...) zijn stilstaande beelden of onbekend
+_HEIF_BRANDS = frozenset((b"heic", b"heix", b"hevc", b"heim", b"heis", b"mif1", b"msf1"))
+_MP4_BRANDS = frozenset(
+    (
+        b"isom", b"iso2", b"iso3", b"iso4", b"iso5", b"iso6", b"mp41", b"mp42",
+        b"avc1", b"dash", b"mmp4", b"MSNV", b"f4v ", b"3gp4", b"3gp5", b"3gp6", b"3g2a",
+    )
+)
+
+
+# [FUNC: def ext_of]
+def ext_of(path: str) -> str:
+    """Extensie in lowercase, met punt ('' als er geen is)."""
+    return os.path.splitext(path)[1].lower()
+
+# [END: FUNC: def ext_of]
+
+# [FUNC: def kind_for_ext]
+def kind_for_ext(ext: str) -> str:
+    """'image' | 'video' | 'other' voor een extensie (met punt)."""
+    t = BY_EXT.get(ext.lower())
+    return t.kind if t else "other"
+
+# [END: FUNC: def kind_for_ext]
+
+# [FUNC: def kind_of]
+def kind_of(path: str) -> str:
+    """'image' | 'video' | 'other' op basis van de bestandsnaam."""
+    t = BY_EXT.get(os.path.splitext(path)[1].lower())
+    return t.kind if t else "other"
+
+# [END: FUNC: def kind_of]
+
+# [FUNC: def mime_of]
+def mime_of(path: str) -> Optional[str]:
+    t = BY_EXT.get(os.path.splitext(path)[1].lower())
+    return t.mime if t else None
+
+# [END: FUNC: def mime_of]
+
+# [FUNC: def matches_filter]
+def matches_filter(path: str, filtertype: str) -> bool:
+    """Past het pad bij filtertype "images" | "videos" | "all"? Onbekend filter → False."""
+    allowed = FILTER_EXTS.get(filtertype)
+    return allowed is not None and os.path.splitext(path)[1].lower() in allowed
+
+# [END: FUNC: def matches_filter]
+
+# [FUNC: def sniff_bytes]
+def sniff_bytes(head: bytes) -> Optional[MediaType]:
+    """
+    Herken het formaat aan de eerste SNIFF_BYTES bytes, los van de extensie.
+    Return: een (representatief) MediaType, of None als onbekend.
+    """
+    if head.startswith(b"\xff\xd8\xff"):
+        return BY_EXT[".jpg"]
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return BY_EXT[".png"]
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return BY_EXT[".gif"]
+    if head[:4] in (b"II*\x00", b"MM\x00*"):
+        return BY_EXT[".tiff"]
+    if head.startswith(b"BM") and len(head) >= 14:
+        return BY_EXT[".bmp"]
+    if head[:4] == b"RIFF":
+        if head[8:12] == b"WEBP":
+            return BY_EXT[".webp"]
+        if head[8:12] == b"AVI ":
+            return BY_EXT[".avi"]
+        return None
+    if head[4:8] == b"ftyp":
+        brand = head[8:12]
+        if brand in _HEIF_BRANDS:
+            return BY_EXT[".heic"]
+        if brand == b"qt  ":
+            return BY_EXT[".mov"]
+        if brand.startswith(b"M4V"):
+            return BY_EXT[".m4v"]
+        if brand in _MP4_BRANDS:
+            return BY_EXT[".mp4"]
+        return None
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return BY_EXT[".webm"] if b"webm" in head else BY_EXT[".mkv"]
+    if head.startswith(b"\x30\x26\xb2\x75\x8e\x66\xcf\x11"):
+        return BY_EXT[".wmv"]
+    if head.startswith(b"FLV\x01"):
+        return BY_EXT[".flv"]
+    if head[:4] in (b"\x00\x00\x01\xba", b"\x00\x00\x01\xb3"):
+        return BY_EXT[".mpg"]
+    return None
+
+# [END: FUNC: def sniff_bytes]
+
+# [FUNC: def sniff]
+def sniff(path: str, head_size: int = SNIFF_BYTES) -> Optional[MediaType]:
+    """Lees de eerste bytes van het bestand en herken het formaat; None bij fout/onbekend."""
+    try:
+        with open(path, "rb") as f:
+            return sniff_bytes(f.read(head_size))
+    except OSError:
+        return None
+
+# [END: FUNC: def sniff]
@@ -5,6 +5,11 @@ from datetime import datetime, date
 from typing import Optional, Iterable
 # [END: SECTION: IMPORTS]
 
+try:
+    from core import media_types  # type: ignore
+except Exception:  # fallback pad
+    import media_types  # type: ignore
+
 # Pillow optioneel voor EXIF
 try:
     from PIL import Image, ExifTags  # type: ignore
@@ -16,21 +21,9 @@ except Exception:
 logger = logging.getLogger(__name__)
 # [END: SECTION: LOGGER]
 
-# Vaste extensies voor afbeeldingen
-image_extensions = [".jpg", ".jpeg", ".png", ".bmp", ".gif", ".tiff", ".heic", ".webp"]
-
-# Vaste extensies voor video's
-video_extensions = [
-    ".mp4",
-    ".avi",
-    ".mkv",
-    ".mov",
-    ".wmv",
-    ".flv",
-    ".webm",
-    ".mpeg",
-    ".mpg",
-]
+# Extensies voor afbeeldingen/video's (uit het centrale register in media_types)
+image_extensions = sorted(media_types.IMAGE_EXTS)
+video_extensions = sorted(media_types.VIDEO_EXTS)
 
 # Folders die bewust worden overgeslagen bij zoekacties
 excluded_folders = [
@@ -64,7 +57,7 @@ def get_exif_datetime(path: str) -> Optional[datetime]:
     anders None. Werkt alleen voor images en als Pillow beschikbaar is.
     """
     ext = os.path.splitext(path)[1].lower()
-    if ext not in image_extensions or Image is None:
+    if ext not in media_types.IMAGE_EXTS or Image is None:
         return None
     try:
         with Image.open(path) as im:
@@ -173,21 +166,9 @@ def is_media_file(filepath: str, filtertype: str) -> bool:
     - "images" → alleen afbeeldingen
     - "videos" → alleen video's
     - "all"    → beide
+    Dict-lookup in het register, zonder logging: draait voor elk bestand.
     """
-    ext = os.path.splitext(filepath)[1].lower()
-    logger.debug("is_media_file: %s (ext=%s, filter=%s)", filepath, ext, filtertype)
-
-    if filtertype == "images":
-        match = ext in image_extensions
-    elif filtertype == "videos":
-        match = ext in video_extensions
-    elif filtertype == "all":
-        match = ext in image_extensions or ext in video_extensions
-    else:
-        match = False
-
-    logger.debug("is_media_file → match=%s", match)
-    return match
+    return media_types.matches_filter(filepath, filtertype)
 
 # [END: FUNC: def is_media_file]
 
@@ -0,0 +1,259 @@
+# [SECTION: IMPORTS]
+from __future__ import annotations
+
+import hashlib
+import logging
+import mmap
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .db_interface import DbService
+
+# [END: SECTION: IMPORTS]
+
+# [SECTION: LOGGER]
+logger = logging.getLogger(__name__)
+# [END: SECTION: LOGGER]
+
+PACK_PREFIX = "pack://"
+DEFAULT_PACK_BYTES = 256 * 1024 * 1024  # nieuw packbestand na ~256 MB
+COMPACT_MIN_STALE = 0.25  # pack herschrijven vanaf 25% dode bytes
+_PACK_NAME = re.compile(r"^pack_(\d{5})\.bin$")
+
+
+# [FUNC: def is_pack_ref]
+def is_pack_ref(thumb_path: Optional[str]) -> bool:
+    return bool(thumb_path) and str(thumb_path).startswith(PACK_PREFIX)
+
+# [END: FUNC: def is_pack_ref]
+
+
+# [CLASS: PackedThumbnailStore]
+# [SECTION: CLASS: PackedThumbnailStore]
+class PackedThumbnailStore:
+    """
+    Append-only packbestanden (pack_00001.bin, ...) in plaats van één bestand
+    per thumbnail. De index (digest → pack, offset, lengte) staat in de tabel
+    thumbnail_packs; thumbnails.thumb_path bevat 'pack://<digest>'.
+    Lezen gebeurt via mmap; compact() herschrijft packs met veel dode entries.
+    Schrijven is bedoeld voor één proces tegelijk (de thumbnail-generator).
+    """
+
+# [FUNC: __init__]
+    def __init__(
+        self, db: DbService, pack_dir: str, max_pack_bytes: int = DEFAULT_PACK_BYTES
+    ) -> None:
+        self.db = db
+        self.pack_dir = pack_dir
+        self.max_pack_bytes = int(max_pack_bytes)
+        self._lock = threading.Lock()
+        self._maps: Dict[int, Tuple[mmap.mmap, object]] = {}
+        self._writer = None
+        self._writer_id = 0
+        self._pending: List[Tuple[str, int, int, int]] = []
+        self._known: set = set()
+        os.makedirs(self.pack_dir, exist_ok=True)
+
+# [END: FUNC: __init__]
+
+# [FUNC: _pack_path]
+    def _pack_path(self, pack_id: int) -> str:
+        return os.path.join(self.pack_dir, f"pack_{pack_id:05d}.bin")
+
+# [END: FUNC: _pack_path]
+
+# [FUNC: _existing_pack_ids]
+    def _existing_pack_ids(self) -> List[int]:
+        ids = []
+        for name in os.listdir(self.pack_dir):
+            m = _PACK_NAME.match(name)
+            if m:
+                ids.append(int(m.group(1)))
+        return sorted(ids)
+
+# [END: FUNC: _existing_pack_ids]
+
+# [FUNC: _open_writer]
+    def _open_writer(self, force_new: bool = False) -> None:
+        ids = self._existing_pack_ids()
+        pack_id = ids[-1] if ids else 1
+        if force_new or (
+            ids and os.path.getsize(self._pack_path(pack_id)) >= self.max_pack_bytes
+        ):
+            pack_id = (ids[-1] + 1) if ids else 1
+        self._writer = open(self._pack_path(pack_id), "ab")
+        self._writer_id = pack_id
+
+# [END: FUNC: _open_writer]
+
+# [FUNC: put]
+    def put(self, data: bytes) -> str:
+        """Voeg thumbnail-bytes toe; retourneert de referentie 'pack://<digest>'."""
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        ref = PACK_PREFIX + digest
+        with self._lock:
+            known = digest in self._known
+        if known or self.db.get_pack_entries([digest]):
+            self._known.add(digest)  # zelfde inhoud staat al in een pack
+            return ref
+        with self._lock:
+            self._known.add(digest)
+            if self._writer is None:
+                self._open_writer()
+            elif self._writer.tell() >= self.max_pack_bytes:
+                self._writer.close()
+                self._open_writer(force_new=True)
+            offset = self._writer.tell()
+            self._writer.write(data)
+            self._pending.append((digest, self._writer_id, offset, len(data)))
+        return ref
+
+# [END: FUNC: put]
+
+# [FUNC: flush]
+    def flush(self) -> None:
+        """Schrijf gebufferde bytes naar schijf en registreer de offsets in de DB."""
+        with self._lock:
+            if self._writer is not None:
+                self._writer.flush()
+                os.fsync(self._writer.fileno())
+            pending, self._pending = self._pending, []
+        self.db.add_pack_entries(pending)
+
+# [END: FUNC: flush]
+
+# [FUNC: close]
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            for mm, fh in self._maps.values():
+                mm.close()
+                fh.close()  # type: ignore[attr-defined]
+            self._maps.clear()
+
+# [END: FUNC: close]
+
+# [FUNC: _map]
+    def _map(self, pack_id: int, needed_end: int) -> mmap.mmap:
+        cached = self._maps.get(pack_id)
+        if cached is not None and len(cached[0]) >= needed_end:
+            return cached[0]
+        if cached is not None:  # pack is gegroeid sinds de mapping
+            cached[0].close()
+            cached[1].close()  # type: ignore[attr-defined]
+        fh = open(self._pack_path(pack_id), "rb")
+        mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps[pack_id] = (mm, fh)
+        return mm
+
+# [END: FUNC: _map]
+
+# [FUNC: read_many]
+    def read_many(self, refs: Iterable[str]) -> Dict[str, bytes]:
+        """{ref: bytes} voor alle leesbare 'pack://'-referenties."""
+        digests = {r[len(PACK_PREFIX):]: r for r in refs if is_pack_ref(r)}
+        entries = self.db.get_pack_entries(digests.keys())
+        result: Dict[str, bytes] = {}
+        with self._lock:
+            for digest, (pack_id, offset, length) in entries.items():
+                try:
+                    mm = self._map(pack_id, offset + length)
+                    result[digests[digest]] = mm[offset : offset + length]
+                except (OSError, ValueError):
+                    logger.warning("Pack %s onleesbaar voor %s", pack_id, digest)
+        return result
+
+# [END: FUNC: read_many]
+
+# [FUNC: read]
+    def read(self, ref: str) -> Optional[bytes]:
+        return self.read_many([ref]).get(ref)
+
+# [END: FUNC: read]
+
+# [FUNC: compact]
+    def compact(self, min_stale_ratio: float = COMPACT_MIN_STALE) -> Dict[str, int]:
+        """
+        Herschrijf packs waarvan minstens min_stale_ratio van de bytes niet meer
+        door een thumbnails-rij gebruikt wordt: levende entries gaan naar een
+        nieuw pack, daarna verdwijnt het oude bestand.
+        """
+        self.flush()
+        per_pack: Dict[int, List[Tuple[str, int, int, bool]]] = {}
+        for digest, pack_id, offset, length, live in self.db.pack_entries_with_liveness():
+            per_pack.setdefault(pack_id, []).append((digest, offset, length, live))
+
+        victims = []
+        for pack_id, entries in per_pack.items():
+            try:
+                total = os.path.getsize(self._pack_path(pack_id))
+            except OSError:
+                continue
+            live = sum(e[2] for e in entries if e[3])
+            if total and (total - live) / total >= min_stale_ratio:
+                victims.append(pack_id)
+        # ook packbestanden zonder enige index-entry zijn volledig dood
+        orphan_files = [
+            p
+            for p in self._existing_pack_ids()
+            if p not in per_pack and not (self._writer is not None and p == self._writer_id)
+        ]
+
+        stats = {"packs_rewritten": 0, "entries_moved": 0, "bytes_freed": 0}
+        if not victims and not orphan_files:
+            return stats
+
+        moved: List[Tuple[str, int, int, int]] = []
+        if victims:
+            with self._lock:
+                if self._writer is not None:
+                    self._writer.close()
+                self._open_writer(force_new=True)  # nooit naar een slachtoffer schrijven
+                for pack_id in victims:
+                    with open(self._pack_path(pack_id), "rb") as src:
+                        for digest, offset, length, live in per_pack[pack_id]:
+                            if not live:
+                                continue
+                            src.seek(offset)
+                            data = src.read(length)
+                            if self._writer.tell() >= self.max_pack_bytes:
+                                self._writer.close()
+                                self._open_writer(force_new=True)
+                            new_offset = self._writer.tell()
+                            self._writer.write(data)
+                            moved.append((digest, self._writer_id, new_offset, length))
+                self._writer.flush()
+                os.fsync(self._writer.fileno())
+
+        # eerst de index omzetten, pas daarna oude bestanden wissen
+        self.db.relocate_pack_entries(moved, victims)
+        with self._lock:
+            # dode entries van herschreven packs staan niet meer in de index:
+            # een latere put() van dezelfde bytes moet ze opnieuw wegschrijven
+            self._known.difference_update(
+                e[0] for pack_id in victims for e in per_pack[pack_id] if not e[3]
+            )
+            for pack_id in victims + orphan_files:
+                cached = self._maps.pop(pack_id, None)
+                if cached is not None:
+                    cached[0].close()
+                    cached[1].close()  # type: ignore[attr-defined]
+                try:
+                    stats["bytes_freed"] += os.path.getsize(self._pack_path(pack_id))
+                    os.remove(self._pack_path(pack_id))
+                except OSError:
+                    logger.warning("Pack wissen mislukt: %s", pack_id, exc_info=True)
+        stats["bytes_freed"] -= sum(m[3] for m in moved)
+        stats["packs_rewritten"] = len(victims)
+        stats["entries_moved"] = len(moved)
+        logger.info("Pack-compactie: %s", stats)
+        return stats
+
+# [END: FUNC: compact]
+# [END: SECTION: CLASS: PackedThumbnailStore]
+# [END: CLASS: PackedThumbnailStore]
@@ -0,0 +1,323 @@
+# [SECTION: IMPORTS]
+from __future__ import annotations
+
+import hashlib
+import io
+import logging
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .db_interface import DbService
+from .image_loader import Image, load_scaled_pil
+from .thumbnail_pack import PackedThumbnailStore, is_pack_ref
+
+# [END: SECTION: IMPORTS]
+
+# [SECTION: LOGGER]
+logger = logging.getLogger(__name__)
+# [END: SECTION: LOGGER]
+
+# Langste zijde in pixels per thumbnail-soort
+THUMB_SIZES: Dict[str, int] = {"small": 160, "medium": 480}
+JPEG_QUALITY = 85
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024  # 2 GB cache
+
+ProgressCallback = Callable[[int, int], None]
+
+
+# [FUNC: def _render_thumbnails]
+def _render_thumbnails(
+    path: str, sizes: Dict[str, int], quality: int = JPEG_QUALITY
+) -> List[Tuple[str, bytes, int, int]]:
+    """
+    Worker (draait in een apart proces): decodeer één keer op de grootste
+    gevraagde maat en leid de kleinere soorten daarvan af.
+    Retourneert [(kind, jpeg_bytes, width, height), ...].
+    """
+    if not sizes:
+        return []
+    largest = max(sizes.values())
+    im = load_scaled_pil(path, (largest, largest))
+    if im is None:
+        return []
+    out: List[Tuple[str, bytes, int, int]] = []
+    for kind, edge in sorted(sizes.items(), key=lambda kv: -kv[1]):
+        thumb = im.copy()
+        thumb.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+        buf = io.BytesIO()
+        thumb.save(buf, "JPEG", quality=quality, optimize=True)
+        out.append((kind, buf.getvalue(), thumb.width, thumb.height))
+    return out
+
+# [END: FUNC: def _render_thumbnails]
+
+
+# [CLASS: ThumbnailService]
+# [SECTION: CLASS: ThumbnailService]
+class ThumbnailService:
+    """
+    Genereert small/medium thumbnails in een procespool en bewaart ze in een
+    content-addressed cachemap (bestandsnaam = hash van de JPEG-bytes), met
+    registratie via DbService.set_thumbnails.
+    - Invalidatie: thumbnail geldt enkel zolang media.size/mtime gelijk zijn
+      aan de src_size/src_mtime bij generatie.
+    - Eviction: totale grootte begrensd op max_bytes, minst recent gebruikt eerst.
+    - layout="packed": thumbnails in append-only packbestanden i.p.v. één
+      bestand per thumbnail (zie PackedThumbnailStore); thumb_path = 'pack://…'.
+    """
+
+# [FUNC: __init__]
+    def __init__(
+        self,
+        db: DbService,
+        cache_dir: Optional[str] = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        workers: Optional[int] = None,
+        layout: Optional[str] = None,
+    ) -> None:
+        self.db = db
+        self.cache_dir = cache_dir or os.path.join(
+            os.path.dirname(os.path.abspath(db.db_path)), "thumbnails"
+        )
+        self.max_bytes = int(max_bytes)
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self._cancel = threading.Event()
+        self.layout = layout or db.get_preference("thumbnail_layout", "files") or "files"
+        self.pack: Optional[PackedThumbnailStore] = (
+            PackedThumbnailStore(db, os.path.join(self.cache_dir, "packs"))
+            if self.layout == "packed"
+            else None
+        )
+        logger.debug(
+            "ThumbnailService init: dir=%s layout=%s max=%s workers=%s",
+            self.cache_dir,
+            self.layout,
+            self.max_bytes,
+            self.workers,
+        )
+
+# [END: FUNC: __init__]
+
+# [FUNC: lookup]
+    def lookup(self, path: str, kind: str = "small") -> Optional[str]:
+        """Pad naar een geldige thumbnail voor dit mediabestand, of None."""
+        return self.lookup_many([path], kind).get(path)
+
+# [END: FUNC: lookup]
+
+# [FUNC: lookup_many]
+    def lookup_many(self, paths: Iterable[str], kind: str = "small") -> Dict[str, str]:
+        """
+        Bulk-lookup voor de resultatenboom/slideshow: {mediapad: thumbnailpad}.
+        Ontbrekende of verouderde thumbnails zitten niet in het resultaat.
+        In packed-layout is de waarde een 'pack://'-referentie: lees die met
+        read_thumbnail().
+        """
+        rows = self.db.get_thumbnails_for_paths(paths, kind)
+        return {
+            p: r["thumb_path"]
+            for p, r in rows.items()
+            if is_pack_ref(r["thumb_path"])
+            or (r["thumb_path"] and os.path.exists(r["thumb_path"]))
+        }
+
+# [END: FUNC: lookup_many]
+
+# [FUNC: read_thumbnail]
+    def read_thumbnail(self, ref: str) -> Optional[bytes]:
+        """JPEG-bytes van een thumbnail, ongeacht layout (bestand of pack)."""
+        if is_pack_ref(ref):
+            return self.pack.read(ref) if self.pack is not None else None
+        try:
+            with open(ref, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+# [END: FUNC: read_thumbnail]
+
+# [FUNC: close]
+    def close(self) -> None:
+        if self.pack is not None:
+            self.pack.close()
+
+# [END: FUNC: close]
+
+# [FUNC: cancel]
+    def cancel(self) -> None:
+        """Vraag een lopende generate() om te stoppen na de huidige items."""
+        self._cancel.set()
+
+# [END: FUNC: cancel]
+
+# [FUNC: store]
+    def store(self, kind: str, data: bytes) -> str:
+        """Bewaar thumbnail-bytes (bestand of pack) en geef de thumb_path terug."""
+        if self.pack is not None:
+            return self.pack.put(data)
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        folder = os.path.join(self.cache_dir, kind, digest[:2])
+        target = os.path.join(folder, f"{digest}.jpg")
+        if not os.path.exists(target):  # zelfde inhoud = zelfde bestand
+            os.makedirs(folder, exist_ok=True)
+            tmp = f"{target}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, target)
+        return target
+
+# [END: FUNC: store]
+
+# [FUNC: remove_files]
+    def remove_files(self, paths: Iterable[str]) -> int:
+        """Wis thumbnailbestanden die niet meer gebruikt worden (pack-refs: via compact)."""
+        removed = 0
+        for p in paths:
+            if is_pack_ref(p):
+                continue  # packs worden via compact() opgeruimd
+            try:
+                os.remove(p)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            except Exception:
+                logger.warning("Thumbnail wissen mislukt: %s", p, exc_info=True)
+        return removed
+
+# [END: FUNC: remove_files]
+
+# [FUNC: register]
+    def register(self, batch: List[Tuple]) -> None:
+        """Leg een batch thumbnail-rijen vast (zie DbService.set_thumbnails)."""
+        if self.pack is not None:
+            self.pack.flush()  # pack-index vóór de thumbnails-rijen vastleggen
+        self.db.set_thumbnails(batch)
+
+# [END: FUNC: register]
+
+# [FUNC: generate]
+    def generate(
+        self,
+        kinds: Optional[Iterable[str]] = None,
+        limit: Optional[int] = None,
+        progress: Optional[ProgressCallback] = None,
+    ) -> Dict[str, int]:
+        """
+        Genereer ontbrekende/verouderde thumbnails voor alle images in de DB.
+        Return: dict met simpele statistiek.
+        """
+        kinds = list(kinds or THUMB_SIZES.keys())
+        self._cancel.clear()
+
+        # media_id -> (path, size, mtime, {kind}), plus oude thumbs voor opruimen
+        todo: Dict[int, Tuple[str, Optional[int], Optional[float], Set[str]]] = {}
+        old_paths: Set[str] = set()
+        for kind in kinds:
+            for media_id, path, size, mtime, old in self.db.media_needing_thumbnail(
+                kind, limit=limit
+            ):
+                entry = todo.setdefault(media_id, (path, size, mtime, set()))
+                entry[3].add(kind)
+                if old:
+                    old_paths.add(old)
+
+        total = len(todo)
+        stats = {"todo": total, "generated": 0, "failed": 0, "evicted": 0}
+        if not total:
+            return stats
+        logger.info("Thumbnails genereren: %s media (%s)", total, ", ".join(kinds))
+
+        items = iter(todo.items())
+        pending: Dict[Future, int] = {}
+        batch: List[Tuple] = []
+        done = 0
+        window = self.workers * 4  # begrensd aantal openstaande jobs
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            while True:
+                while len(pending) < window and not self._cancel.is_set():
+                    nxt = next(items, None)
+                    if nxt is None:
+                        break
+                    media_id, (path, _, _, want) = nxt
+                    sizes = {k: THUMB_SIZES[k] for k in want}
+                    pending[pool.submit(_render_thumbnails, path, sizes)] = media_id
+                if not pending:
+                    break
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    media_id = pending.pop(fut)
+                    path, size, mtime, _ = todo[media_id]
+                    done += 1
+                    try:
+                        rendered = fut.result()
+                    except Exception:
+                        logger.exception("Thumbnail-worker faalde: %s", path)
+                        rendered = []
+                    if not rendered:
+                        stats["failed"] += 1
+                        continue
+                    for kind, data, w, h in rendered:
+                        target = self.store(kind, data)
+                        batch.append((media_id, kind, target, w, h, size, mtime, len(data)))
+                    stats["generated"] += 1
+                if len(batch) >= 200:
+                    self.register(batch)
+                    batch = []
+                if progress:
+                    progress(done, total)
+
+        self.register(batch)
+        # vervangen thumbnails waar niemand nog naar wijst opruimen
+        self.remove_files(self.db.unreferenced_thumb_paths(old_paths))
+        stats["evicted"] = self.enforce_limit()
+        logger.info("Thumbnails klaar: %s", stats)
+        return stats
+
+# [END: FUNC: generate]
+
+# [FUNC: enforce_limit]
+    def enforce_limit(self) -> int:
+        """
+        Houd de cache onder max_bytes door de minst recent gebruikte thumbnails
+        te verwijderen. Retourneert het aantal verwijderde rijen.
+        Packs worden ook binnen het budget gecompacteerd (eigen drempel op
+        het aandeel dode bytes), anders groeien ze na regeneraties onbeperkt.
+        """
+        total = self.db.thumbnail_bytes_total()
+        evicted = 0
+        while total > self.max_bytes:
+            rows = self.db.thumbnails_by_last_access(limit=500)
+            if not rows:
+                break
+            ids: List[int] = []
+            for tid, _, nbytes in rows:
+                ids.append(tid)
+                total -= nbytes
+                if total <= self.max_bytes:
+                    break
+            self.remove_files(self.db.delete_thumbnails(ids))
+            evicted += len(ids)
+            # gedeelde bestanden komen pas vrij bij de laatste verwijzing
+            total = self.db.thumbnail_bytes_total()
+        if self.pack is not None:
+            self.pack.compact()
+        if evicted:
+            logger.info("Thumbnail-cache ingekort: %s verwijderd", evicted)
+        return evicted
+
+# [END: FUNC: enforce_limit]
+# [END: SECTION: CLASS: ThumbnailService]
+# [END: CLASS: ThumbnailService]
+
+
+# [SECTION: MAIN]
+if __name__ == "__main__":
+    # Standalone: genereer ontbrekende thumbnails voor de standaard-DB
+    if not logging.getLogger().handlers:
+        logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    svc = ThumbnailService(DbService())
+    print(svc.generate(progress=lambda d, t: print(f"{d}/{t}", end="\r")))
+# [END: SECTION: MAIN]
@@ -0,0 +1,285 @@
+# [SECTION: IMPORTS]
+from __future__ import annotations
+
+import io
+import json
+import logging
+import shutil
+import subprocess
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .db_interface import DbService
+from .image_loader import Image
+from .thumbnail_service import THUMB_SIZES, ThumbnailService
+
+# [END: SECTION: IMPORTS]
+# PyAV optioneel (fallback als ffmpeg/ffprobe niet in PATH staan)
+try:
+    import av  # type: ignore
+except Exception:
+    av = None  # type: ignore
+
+# [SECTION: LOGGER]
+logger = logging.getLogger(__name__)
+# [END: SECTION: LOGGER]
+
+POSTER_KIND = "poster"
+POSTER_EDGE = THUMB_SIZES["medium"]
+POSTER_POSITION = 0.10  # 10% in de video: voorbij zwarte intro's/fades
+SUBPROCESS_TIMEOUT_S = 60
+# thumb_path van een rij die "geen frame uit deze versie" onthoudt: zolang
+# size/mtime gelijk blijven slaat een volgende run de video over
+NO_POSTER = ""
+
+ProgressCallback = Callable[[int, int], None]
+
+
+# [CLASS: PosterResult]
+@dataclass
+class PosterResult:
+    jpeg: Optional[bytes]
+    width: Optional[int]
+    height: Optional[int]
+    duration_s: Optional[float]
+    video_width: Optional[int] = None
+    video_height: Optional[int] = None
+
+# [END: CLASS: PosterResult]
+
+
+# [FUNC: def available_backend]
+def available_backend() -> Optional[str]:
+    """'ffmpeg' als ffmpeg+ffprobe in PATH staan, anders 'pyav', anders None."""
+    if shutil.which("ffmpeg") and shutil.which("ffprobe"):
+        return "ffmpeg"
+    if av is not None:
+        return "pyav"
+    return None
+
+# [END: FUNC: def available_backend]
+
+# [FUNC: def _poster_time]
+def _poster_time(duration_s: Optional[float]) -> float:
+    if not duration_s or duration_s <= 0:
+        return 0.0
+    return max(0.0, min(duration_s * POSTER_POSITION, duration_s - 0.5))
+
+# [END: FUNC: def _poster_time]
+
+# [FUNC: def _jpeg_size]
+def _jpeg_size(data: bytes) -> Tuple[Optional[int], Optional[int]]:
+    """Afmetingen uit de JPEG-header (ffmpeg roteert al volgens de metadata)."""
+    if Image is None:
+        return None, None
+    try:
+        with Image.open(io.BytesIO(data)) as im:
+            return im.width, im.height
+    except Exception:
+        return None, None
+
+# [END: FUNC: def _jpeg_size]
+
+# [FUNC: def _extract_ffmpeg]
+def _extract_ffmpeg(path: str, edge: int) -> PosterResult:
+    probe = subprocess.run(
+        [
+            "ffprobe", "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "stream=width,height:format=duration",
+            "-of", "json", path,
+        ],
+        capture_output=True,
+        timeout=SUBPROCESS_TIMEOUT_S,
+        check=False,
+    )
+    duration = width = height = None
+    if probe.returncode == 0:
+        info = json.loads(probe.stdout or b"{}")
+        try:
+            duration = float(info.get("format", {}).get("duration"))
+        except (TypeError, ValueError):
+            duration = None
+        streams = info.get("streams") or [{}]
+        width, height = streams[0].get("width"), streams[0].get("height")
+
+    # -ss vóór -i: snelle seek op keyframe, daarna één frame als JPEG naar stdout
+    grab = subprocess.run(
+        [
+            "ffmpeg", "-v", "error", "-ss", f"{_poster_time(duration):.3f}", "-i", path,
+            "-frames:v", "1",
+            "-vf", f"scale='min({edge},iw)':'min({edge},ih)':force_original_aspect_ratio=decrease",
+            "-f", "image2pipe", "-vcodec", "mjpeg", "-q:v", "4", "-",
+        ],
+        capture_output=True,
+        timeout=SUBPROCESS_TIMEOUT_S,
+        check=False,
+    )
+    jpeg = grab.stdout if grab.returncode == 0 and grab.stdout else None
+    pw, ph = _jpeg_size(jpeg) if jpeg is not None else (None, None)
+    return PosterResult(jpeg, pw, ph, duration, width, height)
+
+# [END: FUNC: def _extract_ffmpeg]
+
+# [FUNC: def _extract_pyav]
+def _extract_pyav(path: str, edge: int) -> PosterResult:
+    with av.open(path) as container:  # type: ignore[union-attr]
+        duration = (
+            container.duration / av.time_base  # type: ignore[union-attr]
+            if container.duration
+            else None
+        )
+        if not container.streams.video:
+            return PosterResult(None, None, None, duration)
+        stream = container.streams.video[0]
+        stream.thread_type = "AUTO"
+        t = _poster_time(duration)
+        if t > 0 and stream.time_base:
+            container.seek(int(t / stream.time_base), stream=stream)
+        frame = next(container.decode(stream), None)
+        if frame is None:
+            return PosterResult(None, None, None, duration)
+        img = frame.to_image()
+        vw, vh = img.width, img.height
+        img.thumbnail((edge, edge))
+        buf = io.BytesIO()
+        img.save(buf, "JPEG", quality=85)
+        return PosterResult(buf.getvalue(), img.width, img.height, duration, vw, vh)
+
+# [END: FUNC: def _extract_pyav]
+
+# [FUNC: def extract_poster]
+def extract_poster(path: str, edge: int = POSTER_EDGE, backend: Optional[str] = None) -> PosterResult:
+    """Posterframe (JPEG-bytes) + duur van één video via ffmpeg of PyAV."""
+    backend = backend or available_backend()
+    if backend == "ffmpeg":
+        return _extract_ffmpeg(path, edge)
+    if backend == "pyav":
+        return _extract_pyav(path, edge)
+    raise RuntimeError("Geen ffmpeg/ffprobe in PATH en PyAV niet geïnstalleerd")
+
+# [END: FUNC: def extract_poster]
+
+
+# [CLASS: VideoPosterPipeline]
+# [SECTION: CLASS: VideoPosterPipeline]
+class VideoPosterPipeline:
+    """
+    Achtergrondjob: posterframe + duration_s voor elke video in de DB.
+    - Begrensde parallelliteit (max_workers gelijktijdige ffmpeg-processen)
+    - Resultaten in thumbnails (kind='poster') en media.duration_s/width/height
+    - Herhaalde runs slaan video's over waarvan size/mtime niet wijzigden
+    """
+
+# [FUNC: __init__]
+    def __init__(
+        self,
+        db: DbService,
+        thumbs: Optional[ThumbnailService] = None,
+        max_workers: int = 2,
+    ) -> None:
+        self.db = db
+        self.thumbs = thumbs or ThumbnailService(db)
+        self.max_workers = max(1, int(max_workers))
+        self.backend = available_backend()
+        self._cancel = threading.Event()
+        logger.debug(
+            "VideoPosterPipeline init: backend=%s workers=%s", self.backend, self.max_workers
+        )
+
+# [END: FUNC: __init__]
+
+# [FUNC: cancel]
+    def cancel(self) -> None:
+        self._cancel.set()
+
+# [END: FUNC: cancel]
+
+# [FUNC: run]
+    def run(
+        self, limit: Optional[int] = None, progress: Optional[ProgressCallback] = None
+    ) -> Dict[str, int]:
+        """Verwerk alle video's zonder geldige poster. Return: simpele statistiek."""
+        self._cancel.clear()
+        todo = self.db.media_needing_thumbnail(POSTER_KIND, mtype="video", limit=limit)
+        stats = {"todo": len(todo), "done": 0, "failed": 0}
+        if not todo:
+            return stats
+        if self.backend is None:
+            logger.warning("Video-posters overgeslagen: geen ffmpeg/ffprobe of PyAV")
+            stats["failed"] = len(todo)
+            return stats
+        logger.info("Posterframes extraheren: %s video's (%s)", len(todo), self.backend)
+
+        rows = iter(todo)
+        pending: Dict[Future, Tuple[int, str, Optional[int], Optional[float], Optional[str]]] = {}
+        thumbs: List[Tuple] = []
+        meta: List[Tuple[int, Optional[float], Optional[int], Optional[int]]] = []
+        old_refs: List[str] = []
+        done = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while True:
+                while len(pending) < self.max_workers * 2 and not self._cancel.is_set():
+                    row = next(rows, None)
+                    if row is None:
+                        break
+                    pending[pool.submit(extract_poster, row[1], POSTER_EDGE, self.backend)] = row
+                if not pending:
+                    break
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    media_id, path, size, mtime, old = pending.pop(fut)
+                    done += 1
+                    try:
+                        res = fut.result()
+                    except Exception:
+                        # time-out, corrupt bestand: ook onthouden, anders kost
+                        # elke run opnieuw tot SUBPROCESS_TIMEOUT_S per aanroep
+                        logger.warning("Poster mislukt: %s", path, exc_info=True)
+                        res = None
+                    if res is not None:
+                        meta.append((media_id, res.duration_s, res.video_width, res.video_height))
+                    if res is None or res.jpeg is None:
+                        thumbs.append((media_id, POSTER_KIND, NO_POSTER, None, None, size, mtime, 0))
+                        if old:
+                            old_refs.append(old)
+                        stats["failed"] += 1
+                        continue
+                    ref = self.thumbs.store(POSTER_KIND, res.jpeg)
+                    thumbs.append(
+                        (media_id, POSTER_KIND, ref, res.width, res.height, size, mtime, len(res.jpeg))
+                    )
+                    if old:
+                        old_refs.append(old)
+                    stats["done"] += 1
+                if len(thumbs) >= 50:
+                    self._flush(thumbs, meta)
+                    thumbs, meta = [], []
+                if progress:
+                    progress(done, len(todo))
+
+        self._flush(thumbs, meta)
+        self.thumbs.remove_files(self.db.unreferenced_thumb_paths(old_refs))
+        logger.info("Posterframes klaar: %s", stats)
+        return stats
+
+# [END: FUNC: run]
+
+# [FUNC: _flush]
+    def _flush(self, thumbs: List[Tuple], meta: List[Tuple]) -> None:
+        self.db.set_video_metadata(meta)
+        self.thumbs.register(thumbs)
+
+# [END: FUNC: _flush]
+# [END: SECTION: CLASS: VideoPosterPipeline]
+# [END: CLASS: VideoPosterPipeline]
+
+
+# [SECTION: MAIN]
+if __name__ == "__main__":
+    if not logging.getLogger().handlers:
+        logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    print(VideoPosterPipeline(DbService()).run())
+# [END: SECTION: MAIN]
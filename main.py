@@ -16,6 +16,7 @@ from core.logging_setup import init_logging  # centrale logging
 from core.app_controller import MediaAppController
 from core.create_database import create_database
 from core.db_interface import DbService
+from core.folder_watcher import FolderWatcher
 
 
 PROJECT_NAME = "MediaOrganizer"
@@ -47,6 +48,18 @@ def parse_args(argv: list[str]) -> argparse.Namespace:
         action="store_true",
         help="Sla de dagelijkse DB-backup bij opstart over.",
     )
+    parser.add_argument(
+        "--no-watch",
+        dest="no_watch",
+        action="store_true",
+        help="Bewaak de actieve mappen niet op wijzigingen (geen live DB-updates).",
+    )
+    parser.add_argument(
+        "--relocate",
+        nargs=2,
+        metavar=("OUD", "NIEUW"),
+        help="Bibliotheekmap is verhuisd: paden in de DB omzetten en afsluiten.",
+    )
     return parser.parse_args(argv)
 
 # [END: FUNC: parse_args]
@@ -98,11 +111,12 @@ def ensure_daily_backup(db_path: str) -> None:
 def main(argv: list[str] | None = None) -> int:
     """
     Entrypoint van de applicatie:
-    - CLI-args (db-pad, log-level, backup-skip)
+    - CLI-args (db-pad, log-level, backup-skip, verhuisde bibliotheekmap)
     - Initialiseert centrale logging (txt + jsonl)
     - Globale excepthook voor nette crashlogs
     - Initialiseert database (schema aanmaken/updaten)
     - Maakt DbService en start de controller (Qt-app + GUI)
+    - Bewaakt de actieve mappen zolang de app draait (tenzij --no-watch)
     """
     args = parse_args(argv or [])
 
@@ -134,6 +148,12 @@ def main(argv: list[str] | None = None) -> int:
         db_service = DbService(db_path=db_path)
         logger.debug("DbService gemaakt met pad: %s", db_service.db_path)
 
+        if args.relocate:
+            old_root, new_root = args.relocate
+            n = db_service.relocate_folder(old_root, new_root)
+            logger.info("%s media omgezet: %s → %s", n, old_root, new_root)
+            return 0
+
         # 5) Controller starten (flexibel constructor: met of zonder db_service)
         try:
             controller = MediaAppController(db_service=db_service)
@@ -144,8 +164,22 @@ def main(argv: list[str] | None = None) -> int:
             )
             controller = MediaAppController()
 
+        # 6) Actieve mappen live bijhouden (watchdog of polling)
+        watcher = None
+        if not args.no_watch:
+            try:
+                watcher = FolderWatcher(db_service)
+                watcher.start()
+            except Exception:
+                logger.warning("Folder watcher niet gestart; verder zonder", exc_info=True)
+                watcher = None
+
         logger.info("Start %s", PROJECT_NAME)
-        controller.start()
+        try:
+            controller.start()
+        finally:
+            if watcher is not None:
+                watcher.stop()
         logger.info("Stop %s", PROJECT_NAME)
         return 0
     except Exception:
@@ -13,8 +13,9 @@ from PyQt6 import QtCore
 # media_utils moet minimaal is_media_file(path: Path, type_filter: str) bevatten.
 # optioneel: in_date_range(path: Path, start, end) voor EXIF/mtime-filter.
 try:
-    from core import media_utils  # type: ignore
+    from core import media_types, media_utils  # type: ignore
 except Exception:  # fallback pad
+    import media_types  # type: ignore
     import media_utils  # type: ignore
 
 
@@ -28,19 +29,27 @@ class MediaSearchThread(QtCore.QThread):
     Asynchrone scan van een startpad met filters.
     - type_filter: "images" | "videos" | "all"
     - date_range: (start_qdate, end_qdate) of None
+    - sniff_content: bestanden zonder bekende extensie aan hun inhoud herkennen
+      (per SNIFF_BATCH; met db via sniff_cache, zodat ongewijzigde bestanden
+      bij een volgende zoekopdracht niet opnieuw gelezen worden)
     Signalen:
+      - sniffed(kinds: dict[str, str]) — soort van inhoudelijk herkende paden,
+        vlak vóór de found-batch waarin ze zitten
       - found(list_of_paths: list[str])
       - finished(total_count: int)
       - error(message: str)
       - progress(current_path: str, count: int)
     """
 
+    sniffed = QtCore.pyqtSignal(dict)
     found = QtCore.pyqtSignal(list)
     finished = QtCore.pyqtSignal(int)
     error = QtCore.pyqtSignal(str)
     progress = QtCore.pyqtSignal(str, int)
 
     BATCH_SIZE = 50
+    SNIFF_BATCH = 200
+    _FILTER_KINDS = {"images": ("image",), "videos": ("video",), "all": ("image", "video")}
 
 # [FUNC: __init__]
     def __init__(
@@ -49,11 +58,16 @@ class MediaSearchThread(QtCore.QThread):
         type_filter: str = "all",
         date_range: Optional[Tuple[object, object]] = None,
         parent: Optional[QtCore.QObject] = None,
+        sniff_content: bool = False,
+        db=None,
     ) -> None:
         super().__init__(parent)
         self._root = Path(start_path).expanduser().resolve()
         self._type_filter = (type_filter or "all").lower()
         self._date_range = date_range
+        self._sniff = sniff_content
+        self._db = db
+        self._kinds: dict = {}  # inhoudelijk herkend: {pad: 'image' | 'video'}
         self._count = 0
         logger.debug(
             "MediaSearchThread init: root=%s, type_filter=%s, date_range=%s",
@@ -86,12 +100,12 @@ class MediaSearchThread(QtCore.QThread):
                 self._count += 1
 
                 if self._count % self.BATCH_SIZE == 0:
-                    self.found.emit(batch)
+                    self._emit(batch)
                     self.progress.emit(str(p), self._count)
                     batch = []
 
             if batch:
-                self.found.emit(batch)
+                self._emit(batch)
 
             self.finished.emit(self._count)
             logger.info("Scan klaar: %s items gevonden.", self._count)
@@ -101,6 +115,35 @@ class MediaSearchThread(QtCore.QThread):
             self.error.emit(str(e))
 
 # [END: FUNC: run]
+# [FUNC: _emit]
+    def _emit(self, batch: List[str]) -> None:
+        kinds = {p: self._kinds.pop(p) for p in batch if p in self._kinds}
+        if kinds:
+            self.sniffed.emit(kinds)
+        self.found.emit(batch)
+
+# [END: FUNC: _emit]
+# [FUNC: _resolve_sniff]
+    def _resolve_sniff(self, unknown: List[Tuple[str, int, float]]) -> Iterable[Path]:
+        """Herken een blok (pad, size, mtime) aan de magic bytes; yield de passende."""
+        if self._db is not None:
+            from core.media_scanner import sniff_unknown
+
+            kinds = sniff_unknown(self._db, unknown)
+        else:
+            kinds = {}
+            for path, _, _ in unknown:
+                t = media_types.sniff(path)
+                if t is not None:
+                    kinds[path] = t.kind
+        allowed = self._FILTER_KINDS.get(self._type_filter, ())
+        for path, _, _ in unknown:
+            kind = kinds.get(path)
+            if kind in allowed:
+                self._kinds[path] = kind
+                yield Path(path)
+
+# [END: FUNC: _resolve_sniff]
 # [FUNC: stop]
     def stop(self):
         """Publieke stopmethode voor controller: roept requestInterruption en wacht."""
@@ -130,6 +173,7 @@ class MediaSearchThread(QtCore.QThread):
                 return str(p).replace("\\", "/").lower()
     
         exclude_prefixes = {norm(Path(x)) for x in raw_excludes}
+        unknown: List[Tuple[str, int, float]] = []
     
         for dirpath, dirnames, filenames in os_walk(root):
             # Huidige map normaliseren
@@ -156,9 +200,20 @@ class MediaSearchThread(QtCore.QThread):
                 try:
                     if media_utils.is_media_file(p, self._type_filter):
                         yield p
+                        continue
+                    if not self._sniff or media_types.kind_of(name) != "other":
+                        continue
+                    st = p.stat()
                 except Exception:
                     # Veilig overslaan van onleesbare/rare bestanden
                     continue
+                if st.st_size > 0:
+                    unknown.append((str(p), int(st.st_size), float(st.st_mtime)))
+                if len(unknown) >= self.SNIFF_BATCH:
+                    yield from self._resolve_sniff(unknown)
+                    unknown = []
+        if unknown:
+            yield from self._resolve_sniff(unknown)
 
 # [END: FUNC: _iter_media_paths]
 # [FUNC: _match_date]
@@ -0,0 +1,125 @@
+# [SECTION: IMPORTS]
+from __future__ import annotations
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+# Projectroot importeerbaar maken (script staat in tools/)
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from core.file_hashing import (
+    CHUNK_BYTES,
+    available_algorithms,
+    full_hash,
+    hash_files,
+    is_local_path,
+)
+from tools.bench_thumb_store import drop_cache
+# [END: SECTION: IMPORTS]
+
+# [FUNC: def read_copy_hash]
+def read_copy_hash(path: str) -> str:
+    """Oude pad: f.read() per blok (nieuw bytes-object per MB)."""
+    h = hashlib.blake2b(digest_size=32)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_BYTES), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+# [END: FUNC: def read_copy_hash]
+
+# [FUNC: def make_samples]
+def make_samples(folder: str, count: int, size_mb: int) -> List[str]:
+    paths = []
+    block = os.urandom(CHUNK_BYTES)
+    for i in range(count):
+        p = os.path.join(folder, f"bench_hash_{i}.bin")
+        with open(p, "wb") as f:
+            for _ in range(size_mb):
+                f.write(block)
+            f.write(i.to_bytes(8, "little"))  # elk bestand uniek
+        paths.append(p)
+    return paths
+
+# [END: FUNC: def make_samples]
+
+# [FUNC: def collect_files]
+def collect_files(folder: str, limit: int) -> List[str]:
+    out = []
+    for dirpath, _, filenames in os.walk(folder):
+        for f in filenames:
+            p = os.path.join(dirpath, f)
+            if os.path.getsize(p) >= CHUNK_BYTES:
+                out.append(p)
+                if len(out) >= limit:
+                    return out
+    return out
+
+# [END: FUNC: def collect_files]
+
+# [FUNC: def run_cases]
+def run_cases(label: str, paths: List[str], workers: int, cold: bool) -> None:
+    total_mb = sum(os.path.getsize(p) for p in paths) / (1024 * 1024)
+    cases: Dict[str, Callable[[], object]] = {
+        "read() + blake2b": lambda: [read_copy_hash(p) for p in paths],
+        "readinto + blake2b": lambda: [full_hash(p, use_mmap=False) for p in paths],
+        "mmap + blake2b": lambda: [full_hash(p, use_mmap=True) for p in paths],
+        f"threads x{workers} + blake2b": lambda: hash_files(paths, workers=workers),
+    }
+    if "xxh3" in available_algorithms():
+        cases["readinto + xxh3"] = lambda: [
+            full_hash(p, "xxh3", use_mmap=False) for p in paths
+        ]
+        cases[f"threads x{workers} + xxh3"] = lambda: hash_files(
+            paths, workers=workers, algorithm="xxh3"
+        )
+
+    local = all(is_local_path(p) for p in paths)
+    print(f"\n{label}: {len(paths)} bestanden, {total_mb:.0f} MB ({'lokaal' if local else 'netwerk'})")
+    for name, fn in cases.items():
+        cold_ok = drop_cache(paths) if cold else False
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        suffix = " (cold)" if cold_ok else ""
+        print(f"  {name:<24} {total_mb / dt:8.1f} MB/s{suffix}")
+
+# [END: FUNC: def run_cases]
+
+# [FUNC: def main]
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(
+        description="Benchmark: hashing-doorvoer read() vs readinto/mmap vs threadpool"
+    )
+    ap.add_argument(
+        "dirs", nargs="*",
+        help="mappen om te meten, bv. een lokale schijf en een netwerkshare (\\\\nas\\foto)",
+    )
+    ap.add_argument("--count", type=int, default=8, help="aantal bestanden per map")
+    ap.add_argument("--size-mb", type=int, default=64, help="grootte synthetische bestanden")
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--existing", action="store_true", help="bestaande bestanden i.p.v. synthetische")
+    ap.add_argument("--cold", action="store_true", help="paginacache legen vóór elke meting")
+    args = ap.parse_args(argv)
+
+    for folder in args.dirs or [None]:
+        if folder is not None and args.existing:
+            run_cases(folder, collect_files(folder, args.count), args.workers, args.cold)
+            continue
+        with tempfile.TemporaryDirectory(dir=folder) as tmp:
+            paths = make_samples(tmp, args.count, args.size_mb)
+            run_cases(folder or tmp, paths, args.workers, args.cold)
+    return 0
+
+# [END: FUNC: def main]
+
+# [SECTION: MAIN]
+if __name__ == "__main__":
+    raise SystemExit(main())
+# [END: SECTION: MAIN]
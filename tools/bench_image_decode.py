@@ -0,0 +1,115 @@
+# [SECTION: IMPORTS]
+from __future__ import annotations
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, List, Tuple
+
+# Projectroot importeerbaar maken (script staat in tools/)
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from PyQt6.QtCore import QSize, Qt
+from PyQt6.QtGui import QImage, QImageReader
+
+from core.image_loader import Image, load_scaled_pil, load_scaled_qimage
+# [END: SECTION: IMPORTS]
+
+# [FUNC: def make_sample]
+def make_sample(folder: str, width: int = 7728, height: int = 5152) -> str:
+    """Maak een synthetische ~40MP JPEG als er geen eigen bestanden zijn."""
+    path = os.path.join(folder, "bench_40mp.jpg")
+    img = QImage(width, height, QImage.Format.Format_RGB32)
+    img.fill(0x808080)  # egale basis met een raster punten als JPEG-inhoud
+    for x in range(0, width, 97):
+        for y in range(0, height, 89):
+            img.setPixel(x, y, (x * 31 + y * 17) & 0xFFFFFF)
+    img.save(path, "JPG", 90)
+    return path
+
+# [END: FUNC: def make_sample]
+
+# [FUNC: def full_then_scale]
+def full_then_scale(path: str, target: QSize) -> Tuple[int, int]:
+    """Oude pad: volledige decode, daarna SmoothTransformation-schaling."""
+    full = QImageReader(path).read()
+    scaled = full.scaled(
+        target,
+        Qt.AspectRatioMode.KeepAspectRatio,
+        Qt.TransformationMode.SmoothTransformation,
+    )
+    return int(full.sizeInBytes()), int(scaled.sizeInBytes())
+
+# [END: FUNC: def full_then_scale]
+
+# [FUNC: def scaled_qt]
+def scaled_qt(path: str, target: QSize) -> Tuple[int, int]:
+    img = load_scaled_qimage(path, target)
+    n = int(img.sizeInBytes()) if img is not None else 0
+    return n, n
+
+# [END: FUNC: def scaled_qt]
+
+# [FUNC: def scaled_pil]
+def scaled_pil(path: str, target: QSize) -> Tuple[int, int]:
+    im = load_scaled_pil(path, (target.width(), target.height()))
+    n = len(im.tobytes()) if im is not None else 0
+    return n, n
+
+# [END: FUNC: def scaled_pil]
+
+# [FUNC: def run_case]
+def run_case(
+    name: str, fn: Callable[[str, QSize], Tuple[int, int]], paths: List[str],
+    target: QSize, repeat: int,
+) -> None:
+    timings: List[float] = []
+    peak = 0
+    for _ in range(repeat):
+        for p in paths:
+            t0 = time.perf_counter()
+            decoded, _ = fn(p, target)
+            timings.append((time.perf_counter() - t0) * 1000)
+            peak = max(peak, decoded)
+    print(
+        f"{name:<22} median {statistics.median(timings):8.1f} ms   "
+        f"max {max(timings):8.1f} ms   "
+        f"grootste decodebuffer {peak / 1e6:7.1f} MB"
+    )
+
+# [END: FUNC: def run_case]
+
+# [FUNC: def main]
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(
+        description="Benchmark: volledige decode + schalen vs. decode op doelgrootte"
+    )
+    ap.add_argument("paths", nargs="*", help="JPEG-bestanden (leeg = synthetische 40MP)")
+    ap.add_argument("--width", type=int, default=1920, help="doelbreedte (label)")
+    ap.add_argument("--height", type=int, default=1080, help="doelhoogte (label)")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args(argv)
+
+    target = QSize(args.width, args.height)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = args.paths or [make_sample(tmp)]
+        print(f"{len(paths)} bestand(en), doel {target.width()}x{target.height()}, {args.repeat}x")
+        run_case("volledig + scaled()", full_then_scale, paths, target, args.repeat)
+        run_case("QImageReader scaled", scaled_qt, paths, target, args.repeat)
+        if Image is not None:
+            run_case("Pillow draft()", scaled_pil, paths, target, args.repeat)
+        else:
+            print("Pillow niet geïnstalleerd: draft()-meting overgeslagen")
+    return 0
+
+# [END: FUNC: def main]
+
+# [SECTION: MAIN]
+if __name__ == "__main__":
+    raise SystemExit(main())
+# [END: SECTION: MAIN]
@@ -0,0 +1,81 @@
+# [SECTION: IMPORTS]
+from __future__ import annotations
+import argparse
+import os
+import sys
+import time
+from typing import List
+
+# Projectroot importeerbaar maken (script staat in tools/)
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import numpy as np
+
+from ai import bepaal_ai_tags as tagger
+from core.image_loader import load_scaled_pil
+from core.media_types import kind_of
+# [END: SECTION: IMPORTS]
+
+# [FUNC: def load_tensors]
+def load_tensors(folder: str | None, count: int) -> List[np.ndarray]:
+    """Voorbewerkte tensors uit een map met foto's, of ruis als er geen map is."""
+    tensors: List[np.ndarray] = []
+    if folder:
+        for dirpath, _, filenames in os.walk(folder):
+            for f in sorted(filenames):
+                if kind_of(f) != "image":
+                    continue
+                im = load_scaled_pil(os.path.join(dirpath, f), (tagger.INPUT_SIZE * 2,) * 2)
+                if im is not None:
+                    tensors.append(tagger.preprocess(im))
+                if len(tensors) >= count:
+                    return tensors
+    rnd = np.random.default_rng(0)
+    while len(tensors) < count:
+        tensors.append(
+            rnd.standard_normal((3, tagger.INPUT_SIZE, tagger.INPUT_SIZE)).astype(np.float32)
+        )
+    return tensors
+
+# [END: FUNC: def load_tensors]
+
+# [FUNC: def main]
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(
+        description="Benchmark: ONNX-tagging doorvoer (beelden/s) per batchgrootte en threads"
+    )
+    ap.add_argument("--model", default=tagger.MODEL_PATH)
+    ap.add_argument("--images", default=None, help="map met foto's (anders synthetisch)")
+    ap.add_argument("--count", type=int, default=256)
+    ap.add_argument("--batch", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    ap.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 4])
+    args = ap.parse_args(argv)
+
+    if not tagger.beschikbaar(args.model):
+        print(f"Model/labels of onnxruntime ontbreken: {args.model}")
+        return 1
+
+    tensors = load_tensors(args.images, args.count)
+    print(f"{len(tensors)} beelden, model {os.path.basename(args.model)}")
+    print(f"{'threads':>7} {'batch':>6} {'beelden/s':>10} {'ms/beeld':>9}")
+    for threads in sorted(set(args.threads)):
+        sessie = tagger.laad_sessie(args.model, threads)
+        fixed = sessie[3]
+        for batch in args.batch:
+            if fixed and batch != fixed:
+                continue  # model met vaste batch: enkel die grootte meten
+            tagger.infer_tensors(tensors[:batch], sessie, batch)  # opwarmen
+            t0 = time.perf_counter()
+            tagger.infer_tensors(tensors, sessie, batch)
+            dt = time.perf_counter() - t0
+            print(f"{threads:>7} {batch:>6} {len(tensors) / dt:10.1f} {1000 * dt / len(tensors):9.2f}")
+    return 0
+
+# [END: FUNC: def main]
+
+# [SECTION: MAIN]
+if __name__ == "__main__":
+    raise SystemExit(main())
+# [END: SECTION: MAIN]
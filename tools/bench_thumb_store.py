@@ -0,0 +1,124 @@
+# [SECTION: IMPORTS]
+from __future__ import annotations
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, Iterable, List
+
+# Projectroot importeerbaar maken (script staat in tools/)
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from core.create_database import create_database
+from core.db_interface import DbService
+from core.thumbnail_service import ThumbnailService
+# [END: SECTION: IMPORTS]
+
+# [FUNC: def drop_cache]
+def drop_cache(paths: Iterable[str]) -> bool:
+    """
+    Vraag de kernel om de paginacache van deze bestanden los te laten
+    (posix_fadvise DONTNEED). Retourneert False als dat niet kan (Windows).
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    for p in paths:
+        try:
+            fd = os.open(p, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+        except OSError:
+            continue
+    return True
+
+# [END: FUNC: def drop_cache]
+
+# [FUNC: def all_files]
+def all_files(root: str) -> List[str]:
+    out = []
+    for dirpath, _, filenames in os.walk(root):
+        out.extend(os.path.join(dirpath, f) for f in filenames)
+    return out
+
+# [END: FUNC: def all_files]
+
+# [FUNC: def timed_reads]
+def timed_reads(
+    read_batch: Callable[[List[str]], Dict[str, bytes]], refs: List[str], batch: int
+) -> float:
+    t0 = time.perf_counter()
+    for i in range(0, len(refs), batch):
+        got = read_batch(refs[i : i + batch])
+        assert len(got) == len(set(refs[i : i + batch])), "thumbnail niet gevonden"
+    return time.perf_counter() - t0
+
+# [END: FUNC: def timed_reads]
+
+# [FUNC: def main]
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(
+        description="Benchmark: één bestand per thumbnail vs. packed thumbnail-store"
+    )
+    ap.add_argument("--count", type=int, default=20000, help="aantal thumbnails")
+    ap.add_argument("--reads", type=int, default=5000, help="aantal willekeurige reads")
+    ap.add_argument("--batch", type=int, default=100, help="reads per batch (boompagina)")
+    ap.add_argument("--dir", default=None, help="doelmap (bv. een netwerkshare)")
+    args = ap.parse_args(argv)
+
+    rnd = random.Random(42)
+    payloads = [os.urandom(rnd.randint(6_000, 18_000)) for _ in range(args.count)]
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        create_database(db_path)
+        db = DbService(db_path)
+
+        results = {}
+        for layout in ("files", "packed"):
+            svc = ThumbnailService(db, cache_dir=os.path.join(tmp, layout), layout=layout)
+            t0 = time.perf_counter()
+            refs = [svc.store("small", data) for data in payloads]
+            if svc.pack is not None:
+                svc.pack.flush()
+            write_s = time.perf_counter() - t0
+
+            sample = [rnd.choice(refs) for _ in range(args.reads)]
+            if svc.pack is not None:
+                # inclusief de offset-lookup in SQLite, zoals in de app
+                reader = svc.pack.read_many
+            else:
+                def reader(batch: List[str], _svc=svc) -> Dict[str, bytes]:
+                    return {r: _svc.read_thumbnail(r) for r in batch}
+
+            files = all_files(os.path.join(tmp, layout))
+            if svc.pack is not None:
+                svc.pack.close()  # mmaps los zodat 'cold' echt koud is
+            cold_ok = drop_cache(files)
+            cold_s = timed_reads(reader, sample, args.batch)
+            warm_s = timed_reads(reader, sample, args.batch)
+            results[layout] = (len(files), write_s, cold_s, warm_s, cold_ok)
+            svc.close()
+
+    print(f"{args.count} thumbnails, {args.reads} reads in batches van {args.batch}")
+    for layout, (nfiles, write_s, cold_s, warm_s, cold_ok) in results.items():
+        per = 1e6 / args.reads
+        print(
+            f"{layout:<7} bestanden {nfiles:>7}   schrijven {write_s:6.2f} s   "
+            f"cold {cold_s * per:7.1f} µs/read{'' if cold_ok else ' (cache niet geleegd)'}   "
+            f"warm {warm_s * per:7.1f} µs/read"
+        )
+    return 0
+
+# [END: FUNC: def main]
+
+# [SECTION: MAIN]
+if __name__ == "__main__":
+    raise SystemExit(main())
+# [END: SECTION: MAIN]